@@ -0,0 +1,167 @@
+"""
+Always-open microphone capture for Jarvis.
+
+A single capture thread reads 16 kHz mono PCM from one PortAudio stream and
+writes it into a fixed-size, preallocated ring buffer. Wake word detection,
+command capture and the button path all read from that buffer through their
+own RingReader, so nobody reopens the microphone and audio spoken while
+Jarvis is busy elsewhere is never lost. Positions are absolute sample
+counts since capture started, which lets a consumer rewind a little
+(pre-roll) to audio that was buffered before an activation.
+"""
+
+import logging
+import threading
+
+import numpy as np
+
+from wakeword import SAMPLE_RATE, FRAME_SAMPLES
+
+BUFFER_SECONDS = 32.768  # 1024 frames of 512 samples
+
+
+class RingBuffer:
+    """
+    Preallocated int16 ring buffer addressed by absolute sample position.
+
+    The capacity is a whole number of frames, so frame-aligned reads never
+    wrap and views() hands out slices of the backing array without copying.
+    """
+
+    def __init__(self, capacity=int(BUFFER_SECONDS * SAMPLE_RATE), frame_samples=FRAME_SAMPLES):
+        capacity -= capacity % frame_samples
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.end = 0  # absolute position one past the newest sample
+        self.closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def start(self):
+        """Oldest absolute position still held in the buffer."""
+        return max(0, self.end - self.capacity)
+
+    def write(self, samples):
+        """Append samples, overwriting the oldest audio once full."""
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        offset = self.end % self.capacity
+        first = min(n, self.capacity - offset)
+        self.data[offset:offset + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        with self._cond:
+            self.end += n
+            self._cond.notify_all()
+
+    def wait(self, position, timeout=None):
+        """Block until audio up to position has been written. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.end >= position or self.closed, timeout)
+
+    def close(self):
+        """Wake up every waiting reader (capture stopped)."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def views(self, start, stop):
+        """Zero-copy views covering [start, stop), as one or two array slices."""
+        if start < self.start or stop > self.end or start > stop:
+            raise IndexError(f"Samples {start}-{stop} are not in the buffer ({self.start}-{self.end}).")
+        a, b = start % self.capacity, stop % self.capacity
+        if start == stop:
+            return (self.data[0:0],)
+        if a < b or b == 0:
+            return (self.data[a:b or self.capacity],)
+        return self.data[a:], self.data[:b]
+
+    def read(self, start, stop):
+        """Samples in [start, stop) as one array (copied only when the range wraps)."""
+        views = self.views(start, stop)
+        return views[0] if len(views) == 1 else np.concatenate(views)
+
+
+class RingReader:
+    """A consumer's cursor into a RingBuffer."""
+
+    def __init__(self, ring: RingBuffer, position=None):
+        self.ring = ring
+        self.position = ring.end if position is None else max(position, ring.start)
+
+    def read(self, n=FRAME_SAMPLES, timeout=None):
+        """Return the next n samples (a view when possible), or None on timeout."""
+        if not self.ring.wait(self.position + n, timeout) or self.ring.end < self.position + n:
+            return None
+        if self.position < self.ring.start:
+            lost = self.ring.start - self.position
+            logging.warning(f"Reader fell behind, skipped {lost / SAMPLE_RATE:.2f}s of audio.")
+            self.position = self.ring.start
+        samples = self.ring.read(self.position, self.position + n)
+        self.position += n
+        return samples
+
+    def read_available(self, timeout=None, frame_samples=FRAME_SAMPLES):
+        """Wait for at least one frame, then return every whole frame buffered so far."""
+        if not self.ring.wait(self.position + frame_samples, timeout):
+            return None
+        available = self.ring.end - max(self.position, self.ring.start)
+        return self.read(available - available % frame_samples, timeout=0) if available >= frame_samples else None
+
+    def seek(self, position):
+        """Move the cursor, clamped to the audio still held in the buffer."""
+        self.position = min(max(position, self.ring.start), self.ring.end)
+
+
+class AudioCapture:
+    """Capture thread feeding the ring buffer from one always-open input stream."""
+
+    def __init__(self, stream=None, ring=None):
+        self.stream = stream
+        self.ring = ring or RingBuffer()
+        self.frame_listeners = []  # called with every captured frame on the capture thread
+        self._audio = None
+        self._thread = None
+        self._running = False
+
+    @property
+    def position(self):
+        return self.ring.end
+
+    def reader(self, preroll=0.0):
+        """New cursor starting preroll seconds before the newest audio."""
+        return RingReader(self.ring, self.ring.end - int(preroll * SAMPLE_RATE))
+
+    def start(self):
+        if self.stream is None:
+            import pyaudio
+            self._audio = pyaudio.PyAudio()
+            self.stream = self._audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE,
+                                           input=True, frames_per_buffer=FRAME_SAMPLES)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=1)
+        if self._audio:
+            self.stream.close()
+            self._audio.terminate()
+        self.ring.close()
+
+    def _run(self):
+        while self._running:
+            try:
+                pcm = self.stream.read(FRAME_SAMPLES, exception_on_overflow=False)
+            except OSError as e:
+                logging.error(f"Audio capture error: {e}")
+                continue
+            if not pcm:
+                break
+            frame = np.frombuffer(pcm, dtype=np.int16)
+            self.ring.write(frame)
+            for listener in self.frame_listeners:
+                listener(frame)
+        self.ring.close()
@@ -0,0 +1,569 @@
+"""
+Worker processes for CPU-heavy audio work in Jarvis.
+
+Wake word scoring, feature extraction, offline speech recognition and speech
+rendering are CPU-bound Python and numpy code. In the assistant's process
+they all share one GIL with audio capture, the dispatcher and the dashboard,
+so a Pi 4 uses one of its four cores. AudioWorkerPool runs them in separate
+worker processes instead.
+
+Audio is not pickled: every worker has a shared-memory slot of
+`slot_seconds` of int16 samples. The pool copies a job's samples into the
+slot of the worker that runs it and sends only the job name, its small
+arguments and the sample count down a pipe. A worker runs one job at a time,
+so its slot is free whenever it is idle.
+
+Jobs can be pinned to a worker. Stateful work (a wake word detector's DTW
+columns, a Vosk recognizer in the middle of an utterance) stays in that
+worker, and pinned jobs run in the order they were submitted. Other jobs go
+to whichever worker is idle first.
+
+A monitor thread restarts workers that exit, stop sending heartbeats (a
+frozen process) or run a job for longer than its timeout. The job they were
+running fails with WorkerCrashed and the others carry on. State kept in a
+restarted worker is lost; a wake word stream just starts over.
+
+Workers are started as `python audio_pool.py --worker ...` rather than with
+multiprocessing, which would import jarvis.py again in every worker.
+"""
+
+import os
+import sys
+import time
+import socket
+import logging
+import argparse
+import importlib
+import itertools
+import threading
+import subprocess
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import connection, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from wakeword import (WakeWordDetector, TemplateWakeWordDetector, FeatureExtractor, pcm_to_array,
+                      SAMPLE_RATE, FRAME_SAMPLES)
+from stt import STTBackend, STTSession
+
+
+class WorkerCrashed(RuntimeError):
+    """The worker running a job exited, froze or ran past the job's timeout."""
+
+
+class _Job:
+    def __init__(self, id, name, args, samples, worker, timeout):
+        self.id = id
+        self.name = name
+        self.args = args
+        self.samples = samples
+        self.worker = worker      # pinned worker index, or None
+        self.timeout = timeout
+        self.future = Future()
+        self.submitted = time.perf_counter()
+        self.started = None
+
+
+class _Worker:
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.slot = None
+        self.samples = None       # int16 view of the slot
+        self.ready = False        # imported and listening
+        self.job = None           # running
+        self.pending = deque()    # pinned jobs waiting for this worker
+        self.jobs = 0
+        self.restarts = 0
+
+
+class AudioWorkerPool:
+    """Worker processes fed through shared memory, with health monitoring and restarts."""
+
+    def __init__(self, workers=None, slot_seconds=60, job_timeout=30.0, heartbeat_timeout=10.0, max_pending=256):
+        self.size = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.slot_samples = int(slot_seconds * SAMPLE_RATE)
+        self.job_timeout = job_timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_pending = max_pending
+        self.workers = [_Worker(i) for i in range(self.size)]
+        self.queue = deque()      # unpinned jobs
+        self.lock = threading.Lock()
+        self.space = threading.Condition(self.lock)
+        self.heartbeats = None
+        self.beats = None
+        self.running = False
+        self.stale = []           # connections of replaced workers, closed by the collector
+        self.threads = []
+        self._ids = itertools.count(1)
+        self._pins = itertools.cycle(range(self.size))
+        self.counts = dict.fromkeys(("jobs", "completed", "failed", "restarts"), 0)
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    # ---- lifecycle ----
+
+    def start(self, timeout=30.0):
+        """Start the workers and wait until they are ready."""
+        self.heartbeats = SharedMemory(create=True, size=8 * self.size)
+        self.beats = np.ndarray((self.size,), dtype=np.float64, buffer=self.heartbeats.buf)
+        for worker in self.workers:
+            worker.slot = SharedMemory(create=True, size=2 * self.slot_samples)
+            worker.samples = np.ndarray((self.slot_samples,), dtype=np.int16, buffer=worker.slot.buf)
+            self._spawn(worker)
+        self.running = True
+        self.threads = [threading.Thread(target=self._collect, name="audio-pool-results", daemon=True),
+                        threading.Thread(target=self._monitor, name="audio-pool-monitor", daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        with self.space:
+            if not self.space.wait_for(lambda: all(w.ready for w in self.workers), timeout):
+                self.stop()
+                raise TimeoutError("audio workers did not start")
+        logging.info(f"Audio worker pool started with {self.size} processes")
+        return self
+
+    def _spawn(self, worker):
+        ours, theirs = socket.socketpair()
+        worker.ready = False
+        self.beats[worker.index] = time.time()  # a new worker gets time to import numpy
+        worker.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(worker.index), str(theirs.fileno()),
+             worker.slot.name, str(self.slot_samples), self.heartbeats.name],
+            pass_fds=(theirs.fileno(),))
+        theirs.close()
+        worker.conn = connection.Connection(ours.detach())
+
+    def stop(self):
+        with self.lock:
+            self.running = False  # no restarts from here on
+            for worker in self.workers:
+                try:
+                    worker.conn.send(None)
+                except OSError:
+                    pass
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        for conn in self.stale:
+            conn.close()
+        self.stale = []
+        for worker in self.workers:
+            try:
+                worker.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+            worker.conn.close()
+            self._fail(worker.job, WorkerCrashed("the pool was stopped"))
+            worker.samples = None
+            worker.slot.close()
+            worker.slot.unlink()
+        for job in self.queue:
+            self._fail(job, WorkerCrashed("the pool was stopped"))
+        self.beats = None
+        self.heartbeats.close()
+        self.heartbeats.unlink()
+
+    # ---- jobs ----
+
+    def pin(self):
+        """A worker index for a stream of stateful jobs (round robin)."""
+        return next(self._pins)
+
+    def submit(self, name, *args, samples=None, worker=None, timeout=None) -> Future:
+        """
+        Run job `name` (a function in JOBS, or "module:function") in a worker.
+
+        samples (int16) are handed over in shared memory and passed as the
+        job's first argument. Blocks while max_pending jobs are waiting.
+        """
+        if samples is not None:
+            samples = pcm_to_array(samples)
+            if len(samples) > self.slot_samples:
+                raise ValueError(f"{len(samples)} samples don't fit a worker's {self.slot_samples}-sample slot")
+        job = _Job(next(self._ids), name, args, samples, worker, timeout or self.job_timeout)
+        with self.space:
+            if not self.space.wait_for(lambda: self._queued() < self.max_pending, timeout=job.timeout):
+                raise TimeoutError("the audio worker pool is overloaded")
+            self.counts["jobs"] += 1
+            if worker is None:
+                self.queue.append(job)
+            else:
+                self.workers[worker].pending.append(job)
+            self._dispatch()
+            if job.samples is not None:  # still queued: the caller may reuse its buffer
+                job.samples = job.samples.copy()
+        return job.future
+
+    def run(self, name, *args, samples=None, worker=None, timeout=None):
+        """submit() and wait for the result."""
+        return self.submit(name, *args, samples=samples, worker=worker, timeout=timeout).result()
+
+    def _queued(self):
+        return len(self.queue) + sum(len(w.pending) for w in self.workers)
+
+    def _dispatch(self):
+        """Give every idle worker its next job (lock held)."""
+        for worker in self.workers:
+            if worker.job is not None or not worker.ready:
+                continue
+            if worker.pending:
+                job = worker.pending.popleft()
+            elif self.queue:
+                job = self.queue.popleft()
+            else:
+                continue
+            n = -1
+            if job.samples is not None:
+                n = len(job.samples)
+                worker.samples[:n] = job.samples
+                job.samples = None
+            worker.job = job
+            job.started = time.perf_counter()
+            try:
+                worker.conn.send((job.id, job.name, job.args, n))
+            except OSError:
+                pass  # the monitor restarts the worker and fails the job
+        self.space.notify_all()
+
+    def _collect(self):
+        """Thread: resolve futures as results come back."""
+        while self.running:
+            try:
+                self._collect_once()
+            except Exception:
+                logging.exception("Audio pool: error collecting results")
+                time.sleep(0.2)
+
+    def _collect_once(self):
+        with self.lock:
+            # Only this thread reads connections, so only this thread closes replaced ones
+            for conn in self.stale:
+                conn.close()
+            self.stale = []
+            conns = {w.conn: w for w in self.workers}
+        for conn in connection.wait(list(conns), timeout=0.2):
+            worker = conns[conn]
+            try:
+                job_id, ok, value = conn.recv()
+            except (EOFError, OSError, TypeError, ValueError):
+                continue  # exited or replaced; the monitor restarts it
+            with self.lock:
+                if worker.conn is not conn:  # replaced since the wait: a result from the old process
+                    continue
+                if job_id == 0:  # started
+                    worker.ready = True
+                    self._dispatch()
+                    continue
+                job = worker.job
+                if job is None or job.id != job_id:
+                    continue
+                worker.job = None
+                worker.jobs += 1
+                latency = time.perf_counter() - job.submitted
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                self._dispatch()
+            if ok:
+                self.counts["completed"] += 1
+                job.future.set_result(value)
+            else:
+                self._fail(job, value)
+
+    def _fail(self, job, error):
+        if job is not None and not job.future.done():
+            self.counts["failed"] += 1
+            job.future.set_exception(error)
+
+    # ---- health ----
+
+    def _monitor(self, interval=0.2):
+        """Thread: restart workers that exited, froze or are stuck in a job."""
+        while self.running:
+            time.sleep(interval)
+            now = time.time()
+            for worker in self.workers:
+                job = worker.job
+                if worker.process.poll() is not None:
+                    reason = f"worker {worker.index} exited with code {worker.process.returncode}"
+                elif now - self.beats[worker.index] > self.heartbeat_timeout:
+                    reason = f"worker {worker.index} stopped responding"
+                elif job is not None and time.perf_counter() - job.started > job.timeout:
+                    reason = f"worker {worker.index} took more than {job.timeout:g} s for {job.name}"
+                else:
+                    continue
+                self._restart(worker, reason)
+
+    def _restart(self, worker, reason):
+        with self.lock:
+            if not self.running:  # stop() is unlinking the shared memory
+                return
+            logging.error(f"Audio pool: {reason}, restarting it")
+            job, worker.job = worker.job, None
+            worker.process.kill()
+            worker.process.wait()
+            self.stale.append(worker.conn)  # the collector may be reading it
+            self._spawn(worker)
+            worker.restarts += 1
+            self.counts["restarts"] += 1
+            self._fail(job, WorkerCrashed(reason))
+            self._dispatch()
+
+    # ---- statistics ----
+
+    def stats(self):
+        with self.lock:
+            finished = self.counts["completed"] + self.counts["failed"]
+            return dict(self.counts, workers=self.size, busy=sum(w.job is not None for w in self.workers),
+                        queued=self._queued(),
+                        latency_ms_mean=round(self.latency_total / finished * 1000, 2) if finished else 0.0,
+                        latency_ms_max=round(self.latency_max * 1000, 2),
+                        per_worker=[{"pid": w.process.pid, "jobs": w.jobs, "restarts": w.restarts,
+                                     "busy": w.job is not None} for w in self.workers])
+
+    def prometheus(self, prefix="jarvis"):
+        """Pool counters in Prometheus text format."""
+        stats = self.stats()
+        lines = [f"# TYPE {prefix}_audio_workers gauge", f"{prefix}_audio_workers {stats['workers']}",
+                 f"# TYPE {prefix}_audio_workers_busy gauge", f"{prefix}_audio_workers_busy {stats['busy']}",
+                 f"# TYPE {prefix}_audio_jobs_queued gauge", f"{prefix}_audio_jobs_queued {stats['queued']}"]
+        for name in self.counts:
+            lines += [f"# TYPE {prefix}_audio_{name}_total counter", f"{prefix}_audio_{name}_total {stats[name]}"]
+        return "\n".join(lines) + "\n"
+
+
+# ------------- Pooled stages -------------
+
+class PooledWakeWordDetector(WakeWordDetector):
+    """The template detector, running in one pool worker; its DTW state stays there."""
+
+    def __init__(self, pool, templates, threshold=0.75, timeout=1.0):
+        super().__init__(threshold)
+        self.pool = pool
+        self.templates = templates
+        self.timeout = timeout
+        self.key = f"wake-{id(self)}"
+        self.worker = pool.pin()
+        # Fail now if the templates are unusable
+        self.pool.run("wake_word_load", templates, threshold, worker=self.worker)
+
+    def process(self, pcm) -> bool:
+        fired, self.last_score, self.samples_seen = self.pool.submit(
+            "wake_word", self.key, self.templates, self.threshold, samples=pcm_to_array(pcm),
+            worker=self.worker, timeout=self.timeout).result(self.timeout)
+        return fired
+
+    def reset(self):
+        self.samples_seen = 0
+        self.pool.submit("wake_word_reset", self.key, worker=self.worker)
+
+
+class PooledSTTBackend(STTBackend):
+    """An STT backend (e.g. "vosk") decoding in pool workers, each utterance in one worker."""
+
+    streaming = True
+
+    def __init__(self, pool, name, timeout=30.0):
+        self.pool = pool
+        self.name = name
+        self.timeout = timeout
+
+    def session(self, on_partial=None):
+        return PooledSTTSession(self, on_partial)
+
+
+class PooledSTTSession(STTSession):
+    _ids = itertools.count(1)
+
+    def __init__(self, backend, on_partial=None):
+        super().__init__(on_partial)
+        self.backend = backend
+        self.key = f"stt-{next(self._ids)}"
+        self.worker = backend.pool.pin()
+        self.closed = False  # finished or discarded: the worker no longer holds its recognizer
+
+    def accept(self, samples):
+        """Queue samples for the worker without waiting; partial hypotheses arrive as it catches up."""
+        if self.closed:  # late audio must not bring a discarded recognizer back
+            return
+        future = self.backend.pool.submit("stt_accept", self.key, self.backend.name, samples=samples,
+                                          worker=self.worker)
+        future.add_done_callback(lambda future: future.exception() is None and self._report(future.result()))
+
+    def finish(self, audio) -> str:
+        samples = np.frombuffer(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2), dtype=np.int16)
+        self.closed = True  # stt_finish drops the recognizer
+        return self.backend.pool.run("stt_finish", self.key, self.backend.name, samples=samples,
+                                     worker=self.worker, timeout=self.backend.timeout)
+
+    def close(self):
+        """Drop the worker's recognizer for an utterance that will never be finished."""
+        if not self.closed:
+            self.closed = True
+            self.backend.pool.submit("stt_discard", self.key, worker=self.worker)
+
+
+# ------------- Jobs (run in the workers) -------------
+
+_state = {}  # per worker process: loaded templates, detectors, recognizers, the speech engine
+
+
+def _templates(path, threshold):
+    if ("templates", path) not in _state:
+        _state[("templates", path)] = TemplateWakeWordDetector.from_directory(path, threshold).templates
+    return _state[("templates", path)]
+
+
+def _stream_detector(key, templates, threshold):
+    if ("wake", key) not in _state:
+        _state[("wake", key)] = TemplateWakeWordDetector(_templates(templates, threshold), threshold)
+    return _state[("wake", key)]
+
+
+def wake_word_load(templates, threshold=0.75):
+    return len(_templates(templates, threshold))
+
+
+def wake_word(samples, key, templates, threshold=0.75):
+    """Feed one stream's detector: (fired, last score, samples seen)."""
+    detector = _stream_detector(key, templates, threshold)
+    return detector.process(samples), float(detector.last_score), detector.samples_seen
+
+
+def wake_word_reset(key):
+    detector = _state.get(("wake", key))
+    if detector is not None:
+        detector.reset()
+
+
+def score_wake_word(samples, templates, threshold=0.75):
+    """Detections (seconds) and the best score over a whole clip."""
+    detector = TemplateWakeWordDetector(_templates(templates, threshold), threshold)
+    detections, best = [], 0.0
+    for start in range(0, len(samples), FRAME_SAMPLES):
+        fired = detector.process(samples[start:start + FRAME_SAMPLES])
+        best = max(best, detector.last_score)
+        while fired:
+            detections.append(detector.samples_seen / SAMPLE_RATE)
+            fired = detector.process(b'')
+    return detections, float(best)
+
+
+def extract_features(samples):
+    """Log-mel features of a clip, silence trimmed."""
+    if "extractor" not in _state:
+        _state["extractor"] = FeatureExtractor()
+    return _state["extractor"].clip(samples)
+
+
+def _stt_session(key, backend):
+    if ("stt", key) not in _state:
+        from stt import create_backend
+        if ("backend", backend) not in _state:
+            _state[("backend", backend)] = create_backend(backend)
+        _state[("stt", key)] = _state[("backend", backend)].session()
+    return _state[("stt", key)]
+
+
+def stt_accept(samples, key, backend):
+    session = _stt_session(key, backend)
+    session.accept(samples.copy())
+    return session.partial
+
+
+def stt_finish(samples, key, backend):
+    import speech_recognition as sr
+    session = _stt_session(key, backend)
+    del _state[("stt", key)]
+    return session.finish(sr.AudioData(samples.tobytes(), SAMPLE_RATE, 2))
+
+
+def stt_discard(key):
+    """Forget an abandoned session; returns how many sessions this worker still holds."""
+    _state.pop(("stt", key), None)
+    return stt_sessions()
+
+
+def stt_sessions():
+    return sum(1 for name in _state if name[0] == "stt")
+
+
+def render_speech(text, path, rate=150, voice=None):
+    """Render text to a WAV file with this worker's own speech engine."""
+    if "tts" not in _state:
+        import pyttsx3
+        _state["tts"] = pyttsx3.init()
+    engine = _state["tts"]
+    engine.setProperty('rate', rate)
+    if voice:
+        engine.setProperty('voice', voice)
+    engine.save_to_file(text, path)
+    engine.runAndWait()
+    return path
+
+
+JOBS = {f.__name__: f for f in (wake_word_load, wake_word, wake_word_reset, score_wake_word, extract_features,
+                                stt_accept, stt_finish, stt_discard, stt_sessions, render_speech)}
+
+
+def _resolve(name):
+    if name in JOBS:
+        return JOBS[name]
+    module, _, function = name.partition(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def _attach(name):
+    shm = SharedMemory(name=name)
+    # The pool owns the memory; keep this process's tracker from unlinking it on exit
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def worker_main(index, fd, slot_name, slot_samples, heartbeat_name):
+    conn = connection.Connection(fd)
+    slot = _attach(slot_name)
+    samples = np.ndarray((slot_samples,), dtype=np.int16, buffer=slot.buf)
+    heartbeats = _attach(heartbeat_name)
+    beats = np.ndarray((len(heartbeats.buf) // 8,), dtype=np.float64, buffer=heartbeats.buf)
+
+    def beat():
+        while True:
+            beats[index] = time.time()
+            time.sleep(0.5)
+
+    threading.Thread(target=beat, daemon=True).start()
+    conn.send((0, True, os.getpid()))  # ready
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        job_id, name, args, n = message
+        try:
+            func = _resolve(name)
+            result = func(samples[:n], *args) if n >= 0 else func(*args)
+            reply = (job_id, True, result)
+        except Exception as e:
+            reply = (job_id, False, e)
+        try:
+            conn.send(reply)
+        except Exception:  # a result or exception that can't be pickled
+            conn.send((job_id, False, RuntimeError(f"{name}: {reply[2]!r}")))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Jarvis audio worker (started by AudioWorkerPool)")
+    parser.add_argument('--worker', type=int, required=True)
+    parser.add_argument('fd', type=int)
+    parser.add_argument('slot')
+    parser.add_argument('slot_samples', type=int)
+    parser.add_argument('heartbeats')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s audio-worker-{args.worker} %(levelname)s %(message)s")
+    worker_main(args.worker, args.fd, args.slot, args.slot_samples, args.heartbeats)
@@ -0,0 +1,163 @@
+"""
+Edge-triggered push button for Jarvis.
+
+The button pin is watched with GPIO.add_event_detect on both edges instead of
+being polled, so a press is seen the moment it happens, however short. Edges
+are debounced in software: after an accepted change, further edges are
+ignored for `debounce` seconds, then the pin is read once more to settle on
+its real level.
+
+Events passed to on_event(kind, timestamp), timestamps from time.perf_counter():
+- "press": straight away on the falling edge (start listening without delay)
+- "release"
+- "long_press": still held after `long_press` seconds
+- "double_press": a press within `double_press` seconds of the previous release
+
+FakeGPIO implements the part of the RPi.GPIO API used here, so the button
+can be driven from tests on any machine.
+"""
+
+import time
+import queue
+import logging
+import threading
+
+
+class Button:
+    def __init__(self, gpio, pin, on_event, debounce=0.02, long_press=0.8, double_press=0.35):
+        self.gpio = gpio
+        self.pin = pin
+        self.on_event = on_event
+        self.debounce = debounce
+        self.long_press = long_press
+        self.double_press = double_press
+        self.pressed = False
+        self.pressed_at = None
+        self.released_at = None
+        self._changed_at = float("-inf")
+        self._long_timer = None
+        self._lock = threading.Lock()
+        gpio.setup(pin, gpio.IN, pull_up_down=gpio.PUD_UP)
+        self.pressed = gpio.input(pin) == gpio.LOW
+        gpio.add_event_detect(pin, gpio.BOTH, callback=self._edge)
+
+    def _edge(self, channel):
+        """GPIO callback thread: an edge was seen on the pin."""
+        now = time.perf_counter()
+        with self._lock:
+            if now - self._changed_at < self.debounce:
+                return  # contact bounce; _settle() checks the final level
+            self._apply(self.gpio.input(self.pin) == self.gpio.LOW, now)
+
+    def _settle(self):
+        """After the debounce window, make sure the state matches the pin."""
+        with self._lock:
+            pressed = self.gpio.input(self.pin) == self.gpio.LOW
+            if pressed != self.pressed:
+                self._apply(pressed, time.perf_counter())
+
+    def _apply(self, pressed, now):
+        if pressed == self.pressed:
+            return
+        self.pressed = pressed
+        self._changed_at = now
+        timer = threading.Timer(self.debounce, self._settle)
+        timer.daemon = True
+        timer.start()
+        if pressed:
+            double = self.released_at is not None and now - self.released_at <= self.double_press
+            self.pressed_at = now
+            self._emit("double_press" if double else "press", now)
+            self._long_timer = threading.Timer(self.long_press, self._check_long, args=(now,))
+            self._long_timer.daemon = True
+            self._long_timer.start()
+        else:
+            if self._long_timer is not None:
+                self._long_timer.cancel()
+            # A long press ends the sequence, it does not start a double press
+            long = self.pressed_at is not None and now - self.pressed_at >= self.long_press
+            self.released_at = None if long else now
+            self._emit("release", now)
+
+    def _check_long(self, pressed_at):
+        with self._lock:
+            if self.pressed and self.pressed_at == pressed_at:
+                self._emit("long_press", time.perf_counter())
+
+    def _emit(self, kind, at):
+        try:
+            self.on_event(kind, at)
+        except Exception as e:
+            logging.error(f"Button handler failed on {kind}: {e}")
+
+    def close(self):
+        if self._long_timer is not None:
+            self._long_timer.cancel()
+        self.gpio.remove_event_detect(self.pin)
+
+
+class FakeGPIO:
+    """In-memory stand-in for RPi.GPIO; callbacks run on one thread, like the real library."""
+
+    BCM = "BCM"
+    IN, OUT = "IN", "OUT"
+    PUD_UP, PUD_DOWN = "PUD_UP", "PUD_DOWN"
+    RISING, FALLING, BOTH = "RISING", "FALLING", "BOTH"
+    LOW, HIGH = 0, 1
+
+    def __init__(self):
+        self.levels = {}
+        self.callbacks = {}
+        self._events = queue.Queue()
+        threading.Thread(target=self._run, name="fake-gpio", daemon=True).start()
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        self.levels.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else self.LOW)
+
+    def input(self, pin):
+        return self.levels[pin]
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        self.callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        self.callbacks.pop(pin, None)
+
+    def cleanup(self):
+        self.callbacks.clear()
+
+    # ---- driving the fake pin ----
+
+    def set(self, pin, level):
+        """Change a pin's level and fire the matching edge callback."""
+        if self.levels.get(pin) == level:
+            return
+        self.levels[pin] = level
+        edge, callback = self.callbacks.get(pin, (None, None))
+        if callback and edge in (self.BOTH, self.RISING if level else self.FALLING):
+            self._events.put((callback, pin))
+
+    def press(self, pin, bounces=0, bounce_interval=0.001):
+        """Pull the pin low, optionally with contact bounce first."""
+        for _ in range(bounces):
+            self.set(pin, self.LOW)
+            time.sleep(bounce_interval)
+            self.set(pin, self.HIGH)
+            time.sleep(bounce_interval)
+        self.set(pin, self.LOW)
+
+    def release(self, pin, bounces=0, bounce_interval=0.001):
+        for _ in range(bounces):
+            self.set(pin, self.HIGH)
+            time.sleep(bounce_interval)
+            self.set(pin, self.LOW)
+            time.sleep(bounce_interval)
+        self.set(pin, self.HIGH)
+
+    def _run(self):
+        while True:
+            callback, pin = self._events.get()
+            callback(pin)
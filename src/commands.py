@@ -0,0 +1,109 @@
+"""
+Built-in Jarvis commands: math, Wikipedia and web search, plus the command
+identifier that routes utterances to them.
+
+Wikipedia and DuckDuckGo answers go through a ResponseCache, so repeated
+questions are answered from memory or disk instead of the network, and
+requests that do go out share the pooled connections of `http_client`.
+"""
+
+import os
+
+import wikipedia
+
+from response_cache import ResponseCache, HOUR, DAY
+from http_client import HttpClient
+from intent_router import IntentRouter
+from safe_math import evaluate, format_number, MathError
+
+# ------------- Configuration -----------------
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "responses.db")
+WIKI_CACHE_TTL = float(os.getenv("WIKI_CACHE_TTL", 7 * DAY))  # encyclopedia answers rarely change
+WEB_CACHE_TTL = float(os.getenv("WEB_CACHE_TTL", DAY))
+NOT_FOUND_CACHE_TTL = float(os.getenv("NOT_FOUND_CACHE_TTL", HOUR))
+DUCKDUCKGO_URL = os.getenv("DUCKDUCKGO_URL", "https://api.duckduckgo.com/")
+if os.getenv("WIKIPEDIA_API_URL"):
+    wikipedia.wikipedia.API_URL = os.getenv("WIKIPEDIA_API_URL")
+else:
+    wikipedia.set_lang("en")
+
+response_cache = ResponseCache(RESPONSE_CACHE_DB)
+
+# One keep-alive connection pool for every outbound service (jarvis.py adds OpenAI)
+http_client = HttpClient()
+http_client.register("duckduckgo", DUCKDUCKGO_URL, concurrency=2, retries=2, timeout=5)
+http_client.register("wikipedia", wikipedia.wikipedia.API_URL, concurrency=2, retries=2, timeout=5)
+ddg_session = http_client.session("duckduckgo")
+wikipedia.wikipedia.requests = http_client.session("wikipedia")  # the library only calls requests.get
+
+# -- Math Expression Calculator --
+
+class MathExpressionCalculator:
+    @staticmethod
+    def calculate(expression: str):
+        # Typed or spoken ("five times seven"); evaluated within fixed size and step limits, never eval()
+        try:
+            return f"The answer is {format_number(evaluate(expression))}."
+        except MathError as e:
+            return f"Could not calculate expression. {e}"
+
+# -- Wikipedia Search --
+
+@response_cache.cached("wikipedia", ttl=WIKI_CACHE_TTL, negative_ttl=NOT_FOUND_CACHE_TTL)
+def wiki_lookup(query: str):
+    """Two-sentence summary, or None if there is no (unambiguous) article."""
+    try:
+        return wikipedia.summary(query, sentences=2)
+    except (wikipedia.PageError, wikipedia.DisambiguationError):
+        return None
+
+WIKI_NOT_FOUND = "I couldn't find anything on Wikipedia for that."
+
+def wiki_search(query: str):
+    try:
+        summary = wiki_lookup(query)
+    except Exception:
+        summary = None
+    return summary or WIKI_NOT_FOUND
+
+# -- Random Web Search (DuckDuckGo Instant Answer API, free) --
+
+@response_cache.cached("duckduckgo", ttl=WEB_CACHE_TTL, negative_ttl=NOT_FOUND_CACHE_TTL)
+def ddg_lookup(query: str):
+    """Instant answer abstract, or None if DuckDuckGo has none."""
+    params = {"q": query, "format": "json", "no_redirect": 1, "skip_disambig": 1}
+    response = ddg_session.get(DUCKDUCKGO_URL, params=params)
+    response.raise_for_status()
+    return response.json().get("AbstractText") or None
+
+WEB_SEARCH_FAILED = "I couldn't perform a web search right now."
+WEB_NOT_FOUND = "No instant answer found online."
+
+def random_web_search(query: str):
+    try:
+        abstract = ddg_lookup(query)
+    except Exception:
+        return WEB_SEARCH_FAILED
+    return abstract or WEB_NOT_FOUND
+
+def found(answer):
+    """Quality check for lookup answers: False for the 'nothing found' replies."""
+    return bool(answer) and answer not in (WIKI_NOT_FOUND, WEB_SEARCH_FAILED, WEB_NOT_FOUND)
+
+# -- Command Identifier --
+
+class CommandIdentifier:
+    def __init__(self):
+        # intents, their handlers and trigger phrases, compiled into one automaton
+        self.router = IntentRouter()
+        self.router.add_synonym("compute", "calculate")
+        self.router.register("calculate", MathExpressionCalculator.calculate, ["calculate", "work out"])
+        self.router.register("wikipedia", wiki_search, ["what is", "who is", "who was", "tell me about"])
+        self.router.register("web search", random_web_search,
+                             ["search", "search for", "search the web for", "look up", "google"])
+        # add more intents here
+        self.router.compile()
+
+    def identify_command(self, text):
+        # Return function and remainder text
+        return self.router.identify(text)
@@ -0,0 +1,164 @@
+"""
+Multi-turn conversation memory for Jarvis.
+
+Each session (voice, dashboard) keeps the exchanges so far, so "and how tall
+is it?" can follow "what is the Eiffel Tower?". Sending the whole history
+with every request would make each one slower and more expensive than the
+last, so every prompt is kept under a token budget:
+
+- tokens are counted locally (count_tokens), no API call or tokenizer needed;
+- once the turns that have not been summarized grow past `summarize_at`
+  tokens, the older ones are folded into a short running summary by a
+  background thread, keeping the last `keep_recent` turns word for word.
+  The conversation never waits for it;
+- messages() always fits the budget: if the summary has not caught up yet
+  (or the summarizer failed), the oldest turns are left out of the prompt.
+
+A session that has been idle for `idle_timeout` seconds starts over.
+"""
+
+import re
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+TOKEN = re.compile(r"\w+|[^\w\s]")
+MESSAGE_OVERHEAD = 4  # role and separators the API adds to every message
+
+
+def count_tokens(text):
+    """Local estimate of BPE tokens: a word or punctuation mark each, long words a token per 4 characters."""
+    return sum((len(piece) + 3) // 4 for piece in TOKEN.findall(text))
+
+
+def message_tokens(message):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def summary_message(summary):
+    return {"role": "system", "content": f"Conversation so far: {summary}"}
+
+
+class Session:
+    def __init__(self):
+        self.turns = []           # [(user message, assistant message, tokens)], oldest first
+        self.summary = ""         # running summary of the turns no longer kept
+        self.summary_tokens = 0
+        self.summarizing = False
+        self.generation = 0       # bumped on reset, so a late summary of the old conversation is dropped
+        self.last_active = time.monotonic()
+
+    def reset(self):
+        self.turns = []
+        self.summary = ""
+        self.summary_tokens = 0
+        self.summarizing = False
+        self.generation += 1
+
+
+class ConversationMemory:
+    def __init__(self, system_prompt, budget=1500, summarize=None, summarize_at=None, keep_recent=4,
+                 idle_timeout=300.0):
+        """
+        `summarize(summary, [(question, answer), ...])` returns the new running
+        summary, or None if it failed; without it old turns are only dropped.
+        """
+        self.system = {"role": "system", "content": system_prompt}
+        self.budget = budget                    # prompt tokens per request, including the question
+        self.summarize = summarize
+        self.summarize_at = summarize_at or budget // 2
+        self.keep_recent = keep_recent
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarize")
+        self.summaries = 0
+        self.summary_failures = 0
+        self.trimmed = 0                        # turns left out of a prompt to stay within budget
+        self.last_prompt_tokens = 0
+        self.max_prompt_tokens = 0
+
+    def _session(self, key):
+        session = self.sessions.get(key)
+        if session is None:
+            session = self.sessions[key] = Session()
+        elif time.monotonic() - session.last_active > self.idle_timeout:
+            logging.info("Conversation '%s' idle for %.0f s, starting over", key,
+                         time.monotonic() - session.last_active)
+            session.reset()
+        session.last_active = time.monotonic()
+        return session
+
+    def messages(self, key, question):
+        """The messages for asking `question` in session `key`, within the token budget."""
+        user = {"role": "user", "content": question}
+        with self.lock:
+            session = self._session(key)
+            used = message_tokens(self.system) + message_tokens(user)
+            context = []
+            if session.summary and used + session.summary_tokens <= self.budget:
+                context.append(summary_message(session.summary))
+                used += session.summary_tokens
+            recent = []
+            for question_message, answer_message, tokens in reversed(session.turns):
+                if used + tokens > self.budget:
+                    break
+                recent[:0] = [question_message, answer_message]
+                used += tokens
+            self.trimmed += len(session.turns) - len(recent) // 2
+            self.last_prompt_tokens = used
+            self.max_prompt_tokens = max(self.max_prompt_tokens, used)
+        return [self.system, *context, *recent, user]
+
+    def add(self, key, question, answer):
+        """Remember an exchange; may start summarizing older turns in the background."""
+        question_message = {"role": "user", "content": question}
+        answer_message = {"role": "assistant", "content": answer}
+        with self.lock:
+            session = self._session(key)
+            session.turns.append((question_message, answer_message,
+                                  message_tokens(question_message) + message_tokens(answer_message)))
+            older = session.turns[:-self.keep_recent] if self.keep_recent else session.turns
+            if (self.summarize is None or session.summarizing or not older
+                    or sum(t[2] for t in session.turns) < self.summarize_at):
+                return
+            session.summarizing = True
+            pairs = [(q["content"], a["content"]) for q, a, _ in older]
+            job = (session, session.generation, session.summary, pairs)
+        self._summarizer.submit(self._summarize, *job)
+
+    def _summarize(self, session, generation, summary, pairs):
+        start = time.perf_counter()
+        try:
+            new_summary = self.summarize(summary, pairs)
+        except Exception as e:
+            logging.error("Conversation summary failed: %s", e)
+            new_summary = None
+        with self.lock:
+            if session.generation != generation:
+                return
+            session.summarizing = False
+            if not new_summary:
+                self.summary_failures += 1
+                return
+            session.summary = new_summary
+            session.summary_tokens = message_tokens(summary_message(new_summary))
+            del session.turns[:len(pairs)]  # turns are only ever appended, so these are still the oldest
+            self.summaries += 1
+        logging.info("Summarized %d turns into %d tokens in %.0f ms", len(pairs), session.summary_tokens,
+                     (time.perf_counter() - start) * 1000)
+
+    def reset(self, key):
+        """Forget session `key`."""
+        with self.lock:
+            if key in self.sessions:
+                self.sessions[key].reset()
+
+    def stats(self):
+        with self.lock:
+            return {"sessions": len(self.sessions),
+                    "turns": sum(len(s.turns) for s in self.sessions.values()),
+                    "summaries": self.summaries, "summary_failures": self.summary_failures,
+                    "trimmed": self.trimmed, "last_prompt_tokens": self.last_prompt_tokens,
+                    "max_prompt_tokens": self.max_prompt_tokens, "budget": self.budget}
@@ -0,0 +1,224 @@
+"""
+Event-driven core for Jarvis.
+
+Every input is an event source feeding one asyncio dispatcher: the wake word
+detector and the button run in their own threads and post() events, dashboard
+commands are posted from the Flask thread, and timers are scheduled on the
+loop. Each event runs its handler in a task of its own, so a slow Wikipedia
+or OpenAI lookup never stops the button or the dashboard from being served.
+
+Handlers belong to an optional group. Handlers in a group run one at a time
+(there is only one microphone), and a handler registered with preempt=True
+cancels whatever its group is running (barge-in). The group can also be
+worked out from each event, e.g. one group per satellite room, so rooms
+don't wait for each other. Every handler can have a timeout, and blocking
+calls are moved to threads with run_blocking(), which has its own timeout.
+A thread can't be cancelled, so a blocking call that should stop when its
+handler is preempted (capturing a command) runs with run_cancellable(),
+which hands it a threading.Event to check.
+"""
+
+import time
+import asyncio
+import logging
+import functools
+import itertools
+import threading
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+
+@dataclass
+class Event:
+    kind: str
+    data: object = None
+    created: float = field(default_factory=time.perf_counter)
+
+
+@dataclass
+class _Handler:
+    func: object
+    timeout: float = None
+    group: object = None   # a name, or a function of the event (e.g. one group per room)
+    preempt: bool = False
+
+
+class HandlerStats:
+    """Per event kind: how long events waited for their handler, and how they ended."""
+
+    def __init__(self):
+        self.count = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.dispatch_total = 0.0
+        self.dispatch_max = 0.0
+        self.duration_total = 0.0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+            "dispatch_ms_mean": round(self.dispatch_total / self.count * 1000, 3) if self.count else 0.0,
+            "dispatch_ms_max": round(self.dispatch_max * 1000, 3),
+            "duration_ms_mean": round(self.duration_total / self.completed * 1000, 1) if self.completed else 0.0,
+        }
+
+
+class Dispatcher:
+    def __init__(self, max_workers=8):
+        self.handlers = {}
+        self.stats = {}
+        self.loop = None
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="handler")
+        self._group_locks = {}
+        self._group_tasks = {}   # group -> set of running tasks
+        self._tasks = set()
+        self._timers = []
+        self._seq = itertools.count()
+
+    # ---- registration ----
+
+    def on(self, kind, timeout=None, group=None, preempt=False):
+        """Decorator: handle events of `kind` with an async (or plain) function taking the event."""
+        def decorator(func):
+            self.handlers[kind] = _Handler(func, timeout, group, preempt)
+            return func
+        return decorator
+
+    def every(self, interval, kind, data=None):
+        """Post an event of `kind` every `interval` seconds once running."""
+        self._timers.append((interval, kind, data))
+
+    # ---- posting events ----
+
+    def post(self, kind, data=None, created=None):
+        """Thread-safe: queue an event from any thread (audio, GPIO, Flask).
+
+        created is when the event really happened (time.perf_counter()), if earlier than now.
+        """
+        event = Event(kind, data) if created is None else Event(kind, data, created)
+        if self.loop is None or self.loop.is_closed():
+            logging.warning(f"Dispatcher not running, dropped '{kind}' event")
+            return event
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+        return event
+
+    def post_nowait(self, kind, data=None):
+        """Queue an event from code already running on the loop."""
+        event = Event(kind, data)
+        self.queue.put_nowait(event)
+        return event
+
+    # ---- running ----
+
+    async def run_blocking(self, func, *args, timeout=None, **kwargs):
+        """Run a blocking call in the handler thread pool, giving up after `timeout` seconds.
+
+        On timeout or cancellation the thread finishes on its own and its result is dropped.
+        """
+        future = self.loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        return await asyncio.wait_for(future, timeout)
+
+    async def run_cancellable(self, func, *args, timeout=None, **kwargs):
+        """run_blocking() for a call taking a `cancelled` threading.Event, which it should check while it works.
+
+        The event is set when the handler is cancelled (preempted) or the call times out, so the thread
+        stops instead of running on.
+        """
+        cancelled = threading.Event()
+        try:
+            return await self.run_blocking(func, *args, timeout=timeout, cancelled=cancelled, **kwargs)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            cancelled.set()
+            raise
+
+    def cancel_group(self, group):
+        """Cancel everything running in a group; returns how many tasks were cancelled."""
+        tasks = [t for t in self._group_tasks.get(group, ()) if not t.done()]
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def busy(self, group):
+        return any(not t.done() for t in self._group_tasks.get(group, ()))
+
+    async def run(self):
+        """Dispatch events until stop() is called."""
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        timers = [asyncio.create_task(self._timer(*timer)) for timer in self._timers]
+        try:
+            while True:
+                event = await self.queue.get()
+                if event is None:
+                    break
+                handler = self.handlers.get(event.kind)
+                if handler is None:
+                    logging.debug("No handler for '%s' event", event.kind)
+                    continue
+                group = handler.group(event) if callable(handler.group) else handler.group
+                if group is not None and handler.preempt:
+                    self.cancel_group(group)
+                task = asyncio.create_task(self._handle(handler, event, group), name=f"{event.kind}-{next(self._seq)}")
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                if group is not None:
+                    group_tasks = self._group_tasks.setdefault(group, set())
+                    group_tasks.add(task)
+                    task.add_done_callback(group_tasks.discard)
+        finally:
+            for task in timers + list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*timers, *self._tasks, return_exceptions=True)
+
+    def stop(self):
+        """Thread-safe: finish the current dispatch loop."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+    async def _timer(self, interval, kind, data):
+        while True:
+            await asyncio.sleep(interval)
+            self.post_nowait(kind, data)
+
+    async def _handle(self, handler, event, group=None):
+        stats = self.stats.setdefault(event.kind, HandlerStats())
+        stats.count += 1
+        lock = None
+        if group is not None:
+            lock = self._group_locks.setdefault(group, asyncio.Lock())
+        acquired = False
+        try:
+            if lock is not None:
+                await lock.acquire()
+                acquired = True
+            started = time.perf_counter()
+            dispatch = started - event.created
+            stats.dispatch_total += dispatch
+            stats.dispatch_max = max(stats.dispatch_max, dispatch)
+            result = handler.func(event)
+            if asyncio.iscoroutine(result):
+                await asyncio.wait_for(result, handler.timeout)
+            stats.completed += 1
+            stats.duration_total += time.perf_counter() - started
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logging.warning(f"Handler for '{event.kind}' timed out")
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            logging.info("Handler for '%s' cancelled", event.kind)
+        except Exception as e:
+            stats.errors += 1
+            logging.error(f"Handler for '{event.kind}' failed: {e}")
+        finally:
+            if acquired:
+                lock.release()
+
+    def summary(self):
+        return {kind: stats.as_dict() for kind, stats in self.stats.items()}
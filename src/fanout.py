@@ -0,0 +1,105 @@
+"""
+Speculative fan-out: ask several sources at once, keep the first good answer.
+
+A question like "what is X" can be answered by Wikipedia, a web search or
+GPT. Rather than asking one source and giving up (or asking them one after
+another), FanOut.first() starts every candidate concurrently, checks each
+answer against its candidate's quality predicate as it arrives, returns the
+first acceptable one and cancels the rest. The whole thing is bounded by a
+latency budget.
+
+Expensive candidates can be given a `delay` (hedging): they only start if
+no acceptable answer has arrived by then - or straight away once every
+candidate already running has failed.
+
+Blocking handlers run through run_blocking (Dispatcher.run_blocking), so a
+cancelled candidate's thread finishes on its own and its result is dropped.
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Candidate:
+    source: str                  # name recorded as the answer's origin
+    func: object                 # blocking callable without arguments (functools.partial)
+    accept: object = bool        # quality predicate: accept(answer) -> True if good enough
+    delay: float = 0.0           # seconds to wait for the others before starting this one
+
+
+@dataclass
+class FanOutResult:
+    answer: object = None
+    source: str = None           # winning candidate, None if no answer was acceptable
+    elapsed: float = 0.0
+    outcomes: dict = field(default_factory=dict)  # source -> won/rejected/error/cancelled/skipped
+
+
+class FanOut:
+    def __init__(self, run_blocking, budget=8.0):
+        self.run_blocking = run_blocking
+        self.budget = budget
+        self.stats = {}          # source -> outcome -> count
+
+    async def first(self, candidates, budget=None):
+        """Run candidates concurrently; the first answer its predicate accepts wins."""
+        budget = self.budget if budget is None else budget
+        start = time.perf_counter()
+        result = FanOutResult(outcomes={c.source: "skipped" for c in candidates})
+        hurry = asyncio.Event()  # set when everything running has failed: start the delayed ones now
+        started = set()
+
+        async def attempt(candidate):
+            if candidate.delay:
+                try:
+                    await asyncio.wait_for(hurry.wait(), candidate.delay)
+                except asyncio.TimeoutError:
+                    pass
+            started.add(candidate.source)
+            return await self.run_blocking(candidate.func)
+
+        tasks = {asyncio.create_task(attempt(c)): c for c in candidates}
+        pending = set(tasks)
+        try:
+            while pending and result.source is None:
+                remaining = budget - (time.perf_counter() - start)
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: candidates.index(tasks[t])):
+                    candidate = tasks[task]
+                    if task.exception() is not None:
+                        result.outcomes[candidate.source] = "error"
+                        logging.info("Fan-out: %s failed: %s", candidate.source, task.exception())
+                    elif result.source is None and candidate.accept(task.result()):
+                        result.answer, result.source = task.result(), candidate.source
+                        result.outcomes[candidate.source] = "won"
+                    else:
+                        result.outcomes[candidate.source] = "rejected"
+                if result.source is None and all(tasks[t].source not in started for t in pending):
+                    hurry.set()
+        finally:
+            for task in pending:
+                task.cancel()
+                source = tasks[task].source
+                result.outcomes[source] = "cancelled" if source in started else "skipped"
+            await asyncio.gather(*pending, return_exceptions=True)
+            result.elapsed = time.perf_counter() - start
+            for source, outcome in result.outcomes.items():
+                counts = self.stats.setdefault(source, {})
+                counts[outcome] = counts.get(outcome, 0) + 1
+        logging.info("Fan-out: %s in %.0f ms (%s)", result.source or "no acceptable answer",
+                     result.elapsed * 1000, ", ".join(f"{s} {o}" for s, o in result.outcomes.items()))
+        return result
+
+    def prometheus(self, prefix="jarvis"):
+        lines = [f"# HELP {prefix}_fanout_candidates_total Fan-out candidates by source and how they ended.",
+                 f"# TYPE {prefix}_fanout_candidates_total counter"]
+        for source, counts in sorted(self.stats.items()):
+            lines += [f'{prefix}_fanout_candidates_total{{source="{source}",outcome="{outcome}"}} {n}'
+                      for outcome, n in sorted(counts.items())]
+        return "\n".join(lines) + "\n"
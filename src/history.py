@@ -0,0 +1,207 @@
+"""
+Command and response history for Jarvis.
+
+Every interaction gets an id when its command arrives; the response is
+attached to the same id when it is known, with the latency in between.
+Both halves are appended to a JSON-lines file as they happen, so the
+history survives restarts and never has to be rewritten, and the newest
+interactions are also kept in a fixed-size ring in memory. Recording never
+blocks on a full buffer: the ring simply forgets its oldest entries, which
+stay readable from disk.
+
+The dashboard reads the history a page at a time (newest first, continuing
+from the last id it has) and searches it through a word index built from
+the file when it is first used.
+"""
+
+import os
+import re
+import json
+import time
+import bisect
+import logging
+import threading
+from collections import deque
+
+WORD = re.compile(r"[a-z0-9']+")
+
+
+def words(text):
+    return set(WORD.findall(text.lower().replace("'", ""))) if text else set()
+
+
+class History:
+    def __init__(self, path="history.jsonl", recent=200):
+        self.path = path
+        self.recent = deque(maxlen=recent)  # newest entries; appends drop the oldest
+        self.ids = []                       # every id, ascending
+        self.offsets = {}                   # id -> file offsets of its lines
+        self.index = {}                     # word -> ascending ids containing it
+        self.next_id = 1
+        self.lock = threading.Lock()        # writers and the index; reading the ring needs none
+        self._started = {}                  # id -> perf_counter() when the command arrived
+        self._file = None
+        self._torn_tail = False             # the file ends in a line cut off by a crash
+        self._loaded = False
+
+    def _load(self):
+        """Read the file on first use to rebuild ids, offsets, the word index and the ring."""
+        with self.lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as f:
+                    offset = 0
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                            self._add(record, offset)
+                        except (ValueError, KeyError):
+                            logging.warning(f"Skipping damaged line in {self.path}")
+                        offset += len(line)
+                    self._torn_tail = offset > 0 and not line.endswith(b"\n")
+                self.recent.extend(self._entries(self.ids[-self.recent.maxlen:]))
+            self._loaded = True
+
+    def _add(self, record, offset):
+        """Index one line of the file."""
+        iid = record["id"]
+        if iid not in self.offsets:
+            self.offsets[iid] = []
+            self.ids.append(iid)
+            self.next_id = max(self.next_id, iid + 1)
+        self.offsets[iid].append(offset)
+        for word in words(record.get("command")) | words(record.get("response")):
+            ids = self.index.setdefault(word, [])
+            if not ids or ids[-1] != iid:
+                ids.append(iid)
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+            if self._torn_tail:
+                self._file.write(b"\n")  # don't extend a line cut off by a crash
+                self._torn_tail = False
+        offset = self._file.tell()
+        self._file.write(json.dumps(record).encode("utf-8") + b"\n")
+        self._file.flush()
+        self._add(record, offset)
+
+    def _read(self, iid, f=None):
+        """One interaction from the file (`f`: the file already open for reading)."""
+        if f is None:
+            with open(self.path, "rb") as f:
+                return self._read(iid, f)
+        entry = {"id": iid, "source": None, "command": None, "started": None,
+                 "response": None, "answered_by": None, "finished": None, "latency_ms": None}
+        for offset in self.offsets[iid]:
+            f.seek(offset)
+            record = json.loads(f.readline())
+            if "command" in record:
+                entry.update(source=record.get("source"), command=record["command"], started=record["at"])
+            else:
+                entry.update(response=record.get("response"), answered_by=record.get("answered_by"),
+                             finished=record["at"], latency_ms=record.get("latency_ms"))
+        return entry
+
+    # ---- recording ----
+
+    def start(self, command, source="voice"):
+        """Record a command; returns its entry, whose "id" pairs it with the response."""
+        self._load()
+        with self.lock:
+            iid = self.next_id
+            self.next_id += 1
+            entry = {"id": iid, "source": source, "command": command, "started": time.time(),
+                     "response": None, "answered_by": None, "finished": None, "latency_ms": None}
+            self._started[iid] = time.perf_counter()
+            self._append({"id": iid, "command": command, "source": source, "at": entry["started"]})
+            self.recent.append(entry)
+        return dict(entry)
+
+    def finish(self, iid, response, answered_by=None):
+        """
+        Record the response to interaction `iid` (None if it was cancelled) and the
+        source that gave it; returns the entry.
+        """
+        self._load()
+        with self.lock:
+            started = self._started.pop(iid, None)
+            latency = round((time.perf_counter() - started) * 1000) if started is not None else None
+            record = {"id": iid, "response": response, "answered_by": answered_by, "at": time.time(),
+                      "latency_ms": latency}
+            self._append(record)
+            entry = next((e for e in reversed(self.recent) if e["id"] == iid), None)
+            if entry is None:
+                return self._read(iid)
+            entry.update(response=response, answered_by=answered_by, finished=record["at"], latency_ms=latency)
+            return dict(entry)
+
+    # ---- reading ----
+
+    def last_response(self):
+        """The most recent response from memory, or None."""
+        for entry in reversed(list(self.recent)):
+            if entry["response"]:
+                return entry["response"]
+        return None
+
+    def _entries(self, ids):
+        in_memory = {e["id"]: e for e in list(self.recent)}
+        if all(i in in_memory for i in ids):
+            return [dict(in_memory[i]) for i in ids]
+        with open(self.path, "rb") as f:
+            return [dict(in_memory[i]) if i in in_memory else self._read(i, f) for i in ids]
+
+    def page(self, before=None, limit=20):
+        """
+        Up to `limit` interactions older than id `before` (newest first):
+        {"items": [...], "next": id to pass as `before` for the next page, or None}.
+        """
+        self._load()
+        with self.lock:
+            end = len(self.ids) if before is None else bisect.bisect_left(self.ids, before)
+            ids = self.ids[max(0, end - limit):end][::-1]
+            more = end > limit
+            entries = self._entries(ids)
+        return {"items": entries, "next": ids[-1] if more and ids else None}
+
+    def search(self, query, before=None, limit=20):
+        """Interactions whose command or response contains every word of `query`, paged like page()."""
+        self._load()
+        terms = words(query)
+        if not terms:
+            return {"items": [], "next": None}
+        with self.lock:
+            postings = sorted((self.index.get(t, []) for t in terms), key=len)
+            rarest, rest = postings[0], postings[1:]
+            end = len(rarest) if before is None else bisect.bisect_left(rarest, before)
+            his = [len(p) for p in rest]  # the other lists are only searched below the last id checked
+            ids = []
+            for i in range(end - 1, -1, -1):  # newest first through the rarest word's ids
+                iid = rarest[i]
+                found = True
+                for k, p in enumerate(rest):
+                    j = bisect.bisect_left(p, iid, 0, his[k])
+                    his[k] = j
+                    if j == len(p) or p[j] != iid:
+                        found = False
+                        break
+                if found:
+                    ids.append(iid)
+                    if len(ids) > limit:
+                        break
+            more = len(ids) > limit
+            ids = ids[:limit]
+            entries = self._entries(ids)
+        return {"items": entries, "next": ids[-1] if more else None}
+
+    def __len__(self):
+        self._load()
+        return len(self.ids)
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
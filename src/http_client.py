@@ -0,0 +1,249 @@
+"""
+Shared HTTP client for everything Jarvis fetches: DuckDuckGo, Wikipedia and
+OpenAI.
+
+All requests go through one pool of keep-alive connections, so a question
+normally reuses an open TCP/TLS connection instead of paying DNS, TCP and
+TLS setup again (hundreds of milliseconds on a Pi). warm() opens the
+connections at startup, before the first question.
+
+Each service (one host) has:
+- a concurrency limit: at most `concurrency` requests in flight at once;
+- retries with jittered exponential backoff on connection errors, timeouts
+  and 429/5xx responses;
+- a circuit breaker: after `failures` failed requests in a row the service
+  is considered down and requests fail at once with CircuitOpenError for
+  `reset_after` seconds. Then one trial request is let through, and it
+  decides whether the breaker closes again.
+
+session(name) returns a requests.Session for a service that can be handed
+to libraries that take one (openai.requestssession) or that call
+requests.get (wikipedia).
+"""
+
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """The service failed repeatedly; not calling it until the breaker resets."""
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures=5, reset_after=30.0):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """True if a request may be sent now."""
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = self.HALF_OPEN
+                self._trial = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial:
+                self._trial = True  # exactly one request tests the service
+                return True
+            return False
+
+    def record(self, success):
+        with self.lock:
+            if success:
+                self.state = self.CLOSED
+                self.consecutive = 0
+                return
+            self.consecutive += 1
+            if self.state == self.HALF_OPEN or self.consecutive >= self.failures:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class Service:
+    def __init__(self, name, url, concurrency=2, retries=2, backoff=0.2, max_backoff=2.0,
+                 timeout=10.0, failures=5, reset_after=30.0):
+        parts = urlsplit(url)
+        self.name = name
+        self.url = url
+        self.host = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        self.retries = retries
+        self.backoff = backoff          # first retry waits up to this long, doubling each time
+        self.max_backoff = max_backoff
+        self.timeout = timeout          # the longest a request may take; callers can only ask for less
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.concurrency = concurrency
+        self.breaker = CircuitBreaker(failures, reset_after)
+        self.requests = 0
+        self.retried = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def cap(self, timeout):
+        """The caller's timeout (seconds or a (connect, read) pair), no longer than the service's."""
+        if timeout is None:
+            return self.timeout
+        if isinstance(timeout, tuple):
+            return tuple(self.timeout if t is None else min(t, self.timeout) for t in timeout)
+        return min(timeout, self.timeout)
+
+    def delay(self, attempt):
+        """Full jitter: anywhere between 0 and the exponential backoff."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools count the connections they open, per host."""
+
+    def __init__(self, client, **kwargs):
+        self.client = client
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        client = self.client
+
+        def counting(pool_class):
+            class CountingPool(pool_class):
+                def _new_conn(self):
+                    client._connection_opened((self.scheme, self.host, self.port))
+                    return super()._new_conn()
+            return CountingPool
+
+        self.poolmanager.pool_classes_by_scheme = {"http": counting(HTTPConnectionPool),
+                                                   "https": counting(HTTPSConnectionPool)}
+
+
+class ServiceSession(requests.Session):
+    """A requests.Session on the shared pool, with the service's limit, retries and breaker."""
+
+    def __init__(self, client, service):
+        super().__init__()
+        self.client = client
+        self.service = service
+        for prefix in ("https://", "http://"):
+            self.mount(prefix, client.adapter)
+
+    def request(self, method, url, **kwargs):
+        # Libraries pass their own, often long, timeouts (openai: 600 s); the service's still applies
+        kwargs["timeout"] = self.service.cap(kwargs.get("timeout"))
+        return self.client._send(self.service, lambda: super(ServiceSession, self).request(method, url, **kwargs))
+
+    def close(self):
+        pass  # the pool belongs to the client (openai closes its session every few minutes)
+
+
+class HttpClient:
+    def __init__(self, pool_size=4):
+        self.services = {}
+        self.connections = {}  # (scheme, host, port) -> connections opened
+        self.lock = threading.Lock()
+        self.adapter = _CountingAdapter(self, pool_connections=8, pool_maxsize=pool_size, max_retries=0)
+
+    def register(self, name, url, **options):
+        """Add a service at `url` (its host is what connections are opened to); see Service for options."""
+        self.services[name] = Service(name, url, **options)
+        return self.services[name]
+
+    def session(self, name):
+        return ServiceSession(self, self.services[name])
+
+    def _connection_opened(self, host):
+        with self.lock:
+            self.connections[host] = self.connections.get(host, 0) + 1
+
+    def _send(self, service, call):
+        if not service.breaker.allow():
+            service.rejected += 1
+            raise CircuitOpenError(f"{service.name} is unavailable (circuit open)")
+        with service.slots:
+            attempt = 0
+            while True:
+                service.requests += 1
+                try:
+                    response = call()
+                    error = None
+                except requests.exceptions.RequestException as e:
+                    response, error = None, e
+                if error is None and response.status_code not in RETRY_STATUSES:
+                    service.breaker.record(True)
+                    return response
+                if attempt >= service.retries:
+                    break
+                wait = service.delay(attempt)
+                if response is not None:
+                    retry_after = response.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        wait = min(float(retry_after), service.max_backoff)
+                    response.close()
+                attempt += 1
+                service.retried += 1
+                logging.info("Retrying %s in %.2f s (%s)", service.name, wait,
+                             error or f"HTTP {response.status_code}")
+                time.sleep(wait)
+        service.failed += 1
+        service.breaker.record(False)
+        if error is not None:
+            raise error
+        return response  # the last 429/5xx; the caller decides what it means
+
+    def warm(self, names=None, timeout=3.0):
+        """Open one connection to each service's host ahead of the first request."""
+        for name in names or list(self.services):
+            service = self.services[name]
+            try:
+                pool = self.adapter.poolmanager.connection_from_url(service.url)
+                conn = pool._get_conn(timeout=timeout)
+                conn.timeout = timeout
+                conn.connect()
+                pool._put_conn(conn)
+            except Exception as e:
+                logging.warning("Could not warm up %s: %s", name, e)
+
+    def stats(self):
+        """Per service: requests, retries, failures, breaker state, connections opened and reuse rate."""
+        with self.lock:
+            connections = dict(self.connections)
+        result = {}
+        for name, s in self.services.items():
+            opened = connections.get(s.host, 0)
+            result[name] = {"requests": s.requests, "retried": s.retried, "failed": s.failed,
+                            "rejected": s.rejected, "breaker": s.breaker.state, "trips": s.breaker.trips,
+                            "connections": opened,
+                            "reuse_rate": round(max(0.0, 1 - opened / s.requests), 3) if s.requests else 0.0}
+        return result
+
+    def prometheus(self, prefix="jarvis"):
+        stats = self.stats()
+        lines = [f"# HELP {prefix}_http_requests_total Requests sent per service, by outcome.",
+                 f"# TYPE {prefix}_http_requests_total counter"]
+        for name, s in stats.items():
+            for outcome in ("requests", "retried", "failed", "rejected"):
+                lines.append(f'{prefix}_http_requests_total{{service="{name}",outcome="{outcome}"}} {s[outcome]}')
+        lines += [f"# HELP {prefix}_http_connections_total Connections opened per service.",
+                  f"# TYPE {prefix}_http_connections_total counter"]
+        lines += [f'{prefix}_http_connections_total{{service="{name}"}} {s["connections"]}'
+                  for name, s in stats.items()]
+        lines += [f"# HELP {prefix}_http_circuit_open Whether the service's circuit breaker is open.",
+                  f"# TYPE {prefix}_http_circuit_open gauge"]
+        lines += [f'{prefix}_http_circuit_open{{service="{name}"}} {int(s["breaker"] == "open")}'
+                  for name, s in stats.items()]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,157 @@
+"""
+Compiled intent router for Jarvis commands.
+
+Trigger phrases of every registered intent are compiled into one
+Aho-Corasick automaton over words, so routing an utterance is a single pass
+over its words however many intents exist. On top of exact triggers:
+
+- synonyms: an intent can have several trigger phrases, and single words can
+  be mapped to a canonical form ("compute" -> "calculate", "what's" -> "what is");
+- filler words before the trigger are skipped ("hey jarvis, could you please
+  calculate ..."), and politeness at the end is dropped from the argument;
+- slots: a trigger like "set a timer for {duration}" or
+  "convert {amount} to {unit}" extracts named values from the rest.
+
+route() returns an IntentMatch; identify() gives the (handler, argument) pair
+CommandIdentifier has always returned.
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass, field
+
+FILLER_WORDS = {"hey", "hi", "hello", "ok", "okay", "jarvis", "please", "kindly", "um", "uh", "er", "so",
+                "well", "just", "can", "could", "would", "will", "you", "i", "want", "need", "to", "quickly"}
+TRAILING_FILLER = re.compile(r"[\s,]*\b(please|thanks|thank you)\W*$")
+WORD_SYNONYMS = {"whats": "what is", "whos": "who is", "wheres": "where is", "whens": "when is", "hows": "how is"}
+WORD = re.compile(r"[\w']+")
+SLOT = re.compile(r"\{(\w+)\}")
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    handler: object
+    arg: str                      # everything after the trigger, lowercased
+    slots: dict = field(default_factory=dict)
+    trigger: str = ""
+
+
+@dataclass
+class _Trigger:
+    intent: str
+    handler: object
+    phrase: str
+    literal: str                  # text before the first slot
+    pattern: object = None        # regex for the rest when the phrase has slots
+    words: tuple = ()             # literal after synonym expansion, set by compile()
+
+
+class IntentRouter:
+    """Word-level Aho-Corasick automaton over all trigger phrases."""
+
+    def __init__(self, fillers=FILLER_WORDS, synonyms=WORD_SYNONYMS):
+        self.fillers = set(fillers)
+        self.synonyms = {}
+        for word, canonical in synonyms.items():
+            self.add_synonym(word, canonical)
+        self.triggers = []
+        self._compiled = False
+
+    def add_synonym(self, word, canonical):
+        """Treat `word` as `canonical` (which may be several words) everywhere."""
+        self.synonyms[word.replace("'", "")] = tuple(canonical.split())
+        self._compiled = False
+
+    def register(self, intent, handler, phrases):
+        """Add an intent triggered by any of `phrases` (a string or a list)."""
+        for phrase in [phrases] if isinstance(phrases, str) else phrases:
+            literal, *rest = SLOT.split(phrase.lower())
+            if not WORD.search(literal):
+                raise ValueError(f"Trigger '{phrase}' must start with a word, not a slot")
+            pattern = None
+            if rest:
+                # rest alternates slot name, literal text, slot name, ...
+                regex = r"\s*"
+                for i, part in enumerate(rest):
+                    if i % 2 == 0:
+                        regex += f"(?P<{part}>.+?)"
+                    else:
+                        regex += r"\s*" + r"\s+".join(map(re.escape, part.split())) + r"\s*"
+                pattern = re.compile(regex + "$")
+            self.triggers.append(_Trigger(intent, handler, phrase, literal, pattern))
+        self._compiled = False
+
+    def _tokens(self, text):
+        """(word, end offset) pairs after synonym expansion; text is already lowercase."""
+        for match in WORD.finditer(text):
+            word = match.group().replace("'", "")
+            for canonical in self.synonyms.get(word, (word,)):
+                yield canonical, match.end()
+
+    def compile(self):
+        """Build the automaton: a goto trie, failure links and merged outputs."""
+        self._goto = [{}]
+        self._output = [[]]
+        for index, trigger in enumerate(self.triggers):
+            trigger.words = tuple(word for word, _ in self._tokens(trigger.literal))
+            node = 0
+            for word in trigger.words:
+                if word not in self._goto[node]:
+                    self._goto.append({})
+                    self._output.append([])
+                    self._goto[node][word] = len(self._goto) - 1
+                node = self._goto[node][word]
+            self._output[node].append(index)
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._longest = max((len(t.words) for t in self.triggers), default=0)
+        self._compiled = True
+
+    def route(self, text):
+        """Best IntentMatch for the utterance, or None."""
+        if not self._compiled:
+            self.compile()
+        text = text.lower()
+        tokens = list(self._tokens(text))
+        # A trigger may start anywhere in the leading run of filler words
+        last_start = next((i for i, (word, _) in enumerate(tokens) if word not in self.fillers), len(tokens) - 1)
+        candidates = []
+        node = 0
+        for position, (word, _) in enumerate(tokens):
+            while node and word not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(word, 0)
+            for index in self._output[node]:
+                start = position - len(self.triggers[index].words) + 1
+                if start <= last_start:
+                    candidates.append((start, -len(self.triggers[index].words), index, position))
+            if position >= last_start + self._longest - 1:
+                break  # no trigger ending later can start early enough
+        # Earliest start wins, then the longest trigger, then registration order
+        for start, _, index, position in sorted(candidates):
+            trigger = self.triggers[index]
+            rest = text[tokens[position][1]:]
+            slots = {}
+            if trigger.pattern is not None:
+                match = trigger.pattern.match(TRAILING_FILLER.sub("", rest))
+                if not match:
+                    continue
+                slots = {name: value.strip() for name, value in match.groupdict().items()}
+            arg = TRAILING_FILLER.sub("", rest).strip(" ,?!")
+            return IntentMatch(trigger.intent, trigger.handler, arg, slots, trigger.phrase)
+        return None
+
+    def identify(self, text):
+        """(handler, argument) for the utterance, or (None, None)."""
+        match = self.route(text)
+        return (match.handler, match.arg) if match else (None, None)
@@ -42,81 +42,247 @@ import time
 import logging
 import re
 import threading
-import queue
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, render_template_string, request, jsonify
 from flask_socketio import SocketIO, emit
 
 import speech_recognition as sr
-import pyttsx3
 import openai
-import wikipedia
-import requests
 
-# Attempt to import Raspberry Pi GPIO library
+from wakeword import load_wake_word_detector, load_wav, SAMPLE_RATE, FRAME_SAMPLES
+from audio_capture import AudioCapture, RingReader
+from noise_floor import NoiseFloorEstimator
+from vad import Endpointer, frame_energies
+from stt import create_backend
+from tts import TTSWorker, URGENT, NORMAL
+from tts_cache import SpeechCache
+from semantic_cache import SemanticCache
+from llm import openai_chat_completion, stream_chat_completion, summarize_conversation, StreamTiming, FALLBACK_REPLY
+from dispatcher import Dispatcher
+from commands import CommandIdentifier, wiki_search, random_web_search, found, http_client
+from trainer import Trainer
+from button import Button, FakeGPIO
+from state_store import StateStore
+from history import History
+from tracing import Tracer, span
+from log_pipeline import LogPipeline
+from fanout import FanOut, Candidate
+from conversation import ConversationMemory
+from startup import Startup, StartupError
+from satellite import SatelliteServer
+from audio_pool import AudioWorkerPool, PooledWakeWordDetector, PooledSTTBackend
+
+# Attempt to import Raspberry Pi GPIO library (FAKE_GPIO=1 uses an in-memory pin for testing)
 try:
     import RPi.GPIO as GPIO
     gpio_available = True
 except ImportError:
     gpio_available = False
+if os.getenv("FAKE_GPIO") == "1":
+    GPIO = FakeGPIO()
+    gpio_available = True
 
 # ------------- Configuration -----------------
 WAKE_WORD = "hey jarvis"
+WAKE_WORD_TEMPLATES = os.getenv("WAKE_WORD_TEMPLATES", "wakeword")  # directory of "hey jarvis" WAV recordings
+WAKE_WORD_THRESHOLD = float(os.getenv("WAKE_WORD_THRESHOLD", "0.75"))  # lower = more sensitive
 BUTTON_PIN = 17  # GPIO pin for button (BCM numbering)
+BUTTON_PREROLL = 0.5  # seconds of audio before a button press kept for the command
+BUTTON_DEBOUNCE = 0.02  # seconds of contact bounce ignored after a change
+BUTTON_LONG_PRESS = 0.8  # hold this long to stop Jarvis talking
+BUTTON_DOUBLE_PRESS = 0.35  # second press within this many seconds repeats the last answer
+MAX_WAKE_LAG = 1.0  # seconds the wake word reader may fall behind before skipping ahead
+VAD_HANGOVER = 0.1  # quiet gaps shorter than this still count as speech
+VAD_TRAILING_SILENCE = float(os.getenv("VAD_TRAILING_SILENCE", "0.2"))  # silence after the hangover that ends a command
+COMMAND_MAX_SECONDS = 15  # safety cap for very long questions
+STT_BACKEND = os.getenv("STT_BACKEND", "google")  # "google" or "vosk" (offline, streams partial results)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") != "0"  # speak GPT answers sentence by sentence
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "tts_cache")  # pre-rendered prompts and trained responses
+TTS_CACHE_MB = float(os.getenv("TTS_CACHE_MB", "50"))
+GPT_CACHE_THRESHOLD = float(os.getenv("GPT_CACHE_THRESHOLD", "0.85"))  # cosine similarity for reusing an answer
+GPT_CACHE_TTL = float(os.getenv("GPT_CACHE_TTL", "3600"))  # seconds
+GPT_CACHE_SIZE = int(os.getenv("GPT_CACHE_SIZE", "512"))
+TRAINER_FILE = os.getenv("TRAINER_FILE", "trained_phrases.jsonl")  # everything taught with "train: X => Y"
+TRAINER_MATCH_THRESHOLD = float(os.getenv("TRAINER_MATCH_THRESHOLD", "0.85"))  # similarity for a fuzzy match
+LOOKUP_TIMEOUT = float(os.getenv("LOOKUP_TIMEOUT", "8"))  # seconds for a Wikipedia / web search answer
+GPT_TIMEOUT = float(os.getenv("GPT_TIMEOUT", "30"))  # seconds for a complete GPT answer
+FANOUT_GPT_DELAY = float(os.getenv("FANOUT_GPT_DELAY", "0.5"))  # seconds a lookup has before GPT is asked too
+CONVERSATION_BUDGET = int(os.getenv("CONVERSATION_BUDGET", "1500"))  # prompt tokens per GPT request, history included
+CONVERSATION_IDLE = float(os.getenv("CONVERSATION_IDLE", "300"))  # seconds of silence before a new conversation
+IDLE_STATUS = "Idle - Waiting for wake word or button press..."
+DASHBOARD_COALESCE = float(os.getenv("DASHBOARD_COALESCE", "0.05"))  # seconds to merge state changes
+HISTORY_FILE = os.getenv("HISTORY_FILE", "history.jsonl")  # every command and response, append-only
+HISTORY_RECENT = int(os.getenv("HISTORY_RECENT", "200"))  # interactions kept in memory
+LOG_FILE = os.getenv("LOG_FILE", "jarvis.log")  # JSON lines, written in batches by a background thread
+LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", "5"))  # rotate the log at this size
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "3"))  # rotated logs kept
+AUDIO_EVENT_LOG = os.getenv("AUDIO_EVENT_LOG")  # binary file for per-frame noise floor and wake scores; off if unset
+SATELLITE_PORT = int(os.getenv("SATELLITE_PORT", "5001"))  # satellite microphones in other rooms connect here; 0 = off
+AUDIO_WORKERS = int(os.getenv("AUDIO_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))  # processes for CPU-heavy audio work; 0 = in-process
+FIXED_PROMPTS = [
+    "Hello! I am Jarvis, your personal assistant.",
+    "Go ahead, I'm listening.",
+    "Yes, I'm listening.",
+    "Button detected. What can I help you with?",
+    "I didn't catch that. Please try again.",
+    "Sorry, I didn't catch that. Could you please repeat?",
+    "Speech recognition service is unavailable.",
+    "Training saved.",
+]
 
 API_KEY = os.getenv("API_KEY")
 if not API_KEY:
     raise EnvironmentError("Please set your OpenAI API key in the API_KEY environment variable.")
 openai.api_key = API_KEY
+# OpenAI requests share the pooled keep-alive connections, with their own limit and circuit breaker
+http_client.register("openai", openai.api_base, concurrency=2, retries=1, timeout=GPT_TIMEOUT)
+openai.requestssession = http_client.session("openai")
 
 # Flask + SocketIO setup
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'supersecretkey'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# GPIO setup for button
-if gpio_available:
-    GPIO.setmode(GPIO.BCM)
-    GPIO.setup(BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-
 # ------------- Setup Logging -----------------
-logging.basicConfig(
-    filename='jarvis.log',
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
-
-# --------- Configuration --------------------
-WAKE_WORD = "hey jarvis"
-API_KEY = os.getenv("API_KEY")
+# Threads only queue log records; a writer thread batches them to disk
+log_pipeline = LogPipeline(LOG_FILE, max_bytes=int(LOG_MAX_MB * 2 ** 20), backups=LOG_BACKUPS,
+                           events_path=AUDIO_EVENT_LOG).install(logging.INFO)
+
+# --------- Initialize Text-To-Speech Worker ---------
+# The worker thread owns the pyttsx3 engine, so speaking never blocks the main loop.
+# Fixed prompts are rendered once into the speech cache and played back directly.
+# The engine starts with the other devices (see Startup); speech queued before then waits for it.
+speech_cache = SpeechCache(TTS_CACHE_DIR, max_bytes=int(TTS_CACHE_MB * 1024 * 1024))
+tts = TTSWorker(rate=150, cache=speech_cache)
+
+# --------- Initialize GPT Answer Cache -------------
+# Near-identical questions asked again within the TTL are answered without calling OpenAI
+answer_cache = SemanticCache(threshold=GPT_CACHE_THRESHOLD, ttl=GPT_CACHE_TTL, max_entries=GPT_CACHE_SIZE)
+
+# --------- Initialize Conversation Memory -------------
+# Earlier turns go along with each GPT question, summarized in the background to stay within budget
+conversation = ConversationMemory("You are Jarvis, a helpful AI assistant.", budget=CONVERSATION_BUDGET,
+                                  summarize=summarize_conversation, idle_timeout=CONVERSATION_IDLE)
 
-if not API_KEY:
-    raise EnvironmentError("Please set your OpenAI API key in the API_KEY environment variable.")
-
-openai.api_key = API_KEY
+# --------- Initialize Speech Recognizer -------------
+recognizer = sr.Recognizer()
 
-# --------- Initialize Text-To-Speech Engine ---------
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)  # Voice speed
+# --------- Initialize Microphone Capture -------------
+# One always-open stream feeds a ring buffer shared by every listener, and the
+# noise floor is tracked continuously from the same frames (no calibration pauses)
+audio_capture = AudioCapture()
+noise_floor = NoiseFloorEstimator(ratio=recognizer.dynamic_energy_ratio)
+audio_capture.frame_listeners.append(noise_floor.update)
+if AUDIO_EVENT_LOG:
+    audio_capture.frame_listeners.append(lambda frame: log_pipeline.event("noise_floor", noise_floor.floor))
+
+# --------- Offline Wake Word Detector (loaded at startup) -------------
+wake_detector = None
+wake_reader = None
+
+# ------------- History -------------
+# Commands and responses paired by interaction id; recent ones in memory, all of them on disk
+history = History(HISTORY_FILE, recent=HISTORY_RECENT)
+
+# ------------- Latency Tracing -------------
+# Every interaction is traced stage by stage; served on /metrics and on the dashboard
+tracer = Tracer()
+
+# ------------- Dashboard State -------------
+# Status and statistics are pushed to every dashboard only when they change, coalesced
+dashboard_state = StateStore(publish=lambda message: socketio.emit('state_update', message),
+                             coalesce=DASHBOARD_COALESCE, status="Idle, waiting for activation...")
+
+# ------------- Event Dispatcher -------------
+# Wake word, button, dashboard commands and timers are all events handled on one asyncio loop
+dispatcher = Dispatcher()
+# Knowledge questions go to Wikipedia, web search and GPT at once; the first good answer wins
+fanout = FanOut(dispatcher.run_blocking, budget=LOOKUP_TIMEOUT)
+listening = set()  # one token per command being captured; the wake word loop leaves the microphone alone
+
+# ------------- Audio Worker Processes -------------
+# Wake word scoring, offline speech recognition and speech rendering run in worker
+# processes on the Pi's other cores; audio is handed over in shared memory
+audio_pool = AudioWorkerPool(AUDIO_WORKERS) if AUDIO_WORKERS else None
+
+# ------------- Satellite Microphones -------------
+# Satellites in other rooms detect the wake word themselves and stream the command here;
+# it is transcribed and answered like a local one, and the answer is spoken in that room
+satellites = SatelliteServer(lambda utterance: dispatcher.post("satellite_command", utterance, created=utterance.ended),
+                             stt_factory=lambda: startup.get("speech recognition").session(),
+                             synthesize=lambda text: synthesize_for_room(text), port=SATELLITE_PORT)
+
+# ------------- Startup -------------
+# Devices, models and connections start in parallel threads once the dashboard is up;
+# their progress is shown on the dashboard and a missing device only disables what needs it
+
+def start_tts():
+    tts.start()
+    while not tts.ready.wait(0.1):
+        if not tts.is_alive():
+            raise RuntimeError("the speech engine could not be started")
+    for prompt in FIXED_PROMPTS:
+        tts.prerender(prompt)
+    return tts
+
+def start_trained_speech():
+    for response in set(trainer.custom_phrases.values()):
+        tts.prerender(response)
+
+def start_audio_workers():
+    audio_pool.start()
+    # Speech for the cache (prompts, trained responses, satellite answers) is rendered in a worker
+    tts.renderer = lambda text, path: audio_pool.run("render_speech", text, path, tts.rate, tts.voice)
+    return audio_pool
+
+def pooled():
+    """The worker pool once it is running, or None to do the work in this process."""
+    if audio_pool is None:
+        return None
+    try:
+        return startup.get("audio workers")
+    except StartupError:
+        return None
 
-# Pick an English voice
-voices = engine.getProperty('voices')
-for v in voices:
-    if "english" in v.name.lower():
-        engine.setProperty('voice', v.id)
-        break
+def load_wake_word():
+    pool = pooled()
+    if pool is not None:
+        try:
+            return PooledWakeWordDetector(pool, WAKE_WORD_TEMPLATES, threshold=WAKE_WORD_THRESHOLD)
+        except Exception as e:
+            logging.warning(f"Wake word detection stays in this process: {e}")
+    return load_wake_word_detector(WAKE_WORD_TEMPLATES, threshold=WAKE_WORD_THRESHOLD)
 
-# --------- Initialize Speech Recognizer -------------
-recognizer = sr.Recognizer()
-microphone = sr.Microphone()
+def load_speech_recognition():
+    pool = pooled()
+    if STT_BACKEND == "vosk" and pool is not None:
+        return PooledSTTBackend(pool, STT_BACKEND)  # every worker loads the model
+    return create_backend(STT_BACKEND, recognizer)
 
-# ------------- Queue Setup -------------
-command_log = queue.Queue(maxsize=100)
-response_log = queue.Queue(maxsize=100)
-status_message = queue.Queue(maxsize=1)
-status_message.put("Idle, waiting for activation...")
-manual_commands = queue.Queue()
+def start_button():
+    if not gpio_available:
+        raise RuntimeError("RPi.GPIO is not installed")
+    GPIO.setmode(GPIO.BCM)  # the pin itself is set up by Button
+    return Button(GPIO, BUTTON_PIN, on_button_event, debounce=BUTTON_DEBOUNCE,
+                  long_press=BUTTON_LONG_PRESS, double_press=BUTTON_DOUBLE_PRESS)
+
+startup = (Startup(on_change=lambda states: dashboard_state.update(startup=states))
+           .add("speech", start_tts)
+           .add("trained speech", start_trained_speech, needs=["speech"])
+           .add("microphone", audio_capture.start)
+           .add("wake word", load_wake_word)
+           .add("speech recognition", load_speech_recognition)
+           .add("button", start_button)
+           .add("connections", http_client.warm)
+           .add("history", lambda: len(history)))  # read the history file now rather than on the first command
+if SATELLITE_PORT:
+    startup.add("satellites", satellites.start)
+if audio_pool is not None:
+    startup.add("audio workers", start_audio_workers)
+VOICE_COMPONENTS = ("microphone", "wake word", "speech recognition")
 
 # ------------- Flask Routes & WebSocket Events -------------
 HTML_DASHBOARD = '''
@@ -132,12 +298,23 @@ HTML_DASHBOARD = '''
   #logs { max-height: 300px; overflow-y: auto; border: 1px solid #333; padding: 1rem; background: #222; }
   input[type=text] { width: 80%; padding: 0.5rem; font-size: 1rem; margin-right: 0.5rem; }
   button { padding: 0.5rem 1rem; font-size: 1rem; cursor: pointer; }
+  #latency { margin: 1rem 0; border-collapse: collapse; }
+  #latency td, #latency th { padding: 0.2rem 0.8rem; text-align: right; border-bottom: 1px solid #333; }
 </style>
 <script src="https://cdnjs.cloudflare.com/ajax/libs/socket.io/4.0.1/socket.io.js"></script>
 </head>
 <body>
 <h1>Jarvis Home Dashboard</h1>
 <div id="status">Status: <span id="status_text">{{status}}</span></div>
+<div id="startup">Startup: <span id="startup_text">-</span></div>
+<div id="cache">Speech cache: <span id="cache_text">-</span></div>
+<div id="answer_cache">GPT answer cache: <span id="answer_cache_text">-</span></div>
+<div id="http">Connections: <span id="http_text">-</span></div>
+<div id="conversation">Conversation: <span id="conversation_text">-</span></div>
+<div id="satellites">Rooms: <span id="satellites_text">-</span></div>
+<div id="audio_pool">Audio workers: <span id="audio_pool_text">-</span></div>
+<div id="last_interaction">Last interaction: <span id="last_interaction_text">-</span></div>
+<table id="latency"></table>
 
 <form id="manualForm">
   <input type="text" id="manualInput" placeholder="Type command and press Send" autocomplete="off" />
@@ -145,31 +322,103 @@ HTML_DASHBOARD = '''
 </form>
 
 <h2>Command & Response Log</h2>
+<form id="searchForm">
+  <input type="text" id="searchInput" placeholder="Search history" autocomplete="off" />
+  <button type="submit">Search</button>
+</form>
 <div id="logs"></div>
+<button id="olderButton">Older</button>
 
 <script>
 const socket = io();
 const logsDiv = document.getElementById('logs');
 const statusText = document.getElementById('status_text');
+const startupText = document.getElementById('startup_text');
+const cacheText = document.getElementById('cache_text');
+const answerCacheText = document.getElementById('answer_cache_text');
+const lastInteractionText = document.getElementById('last_interaction_text');
+const httpText = document.getElementById('http_text');
+const conversationText = document.getElementById('conversation_text');
+const satellitesText = document.getElementById('satellites_text');
+const audioPoolText = document.getElementById('audio_pool_text');
+const latencyTable = document.getElementById('latency');
+const state = {};
+let version = 0;
 
 socket.on('connect', () => {
     addLogEntry('System', 'Connected to Jarvis');
+    socket.emit('resume', {version: version});  // only what changed while we were away
 });
 
 socket.on('disconnect', () => {
     addLogEntry('System', 'Disconnected from Jarvis');
 });
 
-socket.on('status_update', (data) => {
-    statusText.textContent = data.status;
+socket.on('state_update', (data) => {
+    if (!data.full && data.from > version) {
+        socket.emit('resume', {version: version});  // missed an update
+        return;
+    }
+    if (data.full) {
+        for (const key in state) delete state[key];
+    }
+    Object.assign(state, data.changes);
+    version = data.version;
+    render();
 });
 
-socket.on('command_update', (data) => {
-    addLogEntry('Command', data.command);
+function render() {
+    statusText.textContent = state.status || 'Idle';
+    if (state.startup) {
+        startupText.textContent = Object.entries(state.startup).map(([name, c]) =>
+            `${name} ${c.state}` + (c.ms === null ? '' : ` (${c.ms} ms)`) + (c.error ? `: ${c.error}` : '')).join(', ');
+    }
+    if (state.speech_cache) {
+        const c = state.speech_cache;
+        cacheText.textContent = `${c.hits} hits / ${c.misses} misses (${Math.round(c.hit_rate * 100)}%), ${c.entries} clips, ${(c.bytes / 1048576).toFixed(1)} MB`;
+    }
+    if (state.answer_cache) {
+        const a = state.answer_cache;
+        answerCacheText.textContent = `${a.hits} hits / ${a.misses} misses (${Math.round(a.hit_rate * 100)}%), ${a.entries} answers, saved ${(a.latency_saved_ms / 1000).toFixed(1)} s and ${a.tokens_saved} tokens`;
+    }
+    if (state.http) {
+        httpText.textContent = Object.entries(state.http).map(([name, h]) =>
+            `${name} ${h.requests} requests, ${Math.round(h.reuse_rate * 100)}% reused` +
+            (h.breaker === 'closed' ? '' : ` (circuit ${h.breaker})`)).join('; ');
+    }
+    if (state.conversation) {
+        const m = state.conversation;
+        conversationText.textContent = `${m.turns} turns kept, ${m.summaries} summaries, last prompt ${m.last_prompt_tokens} / ${m.budget} tokens`;
+    }
+    if (state.satellites) {
+        const rooms = Object.entries(state.satellites.rooms);
+        satellitesText.textContent = rooms.length ? rooms.map(([room, r]) =>
+            `${room}: ${r.utterances} commands${r.speaking ? ', speaking' : ''}`).join(' | ') : 'no satellites connected';
+    }
+    if (state.audio_pool) {
+        const p = state.audio_pool;
+        audioPoolText.textContent = `${p.busy} / ${p.workers} busy, ${p.queued} queued, ${p.completed} jobs (mean ${p.latency_ms_mean} ms), ${p.failed} failed, ${p.restarts} restarts`;
+    }
+    if (state.last_interaction) {
+        const t = state.last_interaction;
+        const spans = Object.entries(t.spans).map(([name, ms]) => `${name} ${Math.round(ms)} ms`).join(', ');
+        lastInteractionText.textContent = `${t.kind}, ${t.total_ms} ms (${spans})`;
+    }
+    if (state.latency) {
+        let rows = '<tr><th>Stage</th><th>Count</th><th>p50 ms</th><th>p95 ms</th><th>p99 ms</th><th>Max ms</th></tr>';
+        for (const [name, h] of Object.entries(state.latency)) {
+            rows += `<tr><td>${name}</td><td>${h.count}</td><td>${h.p50_ms}</td><td>${h.p95_ms}</td><td>${h.p99_ms}</td><td>${h.max_ms}</td></tr>`;
+        }
+        latencyTable.innerHTML = rows;
+    }
+}
+
+socket.on('command_update', (entry) => {
+    if (!searchQuery) showInteraction(entry, true);
 });
 
-socket.on('response_update', (data) => {
-    addLogEntry('Response', data.response);
+socket.on('response_update', (entry) => {
+    if (!searchQuery) showInteraction(entry, true);
 });
 
 function addLogEntry(type, text) {
@@ -178,13 +427,58 @@ function addLogEntry(type, text) {
     logsDiv.prepend(entry);
 }
 
+// History: one element per interaction, fetched a page at a time
+const olderButton = document.getElementById('olderButton');
+let searchQuery = '';
+let nextPage = null;
+
+function showInteraction(entry, newest) {
+    let div = document.getElementById(`interaction-${entry.id}`);
+    if (!div) {
+        div = document.createElement('div');
+        div.id = `interaction-${entry.id}`;
+        if (newest) logsDiv.prepend(div); else logsDiv.append(div);
+    }
+    const source = entry.source === 'manual' ? 'Manual' : 'Command';
+    let text = `[${source}] ${entry.command}`;
+    if (entry.finished) {
+        text += ` -> [Response] ${entry.response === null ? '(no answer)' : entry.response} (${entry.latency_ms} ms`;
+        text += entry.answered_by ? `, via ${entry.answered_by})` : ')';
+    }
+    div.textContent = text;
+}
+
+async function loadHistory(reset) {
+    if (reset) {
+        logsDiv.innerHTML = '';
+        nextPage = null;
+    }
+    const params = new URLSearchParams({limit: 20});
+    if (nextPage !== null) params.set('before', nextPage);
+    if (searchQuery) params.set('q', searchQuery);
+    const response = await fetch((searchQuery ? '/history/search?' : '/history?') + params);
+    const page = await response.json();
+    page.items.forEach(entry => showInteraction(entry, false));
+    nextPage = page.next;
+    olderButton.style.display = nextPage === null ? 'none' : '';
+}
+
+olderButton.onclick = () => loadHistory(false);
+
+document.getElementById('searchForm').onsubmit = function(e) {
+    e.preventDefault();
+    searchQuery = document.getElementById('searchInput').value.trim();
+    loadHistory(true);
+};
+
+loadHistory(true);
+
 document.getElementById('manualForm').onsubmit = async function(e) {
     e.preventDefault();
     const input = document.getElementById('manualInput');
     if (input.value.trim() === '') return;
     
     socket.emit('manual_command', {command: input.value});
-    addLogEntry('Manual Input', input.value);
     input.value = '';
 };
 </script>
@@ -194,37 +488,45 @@ document.getElementById('manualForm').onsubmit = async function(e) {
 
 @app.route('/')
 def index():
-    status = None
-    try:
-        status = status_message.queue[0]
-    except IndexError:
-        status = "Idle"
-    return render_template_string(HTML_DASHBOARD, status=status)
-
-@socketio.on('connect')
-def handle_connect():
-    try:
-        status = status_message.queue[0]
-    except IndexError:
-        status = "Idle"
-    emit('status_update', {'status': status})
-    
-    # Send current logs
-    commands = list(command_log.queue)
-    responses = list(response_log.queue)
-    emit('initial_logs', {
-        'commands': commands,
-        'responses': responses
-    })
+    return render_template_string(HTML_DASHBOARD, status=dashboard_state.get("status", "Idle"))
+
+@app.route('/metrics')
+def metrics():
+    """Latency histograms per interaction stage, HTTP, fan-out and log counters, for Prometheus to scrape."""
+    text = (tracer.prometheus() + http_client.prometheus() + fanout.prometheus() + satellites.prometheus() +
+            log_pipeline.prometheus())
+    if startup.ready("audio workers"):
+        text += audio_pool.prometheus()
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+def page_args():
+    before = request.args.get('before', type=int)
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    return before, limit
+
+@app.route('/history')
+def history_page():
+    """Interactions newest first, `limit` at a time, older than id `before`."""
+    before, limit = page_args()
+    return jsonify(history.page(before=before, limit=limit))
+
+@app.route('/history/search')
+def history_search():
+    """Interactions whose command or response contains every word of `q`, paged like /history."""
+    before, limit = page_args()
+    return jsonify(history.search(request.args.get('q', ''), before=before, limit=limit))
+
+@socketio.on('resume')
+def handle_resume(data):
+    """Bring one dashboard up to date from the last state version it saw."""
+    version = data.get('version') if isinstance(data, dict) else None
+    emit('state_update', dashboard_state.since(version if isinstance(version, int) else None))
 
 @socketio.on('manual_command')
 def handle_manual_command(data):
     cmd = data.get('command', '').strip()
     if cmd:
-        full_cmd = f"Manual: {cmd}"
-        command_log.put(full_cmd)
-        manual_commands.put(cmd)
-        emit('command_update', {'command': full_cmd}, broadcast=True)
+        dispatcher.post("manual_command", cmd)
         return {'status': 'Command received'}
     return {'status': 'No command received'}
 
@@ -232,182 +534,281 @@ def run_dashboard():
     """Run the Flask app with SocketIO support"""
     socketio.run(app, host='0.0.0.0', port=5000, debug=False)
 
-def emit_status_update():
-    """Emit current status via WebSocket"""
-    try:
-        status = status_message.queue[0]
-    except IndexError:
-        status = "Idle"
-    socketio.emit('status_update', {'status': status})
+def refresh_stats():
+    """Update cache statistics; dashboards only hear about them if they changed."""
+    dashboard_state.update(speech_cache=speech_cache.stats(), answer_cache=answer_cache.stats(),
+                           latency=tracer.summary(), last_interaction=tracer.last(), http=http_client.stats(),
+                           conversation=conversation.stats(), satellites=satellites.stats())
+    if startup.ready("audio workers"):
+        dashboard_state.update(audio_pool=audio_pool.stats())
 
-# ------------- Helper Functions --------------------
-
-def speak(text: str):
-    logging.info(f"Speaking: {text}")
-    engine.say(text)
-    engine.runAndWait()
+def set_status(status: str):
+    """Replace the current status; pushed to the dashboards with any other pending changes."""
+    dashboard_state.update(status=status)
 
 # ------------ Command Processing ---------------
 
-def process_command(command: str):
-    """Process a user command and return a response."""
+async def process_command(command: str, source="voice", trace=None, say=None):
+    """Process a user command, speak the response (with say, if given) and record both in the history."""
     if not command:
         return
-    
-    # First check for manual command from web dashboard
+    entry = history.start(command, source)
+    socketio.emit('command_update', entry)
+    reply = answered_by = None
     try:
-        while not manual_commands.empty():
-            cmd = manual_commands.get_nowait()
-            if cmd:
-                command = cmd  # Override voice command with manual command
-                break
-    except queue.Empty:
-        pass
+        reply, answered_by = await answer_command(command, source, trace, say)
+    finally:
+        # Cancelled or failed interactions are recorded too, without an answer
+        socketio.emit('response_update', history.finish(entry["id"], reply, answered_by=answered_by))
+    # Each source (voice, dashboard, satellite room) is its own conversation
+    conversation.add(source, command, reply)
+
+async def ask_sources(func, arg, command: str, source="voice", trace=None):
+    """
+    Race the routed lookup against the other lookup and (after FANOUT_GPT_DELAY,
+    or at once if both lookups come back empty) GPT; returns (answer, source).
+    """
+    other = random_web_search if func is wiki_search else wiki_search
+    candidates = [
+        # The routed lookup may already be running from a partial transcript
+        Candidate(LOOKUP_SOURCES[func], functools.partial(prefetcher.result, func, arg), found),
+        Candidate(LOOKUP_SOURCES[other], functools.partial(other, arg), found),
+        Candidate("gpt", functools.partial(openai_chat_completion, conversation.messages(source, command), answer_cache),
+                  lambda answer: bool(answer) and answer != FALLBACK_REPLY, delay=FANOUT_GPT_DELAY),
+    ]
+    with span(trace, "handler"):
+        result = await fanout.first(candidates)
+    if result.source is None:
+        return "Sorry, I couldn't find an answer to that. Please try again later.", None
+    return result.answer, result.source
+
+async def answer_command(command: str, source="voice", trace=None, say=None):
+    """Speak the answer to a command; returns the answer and the source that gave it."""
+    say = say or speak_async
+    with span(trace, "routing"):
+        # Training command ("train: phrase => response"), trained phrase, known command or GPT
+        train_match = re.match(r"train\s*:\s*(.+?)\s*=>\s*(.+)", command)
+        custom_response = None if train_match else trainer.get_response(command)
+        func, arg = (None, None) if train_match or custom_response else command_identifier.identify_command(command)
+    if func not in prefetcher.handlers:
+        prefetcher.clear()  # nothing will pick up lookups started from this command's partial transcripts
 
-    # Check for training command: "train: phrase => response"
-    train_match = re.match(r"train\s*:\s*(.+?)\s*=>\s*(.+)", command)
     if train_match:
         phrase = train_match.group(1).strip()
         response = train_match.group(2).strip()
-        reply = trainer.train(phrase, response)
-        speak(reply)
-        response_log.put(reply)
-        return
+        with span(trace, "handler"):
+            reply = trainer.train(phrase, response)
+        say(reply, cache=True, trace=trace)
+        tts.prerender(response)
+        return reply, "trainer"
 
-    # Check if trainer has a custom response
-    custom_response = trainer.get_response(command)
     if custom_response:
-        speak(custom_response)
-        response_log.put(custom_response)
-        return
+        say(custom_response, cache=True, trace=trace)
+        return custom_response, "trainer"
+
+    # Knowledge questions: the first good answer from any source
+    if func in LOOKUP_SOURCES:
+        reply, answered_by = await ask_sources(func, arg, command, source, trace)
+        say(reply, trace=trace)
+        return reply, answered_by
 
-    # Identify command and run associated function
-    func, arg = command_identifier.identify_command(command)
+    # Run the command's function
     if func:
         try:
-            reply = func(arg)
-            speak(reply)
-            response_log.put(reply)
-            return
+            with span(trace, "handler"):
+                reply = await dispatcher.run_blocking(prefetcher.result, func, arg, timeout=LOOKUP_TIMEOUT)
+        except asyncio.TimeoutError:
+            reply = "Sorry, that is taking too long. Please try again later."
         except Exception as e:
-            error_msg = f"Sorry, I failed to process that command: {str(e)}"
-            speak(error_msg)
-            response_log.put(error_msg)
-            return
-
-    # If none matched, ask OpenAI
-    messages = [
-        {"role": "system", "content": "You are Jarvis, a helpful AI assistant."},
-        {"role": "user", "content": command},
-    ]
-    response = openai_chat_completion(messages)
-    speak(response)
-    response_log.put(response)
+            reply = f"Sorry, I failed to process that command: {str(e)}"
+        say(reply, trace=trace)
+        return reply, func.__name__
 
-def openai_chat_completion(messages):
-    """Send a request to OpenAI's chat completion API."""
+    # If none matched, ask OpenAI, with the conversation so far
+    messages = conversation.messages(source, command)
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.9,
-            max_tokens=512,
-            top_p=1,
-            presence_penalty=0.6,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        logging.error(f"OpenAI API error: {e}")
-        return "Sorry, I am having trouble reaching the AI service right now."
-
-# --- Commands implementations ---
-
-class MathExpressionCalculator:
-    @staticmethod
-    def calculate(expression: str):
-        try:
-            if re.search(r"[a-zA-Z]", expression):
-                return "Invalid characters in expression."
-            result = eval(expression, {"__builtins__": {}}, {})
-            return f"The answer is {result}."
-        except Exception as e:
-            return f"Could not calculate expression. {str(e)}"
+        if STREAM_RESPONSES:
+            # Speak each sentence as soon as it is complete while the rest is generated
+            timing = StreamTiming()
+            handles = []
+            finished = threading.Event()
 
-def wiki_search(query: str):
-    try:
-        wikipedia.set_lang("en")
-        return wikipedia.summary(query, sentences=2)
-    except Exception:
-        return "I couldn't find anything on Wikipedia for that."
+            def on_sentence(sentence):
+                if not finished.is_set():  # a cancelled or timed-out answer stops talking
+                    handles.append(say(sentence, trace=trace))
 
-def random_web_search(query: str):
-    url = f"https://api.duckduckgo.com/?q={query}&format=json&no_redirect=1&skip_disambig=1"
-    try:
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        abstract = data.get("AbstractText", "")
-        return abstract if abstract else "No instant answer found online."
-    except Exception:
-        return "I couldn't perform a web search right now."
-
-class CommandIdentifier:
-    def __init__(self):
-        self.commands = {
-            "calculate": MathExpressionCalculator.calculate,
-            "what is": wiki_search,
-            "who is": wiki_search,
-            "search": random_web_search,
-        }
-    def identify_command(self, text):
-        text = text.lower()
-        for cmd in self.commands:
-            if text.startswith(cmd):
-                arg = text[len(cmd):].strip()
-                return self.commands[cmd], arg
-        return None, None
-
-class Trainer:
-    def __init__(self):
-        self.custom_phrases = {}
-    def train(self, phrase, response):
-        self.custom_phrases[phrase.lower()] = response
-        return "Training saved."
-    def get_response(self, phrase):
-        return self.custom_phrases.get(phrase.lower())
-
-trainer = Trainer()
+            try:
+                with span(trace, "llm"):
+                    response = await dispatcher.run_blocking(stream_chat_completion, messages, on_sentence, timing,
+                                                             answer_cache, timeout=GPT_TIMEOUT)
+            finally:
+                finished.set()
+            if handles and handles[0].started_at is not None:
+                logging.info("Time to first spoken word: %.0f ms", (handles[0].started_at - timing.start) * 1000)
+        else:
+            with span(trace, "llm"):
+                response = await dispatcher.run_blocking(openai_chat_completion, messages, answer_cache,
+                                                         timeout=GPT_TIMEOUT)
+            say(response, trace=trace)
+    except asyncio.TimeoutError:
+        response = "Sorry, that is taking too long. Please try again later."
+        say(response, trace=trace)
+    return response, "gpt"
+
+class CommandPrefetcher:
+    """Start slow lookups from partial transcripts before the final transcript arrives."""
+
+    def __init__(self, handlers, max_workers=2):
+        self.handlers = handlers  # only side-effect free lookups are safe to run speculatively
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def clear(self):
+        """Forget the lookups started for an earlier command."""
+        with self.lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending.clear()
+
+    def observe(self, partial: str):
+        """Called with each partial hypothesis while the user is still speaking."""
+        logging.debug("Partial: %s", partial)
+        func, arg = command_identifier.identify_command(partial)
+        if func not in self.handlers or len(arg.split()) < 2:
+            return
+        with self.lock:
+            if (func, arg) in self.pending:
+                return
+            for future in self.pending.values():
+                future.cancel()  # only drops lookups that have not started yet
+            self.pending[(func, arg)] = self.executor.submit(func, arg)
+
+    def result(self, func, arg):
+        """Return the prefetched answer for (func, arg), or run func now."""
+        with self.lock:
+            future = self.pending.pop((func, arg), None)
+            for stale in self.pending.values():
+                stale.cancel()
+            self.pending.clear()
+        if future is not None and not future.cancelled():
+            logging.info("Using prefetched answer for '%s'", arg)
+            return future.result()
+        return func(arg)
+
+trainer = Trainer(TRAINER_FILE, threshold=TRAINER_MATCH_THRESHOLD)
 command_identifier = CommandIdentifier()
+prefetcher = CommandPrefetcher({wiki_search, random_web_search})
+LOOKUP_SOURCES = {wiki_search: "wikipedia", random_web_search: "duckduckgo"}
 
 # ------------- Core Functions ---------------
 
-def speak(text: str):
-    """Say text using text-to-speech."""
-    logging.info(f"Speaking: {text}")
-    engine.say(text)
-    engine.runAndWait()
-
-def wait_for_button_press(timeout=None):
-    """Wait for button press with optional timeout."""
-    if not gpio_available:
-        return False
-    
-    logging.debug("Waiting for button press...")
-    start = time.time()
-    while True:
-        if GPIO.input(BUTTON_PIN) == GPIO.LOW:  # Button pressed
-            logging.info("Button pressed!")
-            time.sleep(0.1)  # Debounce
-            return True
-        if timeout and (time.time() - start) > timeout:
-            return False
-        time.sleep(0.05)  # Reduce CPU usage
+def speak(text: str, priority=URGENT, cache=True):
+    """Say text and wait until it has been spoken (prompts before listening)."""
+    speak_async(text, priority, cache).wait()
+
+def speak_async(text: str, priority=NORMAL, cache=False, trace=None):
+    """Queue text to be spoken and return a SpeechHandle immediately."""
+    logging.info("Speaking: %s", text)
+    on_start = None
+    if trace is not None:
+        def on_start(handle):
+            if "tts" not in trace.spans:  # wait until the first words of the answer are heard
+                trace.record("tts", handle.started_at - handle.queued_at)
+    return tts.speak_async(text, priority, cache, on_start)
+
+def capture_phrase(reader, timeout=5, phrase_time_limit=COMMAND_MAX_SECONDS, session=None, cancelled=None):
+    """Read one utterance from the ring buffer, ending shortly after the user stops talking.
+
+    A streaming session is fed exactly the audio that is returned: from 0.2 s
+    before speech starts to the endpoint. Raises sr.WaitTimeoutError if nobody
+    speaks, or as soon as `cancelled` (a threading.Event) is set.
+    """
+    ring = audio_capture.ring
+    start = reader.position
+    endpointer = Endpointer(lambda: noise_floor.threshold, trailing_silence=VAD_TRAILING_SILENCE,
+                            hangover=VAD_HANGOVER, max_speech=phrase_time_limit, timeout=timeout)
+    begin = fed = None  # utterance start; how far the session has been fed
+    while not endpointer.done:
+        if cancelled is not None and cancelled.is_set():
+            raise sr.WaitTimeoutError("Listening was cancelled.")
+        samples = reader.read_available(timeout=1)
+        if samples is None:
+            raise sr.WaitTimeoutError("Audio capture stopped.")
+        endpointer.feed(samples)
+        if endpointer.speech_start is None:
+            continue
+        if begin is None:
+            begin = fed = max(start + endpointer.speech_start * FRAME_SAMPLES - int(0.2 * SAMPLE_RATE), start,
+                              ring.start)
+        if session is not None:
+            upto = start + endpointer.speech_end * FRAME_SAMPLES if endpointer.done else reader.position
+            if upto > fed:
+                session.accept(ring.read(fed, upto))
+                fed = upto
+
+    stats = endpointer.stats()
+    logging.info("Utterance: %s", stats)
+    if endpointer.ended_by == "timeout":
+        raise sr.WaitTimeoutError("Listening timed out while waiting for phrase to start.")
+    end = start + endpointer.speech_end * FRAME_SAMPLES
+    return sr.AudioData(ring.read(begin, end).tobytes(), SAMPLE_RATE, 2)
+
+def recognize_phrase(reader, timeout=5, phrase_time_limit=COMMAND_MAX_SECONDS, on_partial=None, trace=None,
+                     cancelled=None):
+    """Capture one utterance and return its transcript from the configured STT backend."""
+    session = startup.get("speech recognition").session(on_partial)
+    try:
+        with span(trace, "capture"):
+            audio = capture_phrase(reader, timeout=timeout, phrase_time_limit=phrase_time_limit, session=session,
+                                   cancelled=cancelled)
+        with span(trace, "stt"):  # what is left to transcribe once the user has stopped talking
+            return session.finish(audio)
+    finally:
+        session.close()  # timed out or cancelled: nothing will finish it
+
+def speech_follows(position, window=0.4):
+    """True if speech is heard within window seconds after position (one-breath commands)."""
+    ring = audio_capture.ring
+    ring.wait(position + int(window * SAMPLE_RATE), timeout=window + 1)
+    samples = ring.read(max(position, ring.start), ring.end)
+    return bool((frame_energies(samples) > noise_floor.threshold).any())
+
+def transcribe_utterance(utterance):
+    """Transcript of a command streamed from a satellite, or None."""
+    session = utterance.stt or startup.get("speech recognition").session()
+    try:
+        text = session.finish(sr.AudioData(utterance.pcm().tobytes(), SAMPLE_RATE, 2))
+        logging.info("Transcribed text from the %s: %s", utterance.session.room, text)
+        return text.lower().strip()
+    except sr.UnknownValueError:
+        logging.warning("Speech not understood.")
+        return None
+    except sr.RequestError as e:
+        logging.error(f"Speech recognition error: {e}")
+        return None
 
-def transcribe_audio(source, timeout=5, phrase_time_limit=5):
+def synthesize_for_room(text: str):
+    """Render text with the speech engine for a satellite; 16 kHz int16 samples."""
+    startup.get("speech")
+    tts.render(text).wait()
+    path = speech_cache.get(text, tts.voice, tts.rate)
+    if path is None:
+        raise RuntimeError("the speech engine could not render it")
+    return load_wav(path)
+
+def speak_in_room(session):
+    """A speak_async that speaks through the satellite of one session."""
+    def say(text: str, priority=NORMAL, cache=False, trace=None):
+        logging.info("Speaking in the %s: %s", session.room, text)
+        return session.say(text)
+    return say
+
+def transcribe_audio(reader=None, timeout=5, phrase_time_limit=COMMAND_MAX_SECONDS):
     """Convert speech to text."""
     try:
-        audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
-        text = recognizer.recognize_google(audio)
-        logging.info(f"Transcribed text: {text}")
+        text = recognize_phrase(reader or audio_capture.reader(), timeout=timeout, phrase_time_limit=phrase_time_limit)
+        logging.info("Transcribed text: %s", text)
         return text.lower().strip()
     except sr.WaitTimeoutError:
         logging.warning("Listening timed out.")
@@ -422,397 +823,259 @@ def transcribe_audio(source, timeout=5, phrase_time_limit=5):
 
 def listen_for_wake_word(timeout=5):
     """Listen for wake word with timeout."""
-    with microphone as source:
-        recognizer.adjust_for_ambient_noise(source, duration=1)
-        logging.info(f"Listening for wake word '{WAKE_WORD}'...")
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            try:
-                audio = recognizer.listen(source, phrase_time_limit=3)
-                transcription = recognizer.recognize_google(audio).lower()
-                logging.info(f"Heard: {transcription}")
-                if WAKE_WORD in transcription:
-                    return True
-            except sr.UnknownValueError:
-                pass
-            except sr.RequestError:
-                speak("Speech recognition service unavailable.")
-                time.sleep(5)
-                return False
-            except KeyboardInterrupt:
-                speak("Shutting down. Goodbye.")
-                if gpio_available:
-                    GPIO.cleanup()
-                exit(0)
-        return False
-
-def listen_for_command():
-    """Listen for and transcribe a command."""
-    with microphone as source:
-        recognizer.adjust_for_ambient_noise(source, duration=0.5)
-        status_message.queue.clear()
-        status_message.put("Active - Listening for command...")
-        emit_status_update()
-        
-        speak("Go ahead, I'm listening.")
-        try:
-            audio = recognizer.listen(source, phrase_time_limit=8)
-            command = recognizer.recognize_google(audio).lower()
-            logging.info(f"Command received: {command}")
-            command_log.put(command)
-            socketio.emit('command_update', {'command': command})
-            return command
-        except sr.UnknownValueError:
-            speak("Sorry, I didn't catch that. Could you please repeat?")
-            return None
-        except sr.RequestError:
-            speak("Speech recognition service is unavailable.")
-            return None
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.9,
-            max_tokens=512,
-            top_p=1,
-            presence_penalty=0.6,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        logging.error(f"OpenAI API error: {e}")
-        return "Sorry, I am having trouble reaching the AI service right now."
-
-def listen_for_wake_word():
-    with microphone as source:
-        recognizer.adjust_for_ambient_noise(source, duration=1)
-        speak(f"Say '{WAKE_WORD}' to activate me.")
-        logging.info(f"Waiting for wake word '{WAKE_WORD}'...")
-        while True:
-            try:
-                audio = recognizer.listen(source, phrase_time_limit=4)
-                transcription = recognizer.recognize_google(audio).lower()
-                logging.info(f"Heard: {transcription}")
-                if WAKE_WORD in transcription:
-                    speak("Yes?")
-                    return True
-            except sr.UnknownValueError:
-                pass
-            except sr.RequestError:
-                speak("Speech recognition service unavailable.")
-                time.sleep(5)
-            except KeyboardInterrupt:
-                speak("Shutting down. Goodbye.")
-                exit(0)
-
-def listen_for_command():
-    with microphone as source:
-        recognizer.adjust_for_ambient_noise(source, duration=0.5)
-        print("Listening for your command. Press Enter when ready to speak...")
-        input()  # Simulate push-to-talk by requiring Enter key
+    global wake_reader
+    if wake_reader is None or audio_capture.position - wake_reader.position > MAX_WAKE_LAG * SAMPLE_RATE:
+        # Skip audio heard while Jarvis was busy (including its own voice)
+        wake_reader = audio_capture.reader()
+        if wake_detector is not None:
+            wake_detector.reset()
+
+    if wake_detector is None:
+        return listen_for_wake_word_online(timeout)
+
+    logging.debug("Listening for wake word '%s' (offline)...", WAKE_WORD)
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        frame = wake_reader.read(FRAME_SAMPLES, timeout=timeout)
+        if frame is None:
+            continue
+        detected = wake_detector.process(frame)
+        log_pipeline.event("wake_score", wake_detector.last_score)
+        if detected:
+            logging.info("Wake word detected (score %.2f)", wake_detector.last_score)
+            return True
+    return False
+
+def listen_for_wake_word_online(timeout=5):
+    """Listen for wake word by transcribing phrases in the cloud (no templates enrolled)."""
+    logging.info("Listening for wake word '%s'...", WAKE_WORD)
+    start_time = time.time()
+
+    while time.time() - start_time < timeout:
         try:
-            audio = recognizer.listen(source, phrase_time_limit=8)
-            command = recognizer.recognize_google(audio).lower()
-            logging.info(f"Command received: {command}")
-            print(f"You said: {command}")
-            return command
-        except sr.UnknownValueError:
-            speak("Sorry, I did not catch that. Please try again.")
-            return None
+            transcription = recognize_phrase(wake_reader, timeout=timeout - (time.time() - start_time),
+                                             phrase_time_limit=3).lower()
+            logging.info("Heard: %s", transcription)
+            if WAKE_WORD in transcription:
+                return True
+        except (sr.WaitTimeoutError, sr.UnknownValueError):
+            pass
         except sr.RequestError:
             speak("Speech recognition service unavailable.")
-            return None
-
-def process_command(command: str):
-    if not command:
-        return
-    # Training
-    train_match = re.match(r"train\s*:\s*(.+?)\s*=>\s*(.+)", command)
-    if train_match:
-        phrase = train_match.group(1).strip()
-        response = train_match.group(2).strip()
-        reply = trainer.train(phrase, response)
-        speak(reply)
-        return
-    # Custom phrase
-    custom_response = trainer.get_response(command)
-    if custom_response:
-        speak(custom_response)
-        return
-    # Known commands
-    func, arg = command_identifier.identify_command(command)
-    if func:
-        try:
-            reply = func(arg)
-            speak(reply)
-            return
-        except Exception as e:
-            speak(f"Sorry, I couldn't process that command: {str(e)}")
-            logging.error(f"Command processing error: {e}")
-            return
-    # Fallback to GPT-4o
-    messages = [
-        {"role": "system", "content": "You are Jarvis, a helpful AI assistant."},
-        {"role": "user", "content": command},
-    ]
-    response = openai_chat_completion(messages)
-    speak(response)
-
-def main_loop():
-    speak("Jarvis starting up. Say 'Hey Jarvis' when you need me.")
-    while True:
-        if listen_for_wake_word():
-            for _ in range(3):  # allow up to 3 attempts to get command
-                command = listen_for_command()
-                if command:
-                    process_command(command)
-                    break
-                else:
-                    speak("Let's try again.")
-            else:
-                speak("I am going back to sleep. Say 'Hey Jarvis' when you need me.")
-
-if __name__ == "__main__":
-    main_loop()
-
-WAKE_WORD = "hey jarvis"
-API_KEY = os.getenv("API_KEY")
-if not API_KEY:
-    raise EnvironmentError("Please set your OpenAI API key in the API_KEY environment variable.")
-
-openai.api_key = API_KEY
-
-# ========== SPEECH ENGINE SETUP ==========
-
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)
-# Optional: Set your preferred voice here if you want (comment if issues)
-voices = engine.getProperty('voices')
-for v in voices:
-    if "english" in v.name.lower():
-        engine.setProperty('voice', v.id)
-        break
-
-recognizer = sr.Recognizer()
-microphone = sr.Microphone()
-
-# ========== UTILITY FUNCTIONS ==========
-
-def speak(text: str):
-    engine.say(text)
-    engine.runAndWait()
-
-def transcribe_audio(source, timeout=5, phrase_time_limit=5):
-    """Listen from source and transcribe to text."""
+            time.sleep(5)
+            return False
+        except KeyboardInterrupt:
+            speak("Shutting down. Goodbye.")
+            if gpio_available:
+                GPIO.cleanup()
+            exit(0)
+    return False
+
+def listen_for_command(start=None, prompt="Go ahead, I'm listening.", trace=None, cancelled=None):
+    """
+    Listen for and transcribe a command.
+
+    start is the buffer position of the activation (end of wake word or button
+    press). If the user is already talking there, capture begins from that
+    buffered audio and the prompt is skipped. Setting `cancelled` (the handler
+    was preempted) stops the capture and returns None.
+    """
+    set_status("Active - Listening for command...")
+    prefetcher.clear()  # lookups started for an earlier command must not answer this one
+    token = object()
+    listening.add(token)
     try:
-        audio = recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
-        text = recognizer.recognize_google(audio)
-        return text.lower().strip()
+        if start is not None and speech_follows(start):
+            reader = RingReader(audio_capture.ring, start)
+        else:
+            with span(trace, "prompt"):
+                speak(prompt)
+            reader = audio_capture.reader()
+        command = recognize_phrase(reader, timeout=5, on_partial=prefetcher.observe, trace=trace,
+                                   cancelled=cancelled).lower()
+        logging.info("Command received: %s", command)
+        return command
     except sr.WaitTimeoutError:
         return None
     except sr.UnknownValueError:
+        speak("Sorry, I didn't catch that. Could you please repeat?")
         return None
     except sr.RequestError:
         speak("Speech recognition service is unavailable.")
         return None
+    finally:
+        listening.discard(token)
 
-# ========== FEATURE MODULES ==========
-
-# -- Math Expression Calculator --
+# ------------- Main Program Loop ---------------
 
-class MathExpressionCalculator:
-    @staticmethod
-    def calculate(expression: str):
+def wake_word_source():
+    """Thread: post a wake_word event with the buffer position where the command starts."""
+    global wake_detector
+    try:
+        for name in VOICE_COMPONENTS:
+            startup.get(name)
+    except StartupError as e:
+        logging.error(f"Voice activation unavailable ({e}); the dashboard still takes commands")
+        set_status(f"Voice activation unavailable ({e}) - type commands on the dashboard")
+        return
+    wake_detector = startup.get("wake word")
+    set_status(IDLE_STATUS)
+    while True:
+        if listening:  # the microphone belongs to the commands being captured
+            time.sleep(0.05)
+            continue
         try:
-            # Basic security check
-            if re.search(r"[a-zA-Z]", expression):
-                return "Invalid characters in expression."
-            # Evaluate safely
-            result = eval(expression, {"__builtins__": {}}, {})
-            return f"The answer is {result}."
+            if listen_for_wake_word(timeout=1):
+                # The wake word ended where the detector is; it may be running behind the microphone
+                lag = (audio_capture.position - wake_reader.position) / SAMPLE_RATE
+                dispatcher.post("wake_word", wake_reader.position, created=time.perf_counter() - lag)
         except Exception as e:
-            return f"Could not calculate expression. {str(e)}"
-
-# -- Wikipedia Search --
-
-def wiki_search(query: str):
-    try:
-        wikipedia.set_lang("en")
-        summary = wikipedia.summary(query, sentences=2)
-        return summary
-    except Exception:
-        return "I couldn't find anything on Wikipedia for that."
-
-# -- Random Web Search (Simple Google Search Snippet) --
-
-def random_web_search(query: str):
-    # NOTE: This uses DuckDuckGo's Instant Answer API (free)
-    url = f"https://api.duckduckgo.com/?q={query}&format=json&no_redirect=1&skip_disambig=1"
+            logging.error(f"Wake word detection error: {e}")
+            time.sleep(1)
+
+def on_button_event(kind, at):
+    """GPIO callback thread: turn button gestures into dispatcher events."""
+    if kind == "press":
+        logging.info("Button pressed!")
+        if not all(startup.ready(name) for name in ("microphone", "speech recognition")):
+            speak_async("Sorry, I can't listen right now, the microphone is not ready.", URGENT)
+            return
+        # Keep some audio from before the press: people often start talking while pressing
+        dispatcher.post("button", audio_capture.position - int(BUTTON_PREROLL * SAMPLE_RATE), created=at)
+    elif kind == "long_press":
+        dispatcher.post("button_stop", created=at)
+    elif kind == "double_press":
+        dispatcher.post("button_repeat", created=at)
+
+@dispatcher.on("wake_word", group="interaction", preempt=True)
+async def on_wake_word(event):
+    tts.interrupt()  # barge-in: stop any answer being read out
+    trace = tracer.begin("wake_word", started=event.created)
+    trace.record("wake", time.perf_counter() - event.created)
+    set_status("Wake word detected - Listening for command")
     try:
-        response = requests.get(url, timeout=5)
-        data = response.json()
-        abstract = data.get("AbstractText", "")
-        if abstract:
-            return abstract
+        command = await dispatcher.run_cancellable(listen_for_command, start=event.data,
+                                                   prompt="Yes, I'm listening.", trace=trace)
+        if command:
+            await process_command(command, trace=trace)
         else:
-            return "No instant answer found online."
-    except Exception:
-        return "I couldn't perform a web search right now."
-
-# -- Command Identifier and Trainer --
-
-class CommandIdentifier:
-    def __init__(self):
-        # example commands and their mapped functions
-        self.commands = {
-            "calculate": MathExpressionCalculator.calculate,
-            "what is": wiki_search,
-            "who is": wiki_search,
-            "search": random_web_search,
-            # add more mappings here
-        }
-    
-    def identify_command(self, text):
-        text = text.lower()
-        for cmd in self.commands:
-            if text.startswith(cmd):
-                # Return function and remainder text
-                arg = text[len(cmd):].strip()
-                return self.commands[cmd], arg
-        return None, None
-
-class Trainer:
-    def __init__(self):
-        self.custom_phrases = {}  # phrase:str -> response:str
-    
-    def train(self, phrase, response):
-        self.custom_phrases[phrase.lower()] = response
-        return "Training saved."
-    
-    def get_response(self, phrase):
-        phrase = phrase.lower()
-        return self.custom_phrases.get(phrase, None)
-
-trainer = Trainer()
-command_identifier = CommandIdentifier()
-
-
-	
-# ------------- Command Utilities ---------------
-
-def text2num(text: str):
-    """Convert text numbers to digits."""
-    numbers = {
-        "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4,
-        "five": 5, "six": 6, "seven":7, "eight": 8, "nine": 9, "ten": 10
-    }
-    words = text.lower().split()
-    result = []
-    for w in words:
-        if w in numbers:
-            result.append(str(numbers[w]))
+            speak_async("I didn't catch that. Please try again.", URGENT, cache=True)
+    finally:
+        tracer.end(trace)
+        set_status(IDLE_STATUS)
+
+@dispatcher.on("button", group="interaction", preempt=True)
+async def on_button(event):
+    tts.interrupt()  # barge-in: stop any answer being read out
+    trace = tracer.begin("button", started=event.created)
+    trace.record("button", time.perf_counter() - event.created)
+    set_status("Button pressed - Listening for command")
+    try:
+        command = await dispatcher.run_cancellable(listen_for_command, start=event.data,
+                                                   prompt="Button detected. What can I help you with?", trace=trace)
+        if command:
+            await process_command(command, trace=trace)
+    finally:
+        tracer.end(trace)
+        set_status(IDLE_STATUS)
+
+@dispatcher.on("button_stop", group="interaction", preempt=True)
+async def on_button_stop(event):
+    tts.interrupt()  # long press: be quiet and stop listening
+    set_status(IDLE_STATUS)
+
+@dispatcher.on("button_repeat", group="interaction", preempt=True)
+async def on_button_repeat(event):
+    tts.interrupt()
+    last = history.last_response()
+    if last:
+        speak_async(last)
+    else:
+        speak_async("I haven't said anything yet.", URGENT)
+    set_status(IDLE_STATUS)
+
+@dispatcher.on("satellite_command", group=lambda event: f"room:{event.data.session.room}", preempt=True)
+async def on_satellite_command(event):
+    """A command streamed from a satellite; rooms are handled at the same time, each answered in its own room."""
+    utterance = event.data
+    room = utterance.session.room
+    say = speak_in_room(utterance.session)
+    trace = tracer.begin("satellite", started=event.created)
+    try:
+        if utterance.reason == "timeout":  # woken, but nothing was said
+            say("I didn't catch that. Please try again.")
+            return
+        with span(trace, "stt"):
+            command = await dispatcher.run_blocking(transcribe_utterance, utterance)
+        if command:
+            await process_command(command, source=f"room:{room}", trace=trace, say=say)
         else:
-            result.append(w)
-    return " ".join(result)
-
-def emit_updates(command=None, response=None, status=None):
-    """Emit updates via WebSocket."""
-    if command:
-        socketio.emit('command_update', {'command': command})
-    if response:
-        socketio.emit('response_update', {'response': response})
-    if status:
-        status_message.queue.clear()
-        status_message.put(status)
-        socketio.emit('status_update', {'status': status})
+            say("Sorry, I didn't catch that. Could you please repeat?")
+    finally:
+        if utterance.stt is not None:
+            utterance.stt.close()  # nothing said, or preempted before it was transcribed
+        tracer.end(trace)
+
+@dispatcher.on("manual_command", group="interaction")
+async def on_manual_command(event):
+    trace = tracer.begin("manual", started=event.created)
+    set_status(f"Processing manual command: {event.data}")
+    try:
+        await process_command(event.data, source="manual", trace=trace)
+    finally:
+        tracer.end(trace)
+        set_status(IDLE_STATUS)
 
-# ------------- Main Program Loop ---------------
+@dispatcher.on("stats_tick")
+def on_stats_tick(event):
+    refresh_stats()
 
-def background_status_update():
-    """Background thread to periodically emit status updates"""
-    while True:
-        emit_status_update()
-        time.sleep(2)
+dispatcher.every(2, "stats_tick")
 
 def run_voice_assistant():
-    """Run the main voice assistant loop."""
-    speak("Hello! I am Jarvis, your personal assistant.")
-    status_message.queue.clear()
-    status_message.put("Idle - Waiting for wake word or button press...")
-    emit_status_update()
-
-    while True:
+    """Run the voice assistant: event sources in threads, handlers on one asyncio loop."""
+    set_status("Starting up...")
+    startup.start()
+    speak_async("Hello! I am Jarvis, your personal assistant.", URGENT, cache=True)  # once speech is ready
+    threading.Thread(target=wake_word_source, name="wake-word", daemon=True).start()
+    try:
+        asyncio.run(dispatcher.run())
+    finally:
+        if startup.ready("button"):
+            startup.get("button").close()
+
+def shutdown():
+    """Stop the assistant and release audio and GPIO."""
+    print("\nShutting down gracefully...")
+    speak_async("Shutting down. Goodbye!", URGENT, cache=True).wait(5)
+    dispatcher.stop()
+    dashboard_state.close()
+    history.close()
+    log_pipeline.close()
+    tts.shutdown()
+    audio_capture.stop()
+    satellites.stop()
+    if audio_pool is not None and startup.components["audio workers"].launched:
         try:
-            # Check for manual commands first
-            if not manual_commands.empty():
-                cmd = manual_commands.get()
-                status_message.queue.clear()
-                status_message.put(f"Processing manual command: {cmd}")
-                emit_status_update()
-                process_command(cmd)
-                continue
-
-            # Check for button press (with short timeout)
-            if gpio_available:
-                button_pressed = wait_for_button_press(timeout=0.1)
-                if button_pressed:
-                    status_message.queue.clear()
-                    status_message.put("Button pressed - Listening for command")
-                    emit_status_update()
-                    speak("Button detected. What can I help you with?")
-                    command = listen_for_command()
-                    if command:
-                        process_command(command)
-                    continue
-
-            # Check for wake word
-            status_message.queue.clear()
-            status_message.put("Listening for wake word...")
-            emit_status_update()
-
-            if listen_for_wake_word(timeout=1):
-                status_message.queue.clear()
-                status_message.put("Wake word detected - Listening for command")
-                emit_status_update()
-                speak("Yes, I'm listening.")
-                command = listen_for_command()
-                if command:
-                    process_command(command)
-                else:
-                    speak("I didn't catch that. Please try again.")
-
-            # Reset status after processing
-            status_message.queue.clear()
-            status_message.put("Idle - Waiting for wake word or button press...")
-            emit_status_update()
-
-        except KeyboardInterrupt:
-            print("\nShutting down gracefully...")
-            speak("Shutting down. Goodbye!")
-            if gpio_available:
-                GPIO.cleanup()
-            break
-        except Exception as e:
-            logging.error(f"Error in main loop: {str(e)}")
-            status_message.queue.clear()
-            status_message.put(f"Error: {str(e)}")
-            emit_status_update()
-            time.sleep(5)  # Prevent rapid error loops
+            startup.get("audio workers", timeout=10)  # let workers that are still starting come up, then stop them
+            audio_pool.stop()
+        except (StartupError, TimeoutError):
+            pass
+    if gpio_available:
+        GPIO.cleanup()
 
 def main():
     """Initialize and start all components."""
-    # Start background status update thread
-    status_thread = threading.Thread(target=background_status_update, daemon=True)
-    status_thread.start()
-    
+    # The voice assistant runs its own event loop next to the dashboard
+    assistant_thread = threading.Thread(target=run_voice_assistant, name="assistant", daemon=True)
+    assistant_thread.start()
+
     # Start the Flask+SocketIO server in the main thread
     try:
         socketio.run(app, host='0.0.0.0', port=5000, debug=False)
     except KeyboardInterrupt:
-        print("\nShutting down...")
-        if gpio_available:
-            GPIO.cleanup()
-        exit(0)
+        pass
+    shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
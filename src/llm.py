@@ -0,0 +1,196 @@
+"""
+OpenAI chat completions for Jarvis.
+
+openai_chat_completion() waits for the whole answer. stream_chat_completion()
+consumes the completion as a token stream, cuts it into sentences as they
+complete and hands each one to a callback (normally the TTS queue), so Jarvis
+starts talking after the first sentence instead of after all 512 tokens.
+If streaming fails before anything was said it falls back to the normal call.
+
+Both use the module-level openai settings, so pointing OPENAI_API_BASE at a
+local server (see tests/fake_openai_server.py) exercises them offline.
+
+Both take an optional SemanticCache: a close enough earlier question is
+answered from it without calling the API, and new answers are added to it.
+
+summarize_conversation() condenses earlier turns for ConversationMemory.
+"""
+
+import re
+import time
+import logging
+
+import openai
+
+COMPLETION_ARGS = dict(
+    model="gpt-4o",
+    temperature=0.9,
+    max_tokens=512,
+    top_p=1,
+    presence_penalty=0.6,
+)
+FALLBACK_REPLY = "Sorry, I am having trouble reaching the AI service right now."
+SUMMARY_PROMPT = ("Summarize this conversation between a user and Jarvis, a voice assistant, in a few "
+                  "sentences. Keep names, numbers, facts and anything the user asked Jarvis to remember.")
+
+
+def estimate_tokens(messages, reply):
+    """Rough token count (about 4 characters each) when the API reports no usage."""
+    return (sum(len(m["content"]) for m in messages) + len(reply)) // 4
+
+
+def cached_answer(messages, cache):
+    """Answer from the semantic cache, or None."""
+    if cache is None:
+        return None
+    answer, similarity = cache.lookup(messages)
+    if answer is not None:
+        logging.info("Answer cache hit (similarity %.2f)", similarity)
+    return answer
+
+
+def openai_chat_completion(messages, cache=None):
+    """Send a request to OpenAI's chat completion API."""
+    answer = cached_answer(messages, cache)
+    if answer is not None:
+        return answer
+    start = time.perf_counter()
+    try:
+        response = openai.ChatCompletion.create(messages=messages, **COMPLETION_ARGS)
+        reply = response.choices[0].message.content.strip()
+    except Exception as e:
+        logging.error(f"OpenAI API error: {e}")
+        return FALLBACK_REPLY
+    if cache is not None:
+        usage = response.get("usage") or {}
+        cache.store(messages, reply, time.perf_counter() - start,
+                    usage.get("total_tokens") or estimate_tokens(messages, reply))
+    return reply
+
+
+def summarize_conversation(summary, turns, max_tokens=150):
+    """Fold turns [(question, answer), ...] into the running summary; None if the API fails."""
+    lines = [f"Earlier: {summary}"] if summary else []
+    for question, answer in turns:
+        lines += [f"User: {question}", f"Jarvis: {answer}"]
+    messages = [{"role": "system", "content": SUMMARY_PROMPT}, {"role": "user", "content": "\n".join(lines)}]
+    try:
+        response = openai.ChatCompletion.create(messages=messages, model=COMPLETION_ARGS["model"],
+                                                temperature=0.3, max_tokens=max_tokens)
+        return response.choices[0].message.content.strip() or None
+    except Exception as e:
+        logging.error(f"OpenAI API error while summarizing: {e}")
+        return None
+
+
+class SentenceSplitter:
+    """Cut a growing stream of text into complete sentences."""
+
+    # ., ! or ? (plus closing quotes/brackets) followed by whitespace, or a line break
+    BOUNDARY = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+    ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "st.", "vs.", "etc.", "e.g.", "i.e.", "approx."}
+
+    def __init__(self, min_length=12):
+        self.min_length = min_length  # shorter pieces are joined to the next sentence
+        self.buffer = ""
+
+    def feed(self, text: str):
+        """Add streamed text and return the sentences it completed."""
+        self.buffer += text
+        sentences = []
+        start = 0
+        for match in self.BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            words = candidate.split()
+            if not words or words[-1].lower() in self.ABBREVIATIONS or len(candidate) < self.min_length:
+                continue
+            sentences.append(candidate)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Return whatever is left once the stream has ended."""
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest
+
+
+class StreamTiming:
+    """Timestamps for one streamed completion, in seconds since the request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.first_sentence = None
+        self.total = None
+        self.sentences = 0
+        self.streamed = True
+        self.cached = False
+
+    def mark(self, attr):
+        if getattr(self, attr) is None:
+            setattr(self, attr, time.perf_counter() - self.start)
+
+    def __str__(self):
+        def ms(value):
+            return "-" if value is None else f"{value * 1000:.0f} ms"
+        return (f"first token {ms(self.first_token)}, first sentence {ms(self.first_sentence)}, "
+                f"total {ms(self.total)}, {self.sentences} sentences")
+
+
+def stream_chat_completion(messages, on_sentence, timing=None, cache=None):
+    """
+    Stream a chat completion, calling on_sentence for each sentence as soon as
+    it is complete. Returns the full reply text.
+    """
+    timing = timing or StreamTiming()
+    splitter = SentenceSplitter()
+    parts = []
+    complete = True
+
+    def emit(sentence):
+        timing.mark("first_sentence")
+        timing.sentences += 1
+        on_sentence(sentence)
+
+    def finish(reply, complete=True):
+        timing.mark("total")
+        if cache is not None and complete and reply != FALLBACK_REPLY:
+            cache.store(messages, reply, timing.total, estimate_tokens(messages, reply))
+        return reply
+
+    answer = cached_answer(messages, cache)
+    if answer is not None:
+        timing.streamed = False
+        timing.cached = True
+        for sentence in splitter.feed(answer + " ") + [splitter.flush()]:
+            if sentence:
+                emit(sentence)
+        timing.mark("total")
+        return answer
+
+    try:
+        for chunk in openai.ChatCompletion.create(messages=messages, stream=True, **COMPLETION_ARGS):
+            delta = chunk.choices[0].delta.get("content") if chunk.choices else None
+            if not delta:
+                continue
+            timing.mark("first_token")
+            parts.append(delta)
+            for sentence in splitter.feed(delta):
+                emit(sentence)
+    except Exception as e:
+        logging.error(f"OpenAI streaming error: {e}")
+        if not timing.sentences:
+            # Nothing has been said yet: use the regular request instead
+            timing.streamed = False
+            reply = openai_chat_completion(messages)
+            emit(reply)
+            return finish(reply)
+        complete = False  # cut off mid-answer: say what we have, but don't cache it
+
+    rest = splitter.flush()
+    if rest:
+        emit(rest)
+    reply = finish("".join(parts).strip(), complete)
+    logging.info("LLM stream: %s", timing)
+    return reply
@@ -0,0 +1,224 @@
+"""
+Asynchronous logging for Jarvis.
+
+Threads that log (audio, wake word, GPIO, handlers) only put the record on a
+bounded queue and carry on; they never wait for the SD card. One writer
+thread formats the records, writes them in batches as JSON lines and
+rotates the file when it reaches `max_bytes`. If the queue is full the
+record is dropped and counted rather than blocking the producer, and the
+writer logs how many were lost.
+
+Messages are formatted on the writer thread, so logging.debug("Partial: %s",
+partial) costs almost nothing on the caller's side. Structured data goes in
+extra={"fields": {...}} and becomes keys of the JSON line.
+
+High-volume audio-level debug data (frame energies, wake word scores, ...)
+can be logged with event(kind, value) to a separate binary file of 14-byte
+records instead; read_events() loads it back as a numpy array.
+"""
+
+import os
+import json
+import time
+import queue
+import struct
+import logging
+import threading
+import traceback
+
+import numpy as np
+
+EVENT_KINDS = {"frame_energy": 1, "noise_floor": 2, "wake_score": 3, "speech": 4}
+EVENT = struct.Struct("<dHf")  # time.time(), kind, value
+EVENT_DTYPE = np.dtype([("time", "<f8"), ("kind", "<u2"), ("value", "<f4")])
+
+
+class QueueLogHandler(logging.Handler):
+    """Hands records to the pipeline without formatting them; drops them if it is full."""
+
+    def __init__(self, pipeline, level=logging.NOTSET):
+        super().__init__(level)
+        self.pipeline = pipeline
+
+    def emit(self, record):
+        try:
+            self.pipeline.records.put_nowait(record)
+        except queue.Full:
+            self.pipeline.dropped += 1  # a lost update under overload is fine, it's only a counter
+
+
+class RotatingWriter:
+    """Append-only file renamed to path.1, path.2, ... once it reaches max_bytes."""
+
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.rotations = 0
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+
+    def write(self, data):
+        if self.size and self.size + len(data) > self.max_bytes:
+            self.rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "ab")
+        self.size = 0
+        self.rotations += 1
+
+    def close(self):
+        self.file.close()
+
+
+class LogPipeline:
+    def __init__(self, path="jarvis.log", max_bytes=5 << 20, backups=3, queue_size=10000,
+                 batch_size=500, flush_interval=0.2, events_path=None):
+        self.records = queue.Queue(maxsize=queue_size)
+        self.events = queue.Queue(maxsize=queue_size) if events_path else None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writer = RotatingWriter(path, max_bytes, backups)
+        self.event_writer = RotatingWriter(events_path, max_bytes, backups) if events_path else None
+        self.handler = QueueLogHandler(self)
+        self.written = 0
+        self.dropped = 0
+        self.events_written = 0
+        self.events_dropped = 0
+        self._reported_drops = 0
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def install(self, level=logging.INFO, logger=None):
+        """Make this pipeline the only handler of `logger` (default: the root logger)."""
+        logger = logger or logging.getLogger()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(self.handler)
+        logger.setLevel(level)
+        return self
+
+    def event(self, kind, value):
+        """Record an audio-level debug event in the binary file; never blocks."""
+        if self.events is None:
+            return
+        try:
+            self.events.put_nowait(EVENT.pack(time.time(), EVENT_KINDS[kind], value))
+        except queue.Full:
+            self.events_dropped += 1
+
+    # ---- writer thread ----
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                record = self.records.get(timeout=self.flush_interval)
+                if record is not None:
+                    batch.append(record)
+            except queue.Empty:
+                pass
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.records.get_nowait()
+                except queue.Empty:
+                    break
+                if record is not None:
+                    batch.append(record)
+            self._write(batch)
+            self._write_events()
+            if self._stopping and self.records.empty() and (self.events is None or self.events.empty()):
+                break
+
+    def _write(self, batch):
+        lines = [self._format(record) for record in batch]
+        dropped = self.dropped
+        if dropped > self._reported_drops:
+            lines.append(json.dumps({"time": self._time(time.time()), "level": "WARNING", "thread": "log-writer",
+                                     "message": f"Log queue full, dropped {dropped - self._reported_drops} records",
+                                     "dropped_total": dropped}))
+            self._reported_drops = dropped
+        if lines:
+            self.writer.write(("\n".join(lines) + "\n").encode("utf-8"))
+            self.written += len(batch)
+
+    def _write_events(self):
+        if self.events is None:
+            return
+        chunks = []
+        while len(chunks) < self.batch_size * 20:
+            try:
+                chunks.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        if chunks:
+            self.event_writer.write(b"".join(chunks))
+            self.events_written += len(chunks)
+
+    @staticmethod
+    def _time(created):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created)) + f".{int(created % 1 * 1000):03d}"
+
+    def _format(self, record):
+        try:
+            message = record.getMessage()
+        except Exception as e:
+            message = f"{record.msg!r} (bad log arguments: {e})"
+        entry = {"time": self._time(record.created), "level": record.levelname,
+                 "thread": record.threadName, "message": message}
+        if record.name != "root":
+            entry["logger"] = record.name
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info))
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            entry.update(fields)
+        return json.dumps(entry, default=str)
+
+    # ---- reporting ----
+
+    def stats(self):
+        return {"written": self.written, "dropped": self.dropped, "queued": self.records.qsize(),
+                "events_written": self.events_written, "events_dropped": self.events_dropped,
+                "rotations": self.writer.rotations}
+
+    def prometheus(self, prefix="jarvis"):
+        return "\n".join([
+            f"# HELP {prefix}_log_records_total Log records written, and dropped because the queue was full.",
+            f"# TYPE {prefix}_log_records_total counter",
+            f'{prefix}_log_records_total{{result="written"}} {self.written}',
+            f'{prefix}_log_records_total{{result="dropped"}} {self.dropped}',
+            f"# HELP {prefix}_log_events_total Binary debug events written, and dropped because the queue was full.",
+            f"# TYPE {prefix}_log_events_total counter",
+            f'{prefix}_log_events_total{{result="written"}} {self.events_written}',
+            f'{prefix}_log_events_total{{result="dropped"}} {self.events_dropped}',
+        ]) + "\n"
+
+    def close(self, timeout=5):
+        """Write out everything queued and stop the writer thread."""
+        self._stopping = True
+        try:
+            self.records.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self.writer.close()
+        if self.event_writer is not None:
+            self.event_writer.close()
+
+
+def read_events(path):
+    """Binary event log -> numpy array with fields time, kind, value."""
+    return np.fromfile(path, dtype=EVENT_DTYPE)
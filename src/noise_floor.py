@@ -0,0 +1,51 @@
+"""
+Background noise floor tracking for Jarvis.
+
+Instead of pausing for adjust_for_ambient_noise() before every listen, the
+estimator is fed every frame from the capture thread and keeps an exponential
+moving average of the energy of non-speech frames. Listeners read the current
+speech threshold instantly from .threshold.
+"""
+
+import numpy as np
+
+from wakeword import SAMPLE_RATE, FRAME_SAMPLES
+
+
+class NoiseFloorEstimator:
+    """
+    Exponential moving average of background energy over non-speech frames.
+
+    Frames below the current threshold update the floor with time constant
+    `attack`; louder frames are treated as speech and only nudge it with the
+    much slower `release`, so a steady new noise source (a fan, the dishwasher)
+    is still absorbed eventually without speech pulling the floor up.
+    """
+
+    def __init__(self, ratio=1.5, minimum=50.0, attack=1.0, release=20.0,
+                 frame_seconds=FRAME_SAMPLES / SAMPLE_RATE):
+        self.ratio = ratio  # threshold = floor * ratio (matches sr.Recognizer.dynamic_energy_ratio)
+        self.minimum = minimum
+        self.floor = None
+        self.threshold = minimum
+        self.frames = 0
+        self._fast = float(np.exp(-frame_seconds / attack))
+        self._slow = float(np.exp(-frame_seconds / release))
+
+    def update(self, frame):
+        """Fold one int16 frame into the estimate and return the new threshold."""
+        samples = frame.astype(np.float64)
+        energy = float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+        if self.floor is None:
+            self.floor = energy
+        else:
+            alpha = self._fast if energy <= self.threshold else self._slow
+            self.floor = alpha * self.floor + (1.0 - alpha) * energy
+        self.frames += 1
+        self.threshold = max(self.floor * self.ratio, self.minimum)
+        return self.threshold
+
+    def is_speech(self, frame) -> bool:
+        """True if the frame is louder than the current threshold."""
+        samples = frame.astype(np.float64)
+        return bool(len(samples)) and float(np.sqrt(np.mean(samples * samples))) > self.threshold
@@ -0,0 +1,142 @@
+"""
+Two-tier answer cache for Jarvis lookups (Wikipedia, DuckDuckGo).
+
+Answers are keyed by source and normalized query ("Who is Ada Lovelace?" and
+"who is ada lovelace" are the same question). A small in-memory LRU sits in
+front of a SQLite table, so answers survive restarts.
+
+- Each source has its own TTL, and "not found" results are cached too, with
+  a shorter TTL.
+- An entry past its TTL but still inside the stale window is returned
+  immediately while a background thread refreshes it (stale-while-revalidate).
+- Lookups that raise (network down) are never cached.
+"""
+
+import re
+import time
+import sqlite3
+import logging
+import threading
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+class ResponseCache:
+    """In-memory LRU in front of a persistent SQLite store."""
+
+    def __init__(self, path="responses.db", memory_size=256):
+        self.path = path
+        self.memory_size = memory_size
+        self.memory = OrderedDict()  # (source, key) -> (value, stored_at)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+        self.lock = threading.Lock()
+        self._db = None
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-refresh")
+
+    @property
+    def db(self):
+        """SQLite connection, opened on first use."""
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " source TEXT NOT NULL, key TEXT NOT NULL, value TEXT, stored_at REAL NOT NULL,"
+                " PRIMARY KEY (source, key))"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, source, key):
+        """Return (value, stored_at) or None. A value of None is a cached "not found"."""
+        with self.lock:
+            entry = self.memory.get((source, key))
+            if entry is not None:
+                self.memory.move_to_end((source, key))
+                self.stats["memory_hits"] += 1
+                return entry
+            row = self.db.execute("SELECT value, stored_at FROM responses WHERE source = ? AND key = ?",
+                                  (source, key)).fetchone()
+            if row is None:
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember((source, key), (row[0], row[1]))
+            return row[0], row[1]
+
+    def put(self, source, key, value, stored_at=None):
+        stored_at = time.time() if stored_at is None else stored_at
+        with self.lock:
+            self._remember((source, key), (value, stored_at))
+            self.db.execute("INSERT OR REPLACE INTO responses (source, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                            (source, key, value, stored_at))
+            self.db.commit()
+
+    def _remember(self, memory_key, entry):
+        self.memory[memory_key] = entry
+        self.memory.move_to_end(memory_key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+
+    def cached(self, source, ttl=DAY, negative_ttl=HOUR, stale=DAY):
+        """
+        Decorator for lookup(query) -> str or None (None means "not found").
+
+        ttl applies to answers, negative_ttl to "not found"; for `stale`
+        seconds after expiry the old value is served while it is refreshed.
+        """
+        def decorator(lookup):
+            @functools.wraps(lookup)
+            def wrapper(query):
+                key = normalize_query(query)
+                entry = self.get(source, key)
+                if entry is not None:
+                    value, stored_at = entry
+                    age = time.time() - stored_at
+                    fresh_for = ttl if value is not None else negative_ttl
+                    if age < fresh_for:
+                        return value
+                    if age < fresh_for + stale:
+                        self.stats["stale_hits"] += 1
+                        self._refresh(source, key, lookup, query)
+                        return value
+                self.stats["misses"] += 1
+                value = lookup(query)
+                self.put(source, key, value)
+                return value
+            wrapper.cache = self
+            return wrapper
+        return decorator
+
+    def _refresh(self, source, key, lookup, query):
+        """Re-run a lookup in the background, once per key at a time."""
+        with self.lock:
+            if (source, key) in self._refreshing:
+                return
+            self._refreshing.add((source, key))
+
+        def run():
+            try:
+                self.put(source, key, lookup(query))
+                self.stats["refreshes"] += 1
+            except Exception as e:
+                logging.warning(f"Background refresh of {source} '{key}' failed: {e}")
+            finally:
+                with self.lock:
+                    self._refreshing.discard((source, key))
+
+        self._refresher.submit(run)
@@ -0,0 +1,266 @@
+"""
+Safe arithmetic for the "calculate" command.
+
+Expressions are parsed with the ast module and only numbers, + - * / // %
+**, parentheses, a few functions (sqrt, log, ln, abs, round, percent) and
+the constants pi and e are accepted. The checked syntax tree is compiled
+into a tree of closures and kept in an LRU cache, so asking the same thing
+again costs a few microseconds.
+
+Nothing can run away with the CPU:
+- the expression is at most MAX_LENGTH characters and MAX_NODES syntax
+  nodes (the step budget: there are no loops, so every node is evaluated
+  at most once);
+- integers are limited to MAX_BITS bits, and * and ** check the size of
+  their result before computing it, so 9**9**9 is refused at once instead
+  of freezing the assistant;
+- exponents are limited to MAX_EXPONENT.
+
+Spoken input ("five times seven", "square root of one hundred and
+forty four", "twenty percent of eighty") is turned into an expression by
+text2num and spoken_expression first.
+"""
+
+import re
+import ast
+import math
+import operator
+import functools
+
+MAX_LENGTH = 200
+MAX_NODES = 100
+MAX_BITS = 1024          # about 308 digits, the range of a float
+MAX_EXPONENT = 1024
+
+
+class MathError(ValueError):
+    """The expression is not allowed or has no answer; the message can be spoken."""
+
+
+# ------------- Spoken numbers -------------
+
+UNITS = {word: n for n, word in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+    "sixteen seventeen eighteen nineteen".split())}
+TENS = {word: 10 * n for n, word in enumerate("twenty thirty forty fifty sixty seventy eighty ninety".split(), 2)}
+SCALES = {"thousand": 10 ** 3, "million": 10 ** 6, "billion": 10 ** 9, "trillion": 10 ** 12}
+NUMBER_WORDS = set(UNITS) | set(TENS) | set(SCALES) | {"hundred"}
+
+
+def text2num(text: str):
+    """
+    Convert number words to digits: "three hundred and forty two" -> "342",
+    "twenty-five point five" -> "25.5", "a thousand" -> "1000". Other words
+    are kept; separate numbers stay separate ("one two" -> "1 2").
+    """
+    # Punctuation after a word is its own token: "four?" is still a number
+    tokens = re.sub(r"(?<=[a-z])([?!.,])", r" \1", text.lower()).replace("-", " - ").split()
+    # "twenty - five" was a hyphenated number, not a subtraction
+    tokens = [t for i, t in enumerate(tokens)
+              if not (t == "-" and 0 < i < len(tokens) - 1 and tokens[i - 1] in TENS and tokens[i + 1] in UNITS)]
+    result = []
+    total = current = 0
+    last = None   # kind of the previous number word in the current number, None outside a number
+
+    def flush():
+        nonlocal total, current, last
+        if last is not None:
+            result.append(str(total + current))
+        total = current = 0
+        last = None
+
+    i = 0
+    while i < len(tokens):
+        word = tokens[i]
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if word in UNITS:
+            kind = "teen" if UNITS[word] >= 10 else "unit"
+            if last in ("unit", "teen") or (last == "tens" and kind == "teen"):
+                flush()
+            current += UNITS[word]
+            last = kind
+        elif word in TENS:
+            if last in ("unit", "teen", "tens"):
+                flush()
+            current += TENS[word]
+            last = "tens"
+        elif word == "hundred":
+            if last == "hundred":
+                flush()
+            current = (current or 1) * 100
+            last = "hundred"
+        elif word in SCALES:
+            total += (current or 1) * SCALES[word]
+            current = 0
+            last = "scale"
+        elif word == "a" and following in ("hundred", *SCALES) and last is None:
+            pass  # "a hundred", "a million"
+        elif word == "and" and last in ("hundred", "scale") and following in NUMBER_WORDS - set(SCALES):
+            pass  # "one hundred and five"
+        elif word == "point" and last is not None and following in UNITS and UNITS[following] < 10:
+            digits = []
+            while i + 1 < len(tokens) and tokens[i + 1] in UNITS and UNITS[tokens[i + 1]] < 10:
+                i += 1
+                digits.append(str(UNITS[tokens[i]]))
+            result.append(f"{total + current}.{''.join(digits)}")
+            total = current = 0
+            last = None
+        else:
+            flush()
+            result.append(word)
+        i += 1
+    flush()
+    return " ".join(result)
+
+
+SPOKEN_OPERATORS = [(re.compile(pattern), replacement) for pattern, replacement in [
+    (r"\b(?:raised )?to the power of\b|\braised to\b", " ** "),
+    (r"\bsquared\b", " ** 2 "),
+    (r"\bcubed\b", " ** 3 "),
+    (r"\bmultiplied by\b|\btimes\b|(?<=\d)\s*x\s*(?=[\d(])", " * "),
+    (r"\bdivided by\b|\bover\b", " / "),
+    (r"\bplus\b|\badded to\b", " + "),
+    (r"\bminus\b|\bnegative\b|\bsubtract\b", " - "),
+    (r"\bmod(?:ulo)?\b", " mod "),
+    (r"\b(?:the )?square root of\b", " sqrt "),
+    (r"\b(?:the )?natural log(?:arithm)? of\b", " ln "),
+    (r"\b(?:the )?log(?:arithm)? of\b", " log "),
+    (r"\bper ?cent\b(?!\s*\()", " % "),
+    (r"\bopen (?:bracket|parenthesis)\b", " ( "),
+    (r"\bclose (?:bracket|parenthesis)\b", " ) "),
+]]
+FILLER = re.compile(r"\b(?:what(?:'s| is)|whats|how much is|is|equals?|the|please)\b|[?!=]|(?<!\d)\.(?!\d)")
+NUMBER = r"(?:\d+(?:\.\d*)?|\.\d+)"
+PERCENT_OF = re.compile(rf"({NUMBER})\s*%\s*of\b")
+PERCENT = re.compile(rf"({NUMBER})\s*%(?=\s*(?:$|\)))")
+BARE_FUNCTION = re.compile(rf"\b(sqrt|ln|log|abs)\s+({NUMBER})")
+
+
+@functools.lru_cache(maxsize=512)
+def spoken_expression(text: str):
+    """Turn a (possibly spoken) calculation into an expression: "five times seven" -> "5 * 7"."""
+    text = text2num(text)
+    for pattern, replacement in SPOKEN_OPERATORS:
+        text = pattern.sub(replacement, text)
+    text = FILLER.sub(" ", text.replace("^", "**").replace("×", "*").replace("÷", "/"))
+    # "20 % of 80" and "100 + 15 %" are percentages; "7 % 3" stays a remainder
+    text = PERCENT_OF.sub(r"percent(\1) *", text)
+    text = PERCENT.sub(r"percent(\1)", text)
+    text = text.replace(" mod ", " % ")
+    # Functions said without brackets: "sqrt 144" -> "sqrt(144)"
+    text = BARE_FUNCTION.sub(r"\1(\2)", text)
+    return " ".join(text.split())
+
+
+# ------------- Evaluation -------------
+
+def checked(value):
+    if isinstance(value, complex):
+        raise MathError("That has no real answer.")
+    if isinstance(value, int) and value.bit_length() > MAX_BITS:
+        raise MathError("That number is too big.")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise MathError("That number is too big." if math.isinf(value) else "That has no answer.")
+    return value
+
+
+def power(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise MathError("That exponent is too big.")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if (base.bit_length() - 1) * exponent > MAX_BITS:
+            raise MathError("That number is too big.")
+    return base ** exponent
+
+
+def multiply(a, b):
+    if isinstance(a, int) and isinstance(b, int) and a.bit_length() + b.bit_length() > MAX_BITS + 1:
+        raise MathError("That number is too big.")
+    return a * b
+
+
+def percent(value, of=None):
+    """percent(20) is 0.2; percent(20, 80) is 20 % of 80."""
+    return value / 100 if of is None else value / 100 * of
+
+
+def log(value, base=None):
+    return math.log10(value) if base is None else math.log(value, base)
+
+
+BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: multiply, ast.Div: operator.truediv,
+          ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: power}
+UNARY = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+FUNCTIONS = {"sqrt": (math.sqrt, 1, 1), "ln": (math.log, 1, 1), "log": (log, 1, 2), "abs": (abs, 1, 1),
+             "round": (round, 1, 2), "percent": (percent, 1, 2)}  # name -> (function, min args, max args)
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+
+def _compile(node, budget):
+    """Check one syntax node and return a closure computing its value."""
+    budget[0] -= 1
+    if budget[0] < 0:
+        raise MathError("That expression is too long.")
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = checked(node.value)
+        return lambda: value
+    if isinstance(node, ast.Name) and node.id in CONSTANTS:
+        value = CONSTANTS[node.id]
+        return lambda: value
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY:
+        op, left, right = BINARY[type(node.op)], _compile(node.left, budget), _compile(node.right, budget)
+        return lambda: checked(op(left(), right()))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY:
+        op, operand = UNARY[type(node.op)], _compile(node.operand, budget)
+        return lambda: op(operand())
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+        func, least, most = FUNCTIONS[node.func.id]
+        if node.keywords or not least <= len(node.args) <= most:
+            raise MathError(f"{node.func.id} takes {least if least == most else f'{least} or {most}'} "
+                            f"number{'s' if most > 1 else ''}.")
+        args = [_compile(arg, budget) for arg in node.args]
+        if node.func.id == "round" and len(args) == 2:
+            digits = args[1]
+            args[1] = lambda: int(max(-MAX_EXPONENT, min(MAX_EXPONENT, digits())))
+        return lambda: checked(func(*(arg() for arg in args)))
+    if isinstance(node, ast.Name):
+        raise MathError(f"I don't know what {node.id} means.")
+    raise MathError("I can only do arithmetic.")
+
+
+@functools.lru_cache(maxsize=512)
+def compile_expression(expression: str):
+    """The checked expression as a function of no arguments; raises MathError."""
+    if len(expression) > MAX_LENGTH:
+        raise MathError("That expression is too long.")
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        raise MathError("I couldn't understand that expression.") from None
+    return _compile(tree.body, [MAX_NODES])
+
+
+def evaluate(text: str):
+    """Value of a typed or spoken calculation; raises MathError."""
+    if len(text) > 4 * MAX_LENGTH:  # spoken words take more room than the expression they become
+        raise MathError("That expression is too long.")
+    compiled = compile_expression(spoken_expression(text))
+    try:
+        return compiled()
+    except ZeroDivisionError:
+        raise MathError("I can't divide by zero.") from None
+    except OverflowError:
+        raise MathError("That number is too big.") from None
+    except (ValueError, TypeError) as e:
+        if isinstance(e, MathError):
+            raise
+        raise MathError("That has no answer.") from None
+
+
+def format_number(value):
+    """Value as it should be spoken: whole numbers without ".0", others to 10 significant digits."""
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        value = int(value)
+    if isinstance(value, int):
+        return str(value)
+    return f"{value:.10g}"
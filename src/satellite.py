@@ -0,0 +1,726 @@
+"""
+Satellite microphones for Jarvis.
+
+A satellite is a small process in another room (a Pi Zero with a USB
+microphone and a speaker). It captures audio into the same ring buffer as
+the main assistant, detects the wake word locally and only then streams the
+command to the central Jarvis over TCP. The central server runs speech
+recognition, routing and the LLM, and sends the spoken answer back to the
+room it came from.
+
+Protocol: every message is a 5-byte header (kind, payload length) and a
+payload. Control messages carry JSON; audio is 16 kHz mono G.711 mu-law,
+half the size of 16-bit PCM and plenty for speech recognition.
+
+    satellite -> server: HELLO {node, room}, START {utterance}, AUDIO frame..., END {utterance, reason}
+    server -> satellite: WELCOME {session, credit}, CREDIT {frames},
+                         SAY {text}, SPEECH chunk..., SAY_END {cancelled}
+
+Backpressure works both ways. A satellite may only have `credit` audio
+frames in flight; the server hands credit back as its speech recognizer
+consumes them, so a slow recognizer makes the satellite wait, with the
+audio held in its ring buffer rather than dropped or queued without bound.
+Answers are written with drain(), so a satellite that stops reading only
+holds up its own room, and is disconnected after SEND_TIMEOUT.
+
+Each node has one session on the server; a node that reconnects replaces
+its old session. Rooms are handled concurrently.
+
+Run a satellite with:
+    python satellite.py --server jarvis.local:5001 --room kitchen [--wav replay.wav --save-speech out/]
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import struct
+import asyncio
+import logging
+import argparse
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from wakeword import load_wake_word_detector, load_wav, SAMPLE_RATE, FRAME_SAMPLES
+from audio_capture import AudioCapture
+from noise_floor import NoiseFloorEstimator
+from vad import Endpointer
+
+SATELLITE_PORT = 5001
+CREDIT_WINDOW = 64        # audio frames a satellite may have in flight (about 2 s)
+SEND_TIMEOUT = 10.0       # seconds a satellite may stall reading before it is disconnected
+HELLO_TIMEOUT = 5.0
+SPEECH_CHUNK = 4096       # samples per SPEECH message
+PLAYBACK_CHUNKS = 8       # SPEECH messages a satellite buffers before it stops reading
+MAX_MESSAGE = 1 << 20
+
+HEADER = struct.Struct("!BI")
+HELLO, WELCOME, START, AUDIO, END, CREDIT, SAY, SPEECH, SAY_END = range(1, 10)
+
+
+class ProtocolError(Exception):
+    """The other side sent something it should not have."""
+
+
+# ------------- Mu-law codec -------------
+
+def _mulaw_tables():
+    # Encode table indexed by the sample's 16-bit pattern, decode table by the byte
+    x = np.arange(-32768, 32768, dtype=np.int64)
+    sign = np.where(x < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(x), 32635) + 0x84
+    exponent = np.floor(np.log2(magnitude)).astype(np.int64) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    encoded = (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+    encode = np.empty(65536, dtype=np.uint8)
+    encode[x.astype(np.int16).view(np.uint16)] = encoded
+    b = ~np.arange(256) & 0xFF
+    magnitude = (((b & 0x0F) << 3) + 0x84) << ((b >> 4) & 0x07)
+    decode = np.where(b & 0x80, 0x84 - magnitude, magnitude - 0x84).astype(np.int16)
+    return encode, decode
+
+
+MULAW_ENCODE, MULAW_DECODE = _mulaw_tables()
+
+
+def mulaw_encode(samples) -> bytes:
+    """int16 samples -> one mu-law byte per sample."""
+    return MULAW_ENCODE[np.asarray(samples, dtype=np.int16).view(np.uint16)].tobytes()
+
+
+def mulaw_decode(data: bytes):
+    """mu-law bytes -> int16 samples."""
+    return MULAW_DECODE[np.frombuffer(data, dtype=np.uint8)]
+
+
+# ------------- Messages -------------
+
+def pack(kind, payload=b""):
+    if isinstance(payload, dict):
+        payload = json.dumps(payload).encode("utf-8")
+    return HEADER.pack(kind, len(payload)) + payload
+
+
+def _parse(header):
+    kind, length = HEADER.unpack(header)
+    if length > MAX_MESSAGE:
+        raise ProtocolError(f"message of {length} bytes")
+    return kind, length
+
+
+def recv_message(sock):
+    """Blocking read of one message: (kind, payload). Raises ConnectionError at EOF."""
+    kind, length = _parse(_recv_exactly(sock, HEADER.size))
+    return kind, _recv_exactly(sock, length)
+
+
+def _recv_exactly(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return bytes(data)
+
+
+async def read_message(reader):
+    kind, length = _parse(await reader.readexactly(HEADER.size))
+    return kind, await reader.readexactly(length)
+
+
+def control(payload):
+    return json.loads(payload.decode("utf-8")) if payload else {}
+
+
+# ------------- Server -------------
+
+class Utterance:
+    """One command streamed from a satellite, decoded as it arrives."""
+
+    def __init__(self, session, number, stt=None):
+        self.session = session
+        self.number = number
+        self.stt = stt          # STTSession fed every frame as it arrives, or None
+        self.chunks = []
+        self.samples = 0
+        self.reason = ""        # why the satellite stopped streaming: "silence", "limit", "timeout"...
+        self.started = time.perf_counter()
+        self.ended = None
+
+    def pcm(self):
+        """All samples received, as one int16 array."""
+        return np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.int16)
+
+
+def _discard(utterance):
+    """Release the STT session of an utterance that won't be transcribed."""
+    stt, utterance.stt = utterance.stt, None
+    if stt is not None:
+        try:
+            stt.close()
+        except Exception as e:
+            logging.error(f"Could not release speech recognition: {e}")
+
+
+class RemoteSpeech:
+    """Speech sent to a satellite; waited on and cancelled like a tts.SpeechHandle."""
+
+    def __init__(self, text):
+        self.text = text
+        self.queued_at = time.perf_counter()
+        self.started_at = None  # when the first audio was sent
+        self.completed = False
+        self.cancelled = False
+        self.future = None
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None) -> bool:
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()  # cancels the task sending it, from any thread
+
+    def _finish(self, completed):
+        self.completed = completed
+        self._done.set()
+
+
+class SatelliteSession:
+    """A connected satellite: one node in one room."""
+
+    def __init__(self, server, node, room, reader, writer):
+        self.server = server
+        self.node = node
+        self.room = room
+        self.id = next(server._ids)
+        self.reader = reader
+        self.writer = writer
+        self.connected_at = time.time()
+        self.queue = asyncio.Queue(server.window + 2)  # credit bounds it; a full queue means credit was ignored
+        self.utterance = None     # being received
+        self.speaking = set()     # RemoteSpeech being sent
+        self.interrupted_at = 0.0  # speech queued before this is not said
+        self.send_lock = asyncio.Lock()
+        self.say_lock = asyncio.Lock()
+        self.utterances = 0
+        self.frames_in = 0
+        self.max_queued = 0
+        self.closed = False
+
+    def say(self, text: str) -> RemoteSpeech:
+        """Thread-safe: synthesize text and play it in this room."""
+        speech = RemoteSpeech(text)
+        speech.future = asyncio.run_coroutine_threadsafe(self.server._say(self, speech), self.server.loop)
+        # Cancelled before it even started
+        speech.future.add_done_callback(lambda future: speech.done or speech._finish(False))
+        return speech
+
+    def interrupt(self):
+        """Barge-in: stop everything being said in this room."""
+        self.interrupted_at = time.perf_counter()
+        for speech in list(self.speaking):
+            speech.cancel()
+
+
+class SatelliteServer:
+    """
+    Accepts satellites on its own asyncio loop and thread.
+
+    on_utterance(utterance) is called on that loop when a command has been
+    received; it should hand the work to another thread (jarvis.py posts a
+    dispatcher event). stt_factory() returns the STT session an utterance is
+    fed to while it streams in, and synthesize(text) returns the int16
+    samples to send back; both are run in the server's thread pool.
+    """
+
+    def __init__(self, on_utterance, stt_factory=None, synthesize=None, host="0.0.0.0", port=SATELLITE_PORT,
+                 window=CREDIT_WINDOW, send_timeout=SEND_TIMEOUT, max_workers=4):
+        self.on_utterance = on_utterance
+        self.stt_factory = stt_factory
+        self.synthesize = synthesize
+        self.host = host
+        self.port = port
+        self.window = window
+        self.send_timeout = send_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="satellite")
+        self.sessions = {}  # node -> SatelliteSession
+        self.loop = None
+        self._server = None
+        self._thread = None
+        self._ids = itertools.count(1)
+        self.counts = dict.fromkeys(("connections", "utterances", "frames_in", "bytes_in", "bytes_out", "replies",
+                                     "cancelled_replies", "slow_disconnects", "protocol_errors"), 0)
+
+    def start(self):
+        """Start listening in a background thread; raises if the port can't be opened."""
+        started = threading.Event()
+        failure = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self._server = self.loop.run_until_complete(asyncio.start_server(self._serve, self.host, self.port))
+            except OSError as e:
+                failure.append(e)
+                started.set()
+                return
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="satellite-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        if failure:
+            raise failure[0]
+        logging.info(f"Satellite server listening on port {self.port}")
+        return self
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            for session in list(self.sessions.values()):
+                self.loop.call_soon_threadsafe(session.writer.close)
+            self.loop.call_soon_threadsafe(self._server.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=2)
+
+    # ---- receiving ----
+
+    async def _serve(self, reader, writer):
+        session = None
+        consumer = None
+        try:
+            kind, payload = await asyncio.wait_for(read_message(reader), HELLO_TIMEOUT)
+            if kind != HELLO:
+                raise ProtocolError("expected HELLO")
+            hello = control(payload)
+            if not hello.get("room"):
+                raise ProtocolError("HELLO without a room")
+            session = SatelliteSession(self, str(hello.get("node") or hello.get("room")), str(hello.get("room")),
+                                       reader, writer)
+            old = self.sessions.get(session.node)
+            if old is not None:
+                logging.info(f"Satellite {session.node} reconnected, closing its old session")
+                self._close(old)
+            self.sessions[session.node] = session
+            self.counts["connections"] += 1
+            logging.info(f"Satellite {session.node} connected from room '{session.room}'")
+            await self._send(session, WELCOME, {"session": session.id, "credit": self.window})
+            consumer = asyncio.create_task(self._consume(session))
+            while True:
+                kind, payload = await read_message(reader)
+                self.counts["bytes_in"] += HEADER.size + len(payload)
+                if kind == AUDIO:
+                    if session.utterance is None:
+                        raise ProtocolError("AUDIO outside an utterance")
+                    self._queue(session, (session.utterance, mulaw_decode(payload)))
+                elif kind == START:
+                    session.interrupt()  # the room is talking again: stop answering
+                    if session.utterance is not None:  # started again without ending the last one
+                        _discard(session.utterance)
+                    stt = None
+                    if self.stt_factory is not None:
+                        try:
+                            stt = await self.loop.run_in_executor(self.executor, self.stt_factory)
+                        except Exception as e:
+                            logging.error(f"No speech recognition for satellite {session.node}: {e}")
+                    session.utterance = Utterance(session, control(payload).get("utterance"), stt)
+                elif kind == END:
+                    if session.utterance is None:
+                        raise ProtocolError("END outside an utterance")
+                    session.utterance.reason = control(payload).get("reason", "")
+                    self._queue(session, (session.utterance, None))
+                    session.utterance = None
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.TimeoutError):
+            pass
+        except (ProtocolError, ValueError) as e:
+            self.counts["protocol_errors"] += 1
+            logging.warning(f"Satellite {session.node if session else '?'}: {e}, disconnecting")
+        finally:
+            if consumer is not None:
+                consumer.cancel()
+            if session is not None:
+                if session.utterance is not None:  # cut off mid-command
+                    _discard(session.utterance)
+                self._close(session)
+                logging.info(f"Satellite {session.node} disconnected")
+            else:
+                writer.close()
+
+    def _queue(self, session, item):
+        try:
+            session.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            raise ProtocolError(f"more than {self.window} frames in flight") from None
+        session.max_queued = max(session.max_queued, session.queue.qsize())
+
+    async def _consume(self, session):
+        """Feed frames to speech recognition and give credit back as they are used up."""
+        credit = 0
+        batch = max(1, self.window // 4)
+        while not session.closed:
+            utterance, samples = await session.queue.get()
+            if samples is None:
+                utterance.ended = time.perf_counter()
+                session.utterances += 1
+                self.counts["utterances"] += 1
+                try:
+                    self.on_utterance(utterance)
+                except Exception as e:
+                    logging.error(f"Satellite utterance handler failed: {e}")
+                continue
+            utterance.chunks.append(samples)
+            utterance.samples += len(samples)
+            if utterance.stt is not None:
+                try:
+                    await self.loop.run_in_executor(self.executor, utterance.stt.accept, samples)
+                except Exception as e:
+                    logging.error(f"Speech recognition failed on satellite audio: {e}")
+                    _discard(utterance)
+            session.frames_in += 1
+            self.counts["frames_in"] += 1
+            credit += 1
+            if credit >= batch or session.queue.empty():
+                try:
+                    await self._send(session, CREDIT, {"frames": credit})
+                except ConnectionError:
+                    return
+                credit = 0
+
+    # ---- sending ----
+
+    async def _send(self, session, kind, payload=b""):
+        """Write one message; a satellite that doesn't read for send_timeout is dropped."""
+        message = pack(kind, payload)
+        async with session.send_lock:
+            if session.closed:
+                raise ConnectionError("session closed")
+            session.writer.write(message)
+            try:
+                await asyncio.wait_for(session.writer.drain(), self.send_timeout)
+            except asyncio.TimeoutError:
+                self.counts["slow_disconnects"] += 1
+                logging.warning(f"Satellite {session.node} stopped reading, disconnecting")
+                self._close(session)
+                raise ConnectionError("satellite too slow") from None
+        self.counts["bytes_out"] += len(message)
+
+    async def _say(self, session, speech):
+        session.speaking.add(speech)
+        sent = False
+        try:
+            async with session.say_lock:  # sentences are spoken in the order they were queued
+                if speech.cancelled or speech.queued_at < session.interrupted_at:
+                    raise asyncio.CancelledError()
+                samples = await self.loop.run_in_executor(self.executor, self.synthesize, speech.text)
+                await self._send(session, SAY, {"text": speech.text})
+                sent = True
+                speech.started_at = time.perf_counter()
+                for start in range(0, len(samples), SPEECH_CHUNK):
+                    await self._send(session, SPEECH, mulaw_encode(samples[start:start + SPEECH_CHUNK]))
+                await self._send(session, SAY_END, {"cancelled": False})
+                self.counts["replies"] += 1
+                speech._finish(True)
+        except asyncio.CancelledError:
+            self.counts["cancelled_replies"] += 1
+            if sent and not session.closed:
+                # Tell the satellite to stop; let this finish even though the task was cancelled
+                asyncio.ensure_future(self._quietly(self._send(session, SAY_END, {"cancelled": True})))
+            speech._finish(False)
+        except Exception as e:
+            logging.error(f"Could not speak in room '{session.room}': {e}")
+            speech._finish(False)
+        finally:
+            session.speaking.discard(speech)
+
+    @staticmethod
+    async def _quietly(coroutine):
+        try:
+            await coroutine
+        except ConnectionError:
+            pass
+
+    def _close(self, session):
+        if not session.closed:
+            session.closed = True
+            session.interrupt()
+            session.writer.close()
+        if self.sessions.get(session.node) is session:
+            del self.sessions[session.node]
+
+    # ---- statistics ----
+
+    def stats(self):
+        rooms = {s.room: {"node": s.node, "utterances": s.utterances, "frames": s.frames_in,
+                          "max_queued": s.max_queued, "speaking": len(s.speaking)}
+                 for s in list(self.sessions.values())}
+        return dict(self.counts, sessions=len(rooms), rooms=rooms, window=self.window)
+
+    def prometheus(self, prefix="jarvis"):
+        """Satellite counters in Prometheus text format."""
+        stats = self.stats()
+        lines = [f"# TYPE {prefix}_satellites gauge", f"{prefix}_satellites {stats['sessions']}"]
+        for name in self.counts:
+            lines += [f"# TYPE {prefix}_satellite_{name}_total counter",
+                      f"{prefix}_satellite_{name}_total {stats[name]}"]
+        return "\n".join(lines) + "\n"
+
+
+# ------------- Satellite -------------
+
+class WavStream:
+    """Input stream replaying a WAV file (then a little silence) as if it were a microphone."""
+
+    def __init__(self, path, speed=1.0, tail=2.0):
+        self.samples = np.concatenate((load_wav(path), np.zeros(int(tail * SAMPLE_RATE), dtype=np.int16)))
+        self.speed = speed
+        self.position = 0
+        self.started = None
+
+    def read(self, n, exception_on_overflow=True):
+        if self.started is None:
+            self.started = time.perf_counter()
+        delay = self.started + (self.position + n) / SAMPLE_RATE / self.speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        chunk = self.samples[self.position:self.position + n]
+        self.position += len(chunk)
+        return chunk.tobytes()
+
+
+def pyaudio_output():
+    """Play int16 samples on the default output device."""
+    import pyaudio
+    audio = pyaudio.PyAudio()
+    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE, output=True)
+    return lambda samples: stream.write(samples.tobytes())
+
+
+class Satellite:
+    """
+    Wake word detection and command streaming for one room.
+
+    The microphone feeds an AudioCapture ring buffer. When the local detector
+    fires, frames are sent from the ring buffer (spending credit) until the
+    local endpointer hears the command end. Answers are played by a playback
+    thread through output(samples).
+    """
+
+    def __init__(self, host, port, room, capture, detector, node=None, output=None, trailing_silence=0.2,
+                 max_speech=15.0, timeout=5.0, reconnect=1.0, linger=10.0):
+        self.address = (host, port)
+        self.room = room
+        self.node = node or room
+        self.capture = capture
+        self.detector = detector
+        self.output = output
+        self.endpointing = dict(trailing_silence=trailing_silence, max_speech=max_speech, timeout=timeout)
+        self.reconnect = reconnect
+        self.linger = linger      # seconds to wait for outstanding answers once the microphone stops
+        self.noise_floor = NoiseFloorEstimator()
+        capture.frame_listeners.append(self.noise_floor.update)
+        self.sock = None
+        self.credit = 0
+        self.window = 0
+        self.connected = False
+        self.credit_cond = threading.Condition()
+        self.playback = queue.Queue(PLAYBACK_CHUNKS)
+        self.playing = None       # text being played
+        self.replies = []         # {"text", "samples", "cancelled"} for every answer received
+        self.speech = []          # samples of the answer being received
+        self.replied = threading.Condition()
+        self.running = False
+        self.stats = dict.fromkeys(("connections", "utterances", "frames_sent", "bytes_sent", "credit_stalls",
+                                    "max_in_flight"), 0)
+        self.stats["stalled_ms"] = 0.0
+
+    def run(self):
+        """Connect (and reconnect) to the server and stream commands until the microphone stops."""
+        self.running = True
+        threading.Thread(target=self._play, name="playback", daemon=True).start()
+        while self.running and not self.capture.ring.closed:
+            try:
+                with socket.create_connection(self.address, timeout=5) as sock:
+                    sock.settimeout(None)
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self._session(sock)
+                    # Replay finished: stay connected for the answers still on their way
+                    self.wait_replies(self.stats["utterances"], timeout=self.linger)
+            except (OSError, ProtocolError) as e:
+                logging.warning(f"Satellite {self.node}: {e}, reconnecting in {self.reconnect:.0f} s")
+                time.sleep(self.reconnect)
+
+    def stop(self):
+        self.running = False
+        if self.sock is not None:
+            self.sock.close()
+
+    def _send(self, kind, payload=b""):
+        message = pack(kind, payload)
+        self.sock.sendall(message)
+        self.stats["bytes_sent"] += len(message)
+
+    def _session(self, sock):
+        self.sock = sock
+        self._send(HELLO, {"node": self.node, "room": self.room})
+        kind, payload = recv_message(sock)
+        if kind != WELCOME:
+            raise ProtocolError("expected WELCOME")
+        with self.credit_cond:
+            self.credit = self.window = control(payload)["credit"]
+            self.connected = True
+        self.stats["connections"] += 1
+        logging.info(f"Satellite {self.node} connected to {self.address[0]}:{self.address[1]}")
+        receiver = threading.Thread(target=self._receive, args=(sock,), name="receiver", daemon=True)
+        receiver.start()
+        reader = self.capture.reader()
+        self.detector.reset()
+        while self.running:
+            frame = reader.read(FRAME_SAMPLES, timeout=1)
+            if frame is None:
+                if self.capture.ring.closed:
+                    return
+                continue
+            if self.detector.process(frame):
+                logging.info(f"Wake word in {self.room} (score {self.detector.last_score:.2f})")
+                self._stream(reader)
+                # Skip what was heard while streaming, answers included
+                reader = self.capture.reader()
+                self.detector.reset()
+
+    def _stream(self, reader):
+        """Send the command following the wake word, frame by frame, as credit allows."""
+        self._stop_playback()  # barge-in
+        number = self.stats["utterances"] = self.stats["utterances"] + 1
+        self._send(START, {"utterance": number})
+        endpointer = Endpointer(lambda: self.noise_floor.threshold, **self.endpointing)
+        while not endpointer.done:
+            with self.credit_cond:
+                if self.credit <= 0:
+                    self.stats["credit_stalls"] += 1
+                    stalled = time.perf_counter()
+                    self.credit_cond.wait_for(lambda: self.credit > 0 or not (self.running and self.connected))
+                    self.stats["stalled_ms"] += (time.perf_counter() - stalled) * 1000
+                    if not self.connected:
+                        raise ConnectionError("server closed the connection")
+                self.credit -= 1
+                self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.window - self.credit)
+            frame = reader.read(FRAME_SAMPLES, timeout=1)
+            if frame is None:
+                break
+            endpointer.feed(frame)
+            self._send(AUDIO, mulaw_encode(frame))
+            self.stats["frames_sent"] += 1
+        self._send(END, {"utterance": number, "reason": endpointer.ended_by or "stopped"})
+
+    def _receive(self, sock):
+        try:
+            while True:
+                kind, payload = recv_message(sock)
+                if kind == CREDIT:
+                    with self.credit_cond:
+                        self.credit += control(payload)["frames"]
+                        self.credit_cond.notify_all()
+                elif kind == SAY:
+                    self.playing = control(payload)["text"]
+                    self.speech = []
+                    logging.info(f"Saying: {self.playing}")
+                elif kind == SPEECH:
+                    samples = mulaw_decode(payload)
+                    self.speech.append(samples)
+                    self.playback.put(samples)  # blocks while the speaker is behind: TCP backpressure
+                elif kind == SAY_END:
+                    samples = np.concatenate(self.speech) if self.speech else np.zeros(0, dtype=np.int16)
+                    with self.replied:
+                        self.replies.append({"text": self.playing, "samples": samples,
+                                             "cancelled": control(payload).get("cancelled", False)})
+                        self.replied.notify_all()
+                    self.playing = None
+        except (OSError, ConnectionError, ProtocolError):
+            with self.credit_cond:
+                self.connected = False
+                self.credit_cond.notify_all()
+
+    def _play(self):
+        while True:
+            samples = self.playback.get()
+            if self.output is not None:
+                try:
+                    self.output(samples)
+                except Exception as e:
+                    logging.error(f"Playback failed: {e}")
+
+    def _stop_playback(self):
+        while True:
+            try:
+                self.playback.get_nowait()
+            except queue.Empty:
+                break
+
+    def wait_replies(self, count, timeout=None):
+        """Wait until `count` answers have been received."""
+        with self.replied:
+            return self.replied.wait_for(lambda: len(self.replies) >= count, timeout)
+
+
+def save_wav(path, samples):
+    import wave
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Jarvis satellite microphone")
+    parser.add_argument('--server', default=f"localhost:{SATELLITE_PORT}", help='central Jarvis, host:port')
+    parser.add_argument('--room', required=True)
+    parser.add_argument('--node', help='name of this satellite (default: the room)')
+    parser.add_argument('--templates', default=os.getenv("WAKE_WORD_TEMPLATES", "wakeword"))
+    parser.add_argument('--threshold', type=float, default=float(os.getenv("WAKE_WORD_THRESHOLD", "0.75")))
+    parser.add_argument('--wav', help='replay this file instead of using the microphone')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed')
+    parser.add_argument('--save-speech', help='write answers to WAV files in this directory instead of playing them')
+    parser.add_argument('--linger', type=float, default=10.0, help='seconds to wait for answers after a replay')
+    parser.add_argument('--stats', action='store_true', help='print statistics as JSON when done')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s {args.node or args.room} %(levelname)s %(message)s")
+
+    detector = load_wake_word_detector(args.templates, threshold=args.threshold)
+    if detector is None:
+        sys.exit(f"No wake word templates in '{args.templates}'")
+    host, _, port = args.server.rpartition(":")
+    capture = AudioCapture(stream=WavStream(args.wav, args.speed) if args.wav else None).start()
+    satellite = Satellite(host or "localhost", int(port), args.room, capture, detector, node=args.node,
+                          output=None if args.save_speech else pyaudio_output(), linger=args.linger)
+    try:
+        satellite.run()
+    except KeyboardInterrupt:
+        pass
+    satellite.stop()
+    capture.stop()
+    if args.save_speech:
+        os.makedirs(args.save_speech, exist_ok=True)
+        for n, reply in enumerate(satellite.replies, 1):
+            save_wav(os.path.join(args.save_speech, f"{satellite.node}-{n}.wav"), reply["samples"])
+    if args.stats:
+        print(json.dumps(dict(satellite.stats, node=satellite.node, room=satellite.room,
+                              replies=[{"text": r["text"], "samples": len(r["samples"]), "cancelled": r["cancelled"]}
+                                       for r in satellite.replies])))
+
+
+if __name__ == "__main__":
+    main()
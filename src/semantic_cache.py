@@ -0,0 +1,162 @@
+"""
+Similarity-keyed cache for GPT answers.
+
+Questions that reach GPT are often repeats phrased slightly differently
+("what's the weather like in general in march" / "whats the weather generally
+like in march"). Each prompt is turned into a hashed bag of character
+trigrams plus stemmed words, L2-normalized, and stored as a row of a
+preallocated matrix. Content words weigh more than trigrams, so "... in march"
+and "... in april" stay apart even though most trigrams agree.
+
+A lookup is one matrix-vector product over all live rows. The best match is
+used if its cosine similarity reaches the threshold and it is younger than
+the TTL.
+
+Entries are keyed on the system prompt and the question, not on the rest of
+the conversation, so a repeat is answered from the cache in the middle of a
+conversation too. A question that refers back to earlier turns ("how tall
+is it?", "and in April?") depends on that conversation. When such a
+question has earlier turns before it, it is neither looked up nor stored.
+When the cache is full the least recently used row is overwritten.
+"""
+
+import re
+import time
+import zlib
+import threading
+
+import numpy as np
+
+STOP_WORDS = {"a", "an", "the", "is", "are", "was", "of", "in", "on", "at", "to", "for", "me", "please",
+              "like", "what", "whats", "who", "how", "can", "you", "tell"}
+WORD_WEIGHT = 5.0  # weight of a content word relative to one character trigram
+# Words that point back at earlier turns: a question using them only makes sense in its conversation
+FOLLOW_UP_WORDS = {"it", "its", "this", "that", "these", "those", "they", "them", "their", "theirs", "he", "him",
+                   "his", "she", "her", "hers", "there", "then", "also", "else", "again", "same", "another",
+                   "other", "one", "ones", "former", "latter", "more", "why"}
+FOLLOW_UP_STARTS = ("and ", "but ", "so ", "what about ", "how about ", "what else")
+
+
+def normalize_prompt(text: str) -> str:
+    """Lowercase, drop apostrophes ("what's" -> "whats") and other punctuation."""
+    text = re.sub(r"['’]", "", text.lower())
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def stem(word: str) -> str:
+    """Crude suffix stripping so "generally" and "general" share a feature."""
+    for suffix in ("ly", "ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+class SemanticCache:
+    """Nearest-neighbour answer cache over n-gram vectors."""
+
+    def __init__(self, threshold=0.85, ttl=3600.0, max_entries=512, dims=4096):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.dims = dims
+        self.vectors = np.zeros((max_entries, dims), dtype=np.float32)
+        self.contexts = np.zeros(max_entries, dtype=np.int64)
+        self.stored_at = np.full(max_entries, -np.inf)  # -inf marks a free row
+        self.last_used = np.zeros(max_entries)
+        self.prompts = [None] * max_entries
+        self.answers = [None] * max_entries
+        self.latency = np.zeros(max_entries)  # seconds the original request took
+        self.tokens = np.zeros(max_entries, dtype=np.int64)
+        self.hits = 0
+        self.misses = 0
+        self.latency_saved = 0.0
+        self.tokens_saved = 0
+        self.follow_ups = 0  # lookups skipped because the answer depends on the conversation
+        self.lock = threading.Lock()
+
+    def vectorize(self, text: str):
+        """Hashed character-trigram + weighted word counts, L2-normalized."""
+        text = normalize_prompt(text)
+        padded = f" {text} "
+        words = text.split()
+        features = [padded[i:i + 3] for i in range(len(padded) - 2)] + ["w:" + stem(w) for w in words]
+        weights = [1.0] * (len(padded) - 2) + [1.0 if w in STOP_WORDS else WORD_WEIGHT for w in words]
+        vector = np.zeros(self.dims, dtype=np.float32)
+        if not words:
+            return vector
+        index = np.fromiter((zlib.crc32(f.encode()) % self.dims for f in features), dtype=np.int64,
+                            count=len(features))
+        np.add.at(vector, index, np.asarray(weights, dtype=np.float32))
+        return vector / np.linalg.norm(vector)
+
+    @staticmethod
+    def context_key(messages):
+        """Hash of the system prompt; only questions asked with the same one can match."""
+        system = messages[0]["content"] if len(messages) > 1 and messages[0]["role"] == "system" else ""
+        return zlib.crc32(system.encode())
+
+    @staticmethod
+    def depends_on_context(messages):
+        """True for a follow-up question: earlier turns come before it and it refers back to them."""
+        if len(messages) <= 2:  # system prompt and question: nothing to refer back to
+            return False
+        text = normalize_prompt(messages[-1]["content"])
+        return text.startswith(FOLLOW_UP_STARTS) or not FOLLOW_UP_WORDS.isdisjoint(text.split())
+
+    def lookup(self, messages):
+        """Return (answer, similarity) for the closest live entry, or (None, best similarity)."""
+        if self.depends_on_context(messages):
+            with self.lock:
+                self.follow_ups += 1
+            return None, 0.0
+        vector = self.vectorize(messages[-1]["content"])
+        context = self.context_key(messages)
+        now = time.time()
+        with self.lock:
+            live = (now - self.stored_at < self.ttl) & (self.contexts == context)
+            scores = np.where(live, self.vectors @ vector, -1.0)
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, max(similarity, 0.0)
+            self.hits += 1
+            self.last_used[best] = now
+            self.latency_saved += self.latency[best]
+            self.tokens_saved += int(self.tokens[best])
+            return self.answers[best], similarity
+
+    def store(self, messages, answer, latency=0.0, tokens=0):
+        """Remember an answer, with what it cost to get it (not for follow-up questions)."""
+        if self.depends_on_context(messages):
+            return
+        vector = self.vectorize(messages[-1]["content"])
+        now = time.time()
+        with self.lock:
+            expired = now - self.stored_at >= self.ttl
+            # Free or expired rows first, otherwise the least recently used one
+            row = int(np.argmax(expired)) if expired.any() else int(np.argmin(self.last_used))
+            self.vectors[row] = vector
+            self.contexts[row] = self.context_key(messages)
+            self.stored_at[row] = now
+            self.last_used[row] = now
+            self.prompts[row] = messages[-1]["content"]
+            self.answers[row] = answer
+            self.latency[row] = latency
+            self.tokens[row] = tokens
+
+    def __len__(self):
+        return int(np.count_nonzero(time.time() - self.stored_at < self.ttl))
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self),
+                "latency_saved_ms": round(self.latency_saved * 1000),
+                "tokens_saved": self.tokens_saved,
+                "follow_ups": self.follow_ups,
+            }
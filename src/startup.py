@@ -0,0 +1,134 @@
+"""
+Startup orchestration for Jarvis.
+
+Opening the microphone, starting the speech engine, loading wake word
+templates or a speech recognition model and warming up HTTP connections
+each take from a few hundred milliseconds to seconds on a Pi. Done one
+after another before the dashboard comes up, they add up to a slow cold
+start, and one missing device stops everything.
+
+Startup runs each component's init function in its own thread as soon as
+the components it needs are ready, so independent ones overlap. Callers
+that need a component block in get() until it is ready (or raise
+StartupError if it failed), and everything that does not need it carries
+on: with no microphone the dashboard and typed commands still work. Lazy
+components only start the first time someone asks for them.
+
+Each component goes pending -> starting -> ready / failed; on_change is
+called with states() after every change so the dashboard can show them.
+"""
+
+import time
+import logging
+import threading
+
+PENDING, STARTING, READY, FAILED = "pending", "starting", "ready", "failed"
+
+
+class StartupError(RuntimeError):
+    """A component (or one it needs) failed to start."""
+
+
+class Component:
+    def __init__(self, name, init, needs=(), lazy=False):
+        self.name = name
+        self.init = init            # callable: returns the component's value, raises if it can't start
+        self.needs = tuple(needs)   # names of components that must be ready first
+        self.lazy = lazy            # only started when someone asks for it
+        self.state = PENDING
+        self.launched = False
+        self.value = None
+        self.error = None
+        self.started = None         # perf_counter() when init began
+        self.seconds = None         # how long init took
+        self.done = threading.Event()
+
+
+class Startup:
+    def __init__(self, on_change=None):
+        self.components = {}
+        self.on_change = on_change
+        self.lock = threading.Lock()
+
+    def add(self, name, init, needs=(), lazy=False):
+        self.components[name] = Component(name, init, needs, lazy)
+        return self
+
+    def start(self):
+        """Start every eager component (and whatever it needs) in the background."""
+        for component in list(self.components.values()):
+            if not component.lazy:
+                self._launch(component)
+        return self
+
+    def _launch(self, component):
+        with self.lock:
+            if component.launched:
+                return
+            component.launched = True
+        threading.Thread(target=self._run, args=(component,), name=f"start-{component.name}",
+                         daemon=True).start()
+
+    def _run(self, component):
+        try:
+            for name in component.needs:
+                self.get(name)
+        except StartupError as e:
+            self._finish(component, FAILED, error=f"needs {e}")
+            return
+        component.started = time.perf_counter()
+        self._finish(component, STARTING)
+        try:
+            value = component.init()
+        except Exception as e:
+            logging.error("Startup: %s failed: %s", component.name, e)
+            self._finish(component, FAILED, error=str(e) or type(e).__name__)
+            return
+        self._finish(component, READY, value=value)
+
+    def _finish(self, component, state, value=None, error=None):
+        component.state = state
+        if state in (READY, FAILED):
+            component.value, component.error = value, error
+            if component.started is not None:
+                component.seconds = time.perf_counter() - component.started
+            logging.info("Startup: %s %s%s", component.name, state,
+                         f" in {component.seconds * 1000:.0f} ms" if component.seconds is not None else "")
+            component.done.set()
+        if self.on_change is not None:
+            try:
+                self.on_change(self.states())
+            except Exception as e:
+                logging.error(f"Startup state callback failed: {e}")
+
+    def get(self, name, timeout=None):
+        """The component's value once it is ready; starts a lazy one. Raises StartupError if it failed."""
+        component = self.components[name]
+        self._launch(component)
+        if not component.done.wait(timeout):
+            raise TimeoutError(f"{name} is still starting")
+        if component.state == FAILED:
+            raise StartupError(f"{name}: {component.error}")
+        return component.value
+
+    def ready(self, name):
+        """True if the component is ready, without waiting."""
+        return self.components[name].state == READY
+
+    def wait(self, timeout=None):
+        """Wait for every started component to finish starting; returns True if all of them are ready."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for component in list(self.components.values()):
+            if not component.launched:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not component.done.wait(remaining):
+                return False
+        return all(c.state == READY for c in self.components.values() if c.launched)
+
+    def states(self):
+        """Name -> {"state", "ms" (time to start), "error"} for the dashboard."""
+        return {name: {"state": c.state,
+                       "ms": round(c.seconds * 1000) if c.seconds is not None else None,
+                       "error": c.error}
+                for name, c in self.components.items()}
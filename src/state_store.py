@@ -0,0 +1,86 @@
+"""
+Versioned dashboard state for Jarvis.
+
+All dashboard state (status line, cache statistics, ...) lives in one
+StateStore. update() only counts as a change when a value really differs;
+each change bumps the version. Changes arriving within `coalesce` seconds of
+each other are merged and published once, by a single broadcast, however
+many dashboards are connected.
+
+A client that reconnects sends the last version it saw and gets just what
+changed since then, or a full snapshot if that is too far back.
+"""
+
+import copy
+import threading
+from collections import deque
+
+
+class StateStore:
+    def __init__(self, publish=None, coalesce=0.05, history=256, **initial):
+        self.publish = publish       # publish(message), message as built by since()
+        self.coalesce = coalesce
+        self.state = dict(initial)
+        self.version = 0
+        self.published_version = 0
+        self.changes = deque(maxlen=history)  # (version, key, value)
+        self.lock = threading.Lock()
+        self._timer = None
+
+    def update(self, **values):
+        """Set keys; returns the new version. Unchanged values don't count as a change."""
+        with self.lock:
+            changed = {k: v for k, v in values.items() if k not in self.state or self.state[k] != v}
+            if not changed:
+                return self.version
+            self.version += 1
+            for key, value in changed.items():
+                value = copy.deepcopy(value)
+                self.state[key] = value
+                self.changes.append((self.version, key, value))
+            if self.publish is not None and self._timer is None:
+                self._timer = threading.Timer(self.coalesce, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+            return self.version
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.state.get(key, default)
+
+    def snapshot(self):
+        """(version, copy of the whole state)."""
+        with self.lock:
+            return self.version, copy.deepcopy(self.state)
+
+    def since(self, version):
+        """
+        Message bringing a client from `version` up to date:
+        {"from": version, "version": current, "changes": {...}, "full": bool}.
+        If `version` is 0 or None, or older than the kept history, "changes" is the full state.
+        """
+        with self.lock:
+            return self._since(version)
+
+    def _since(self, version):
+        # Once the history is full, the oldest kept version may be missing some of its keys
+        truncated = len(self.changes) == self.changes.maxlen
+        if not version or version > self.version or (truncated and version < self.changes[0][0]):
+            return {"from": 0, "version": self.version, "changes": copy.deepcopy(self.state), "full": True}
+        changes = {key: value for v, key, value in self.changes if v > version}
+        return {"from": version, "version": self.version, "changes": copy.deepcopy(changes), "full": False}
+
+    def _flush(self):
+        with self.lock:
+            self._timer = None
+            if self.version == self.published_version:
+                return
+            message = self._since(self.published_version)
+            self.published_version = self.version
+        self.publish(message)
+
+    def close(self):
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
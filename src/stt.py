@@ -0,0 +1,154 @@
+"""
+Pluggable speech-to-text backends for Jarvis.
+
+Every transcription goes through an STTBackend selected by the STT_BACKEND
+environment variable:
+
+- "google" (default): speech_recognition's recognize_google, one request per
+  finished utterance.
+- "vosk": fully offline Kaldi recognizer (pip install vosk, and point
+  VOSK_MODEL at an unpacked model directory). Audio is decoded while it is
+  captured and partial hypotheses are reported as the user speaks.
+
+A backend hands out one session per utterance. Capture code feeds the
+session int16 samples as they arrive and calls finish() with the endpointed
+clip; errors are raised as sr.UnknownValueError / sr.RequestError, just like
+the recognizer methods.
+"""
+
+import os
+import json
+import logging
+
+import numpy as np
+import speech_recognition as sr
+
+from wakeword import SAMPLE_RATE
+
+
+class STTSession:
+    """One utterance being transcribed."""
+
+    def __init__(self, on_partial=None):
+        self.on_partial = on_partial
+        self.partial = ""
+
+    def accept(self, samples):
+        """Feed int16 samples as they are captured."""
+
+    def finish(self, audio: sr.AudioData) -> str:
+        """Return the final transcript for the captured clip.
+
+        Streaming sessions have already been fed this clip through accept() and
+        only finish decoding; the others transcribe `audio` itself.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the decoder of an utterance that won't be finished (cancelled, nothing said)."""
+
+    def _report(self, text):
+        if text and text != self.partial:
+            self.partial = text
+            if self.on_partial:
+                self.on_partial(text)
+
+
+class STTBackend:
+    """Base class for speech-to-text engines."""
+
+    name = ""
+    streaming = False  # True if sessions report partial hypotheses
+
+    def session(self, on_partial=None) -> STTSession:
+        raise NotImplementedError
+
+    def transcribe(self, audio: sr.AudioData) -> str:
+        """Transcribe a complete clip (e.g. from sr.AudioFile)."""
+        session = self.session()
+        session.accept(_samples(audio))
+        return session.finish(audio)
+
+
+# ------------- Google Web Speech -----------------
+
+class GoogleSession(STTSession):
+    def __init__(self, recognizer, on_partial=None):
+        super().__init__(on_partial)
+        self.recognizer = recognizer
+
+    def finish(self, audio):
+        return self.recognizer.recognize_google(audio)
+
+
+class GoogleBackend(STTBackend):
+    name = "google"
+
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def session(self, on_partial=None):
+        return GoogleSession(self.recognizer, on_partial)
+
+
+# ------------- Vosk (offline, streaming) -----------------
+
+class VoskSession(STTSession):
+    def __init__(self, model, on_partial=None):
+        super().__init__(on_partial)
+        from vosk import KaldiRecognizer
+        self.decoder = KaldiRecognizer(model, SAMPLE_RATE)
+        self.segments = []
+
+    def accept(self, samples):
+        if self.decoder.AcceptWaveform(samples.tobytes()):
+            text = json.loads(self.decoder.Result()).get("text", "")
+            if text:
+                self.segments.append(text)
+            self._report(" ".join(self.segments))
+        else:
+            partial = json.loads(self.decoder.PartialResult()).get("partial", "")
+            self._report(" ".join(self.segments + [partial]).strip())
+
+    def finish(self, audio):
+        text = json.loads(self.decoder.FinalResult()).get("text", "")
+        text = " ".join(self.segments + [text]).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class VoskBackend(STTBackend):
+    name = "vosk"
+    streaming = True
+
+    def __init__(self, model_path):
+        try:
+            from vosk import Model, SetLogLevel
+        except ImportError as e:
+            raise sr.RequestError("missing vosk module: ensure that vosk is set up correctly.") from e
+        if not os.path.isdir(model_path):
+            raise sr.RequestError(f"Vosk model not found at '{model_path}'.")
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def session(self, on_partial=None):
+        return VoskSession(self.model, on_partial)
+
+
+# ------------- Selection -----------------
+
+def _samples(audio: sr.AudioData):
+    return np.frombuffer(audio.get_raw_data(convert_rate=SAMPLE_RATE, convert_width=2), dtype=np.int16)
+
+def create_backend(name=None, recognizer=None) -> STTBackend:
+    """Build the backend named by STT_BACKEND, falling back to Google if it can't load."""
+    name = (name or os.getenv("STT_BACKEND", "google")).lower()
+    if name == "vosk":
+        try:
+            return VoskBackend(os.getenv("VOSK_MODEL", "model"))
+        except sr.RequestError as e:
+            logging.error(f"Offline speech recognition unavailable, using Google: {e}")
+    elif name != "google":
+        logging.warning(f"Unknown STT_BACKEND '{name}', using Google.")
+    return GoogleBackend(recognizer)
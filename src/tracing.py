@@ -0,0 +1,174 @@
+"""
+Per-interaction latency tracing for Jarvis.
+
+Each interaction (wake word, button press or dashboard command) gets a
+Trace, and every stage it goes through is timed as a span: wake detection,
+capture, speech-to-text, routing, the lookup handler, the LLM and the time
+until the answer starts being spoken. Spans can be added after the
+interaction has ended (speech starts later, on the TTS thread).
+
+Span durations are aggregated per stage into HDR-style histograms:
+log-linear buckets with a fixed relative error (under 1%), so recording is
+O(1), memory is bounded and p50/p95/p99 are accurate from microseconds to
+minutes. Tracer.prometheus() renders them in the Prometheus text format.
+"""
+
+import time
+import logging
+import threading
+import contextlib
+from collections import deque
+
+
+class Histogram:
+    """Log-linear histogram of durations in microseconds, `2 ** sub_bits` buckets per power of two."""
+
+    def __init__(self, sub_bits=7):
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.counts = [0] * (self.sub_count * 2)   # grows when longer durations arrive
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def _index(self, us):
+        if us < self.sub_count:
+            return us  # exact below 2 ** sub_bits microseconds
+        shift = us.bit_length() - self.sub_bits
+        half = self.sub_count >> 1
+        return self.sub_count + (shift - 1) * half + ((us >> shift) - half)
+
+    def _value(self, index):
+        """Midpoint of a bucket, in microseconds."""
+        if index < self.sub_count:
+            return index
+        half = self.sub_count >> 1
+        shift, mantissa = divmod(index - self.sub_count, half)
+        shift += 1
+        low = (mantissa + half) << shift
+        return low + ((1 << shift) - 1) / 2
+
+    def record(self, seconds):
+        us = max(0, int(seconds * 1e6))
+        index = self._index(us)
+        with self.lock:
+            if index >= len(self.counts):
+                self.counts.extend([0] * (index + 1 - len(self.counts)))
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """Value (seconds) below which `p` percent of the recorded durations fall."""
+        with self.lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, round(p / 100 * self.count))
+            seen = 0
+            for index, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank:
+                    return min(self._value(index) / 1e6, self.max)
+        return self.max
+
+
+class Trace:
+    """The spans of one interaction."""
+
+    def __init__(self, tracer, kind, started=None):
+        self.tracer = tracer
+        self.kind = kind
+        self.started = time.perf_counter() if started is None else started
+        self.ended = None
+        self.spans = {}  # name -> seconds (added up if a stage runs more than once)
+
+    def record(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+        self.tracer.histogram(name).record(seconds)
+
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def as_dict(self):
+        total = (self.ended or time.perf_counter()) - self.started
+        return {"kind": self.kind, "total_ms": round(total * 1000),
+                "spans": {name: round(seconds * 1000, 1) for name, seconds in self.spans.items()}}
+
+
+def span(trace, name):
+    """trace.span(name), or nothing when there is no trace."""
+    return trace.span(name) if trace is not None else contextlib.nullcontext()
+
+
+class Tracer:
+    def __init__(self, keep=50):
+        self.histograms = {}            # span name -> Histogram
+        self.interactions = {}          # kind -> count
+        self.recent = deque(maxlen=keep)
+        self.lock = threading.Lock()
+
+    def histogram(self, name):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            return histogram
+
+    def begin(self, kind, started=None):
+        """Start tracing an interaction; `started` is when it really began (time.perf_counter())."""
+        trace = Trace(self, kind, started)
+        with self.lock:
+            self.interactions[kind] = self.interactions.get(kind, 0) + 1
+            self.recent.append(trace)
+        return trace
+
+    def end(self, trace):
+        trace.ended = time.perf_counter()
+        self.histogram("interaction").record(trace.ended - trace.started)
+        breakdown = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in trace.spans.items())
+        logging.info("Interaction (%s) took %.0f ms: %s", trace.kind, (trace.ended - trace.started) * 1000, breakdown,
+                     extra={"fields": {"trace": trace.as_dict()}})
+
+    def last(self):
+        """The most recent interaction as a dict, or None."""
+        with self.lock:
+            trace = self.recent[-1] if self.recent else None
+        return trace.as_dict() if trace is not None else None
+
+    def summary(self):
+        """Span name -> count and p50/p95/p99/max in milliseconds."""
+        with self.lock:
+            histograms = dict(self.histograms)
+        return {name: {"count": h.count,
+                       "p50_ms": round(h.percentile(50) * 1000, 1),
+                       "p95_ms": round(h.percentile(95) * 1000, 1),
+                       "p99_ms": round(h.percentile(99) * 1000, 1),
+                       "max_ms": round(h.max * 1000, 1)}
+                for name, h in sorted(histograms.items())}
+
+    def prometheus(self, prefix="jarvis"):
+        """All histograms and interaction counts in the Prometheus text exposition format."""
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            interactions = sorted(self.interactions.items())
+        lines = [f"# HELP {prefix}_span_seconds Time spent in each stage of an interaction.",
+                 f"# TYPE {prefix}_span_seconds summary"]
+        for name, h in histograms:
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'{prefix}_span_seconds{{span="{name}",quantile="{q}"}} {h.percentile(q * 100):.6f}')
+            lines.append(f'{prefix}_span_seconds_sum{{span="{name}"}} {h.total:.6f}')
+            lines.append(f'{prefix}_span_seconds_count{{span="{name}"}} {h.count}')
+        lines += [f"# HELP {prefix}_span_max_seconds Longest time seen in each stage.",
+                  f"# TYPE {prefix}_span_max_seconds gauge"]
+        lines += [f'{prefix}_span_max_seconds{{span="{name}"}} {h.max:.6f}' for name, h in histograms]
+        lines += [f"# HELP {prefix}_interactions_total Interactions by what started them.",
+                  f"# TYPE {prefix}_interactions_total counter"]
+        lines += [f'{prefix}_interactions_total{{kind="{kind}"}} {n}' for kind, n in interactions]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,193 @@
+"""
+Custom phrases taught with "train: phrase => response".
+
+Phrases are kept in an append-only JSON-lines file (the last line for a
+phrase wins), read the first time they are needed, so nothing taught is
+lost on restart and startup does not wait for a large file.
+
+Speech recognition rarely reproduces a trained phrase word for word, so
+get_response() also accepts the closest trained phrase when it is similar
+enough. Similarity is the Dice coefficient over character trigrams, found
+through an inverted index: one numpy bincount over the posting lists of the
+query's trigrams scores every phrase at once. Trigrams barely notice "on"
+becoming "off" or "seven" becoming "eleven", so a fuzzy match also needs the
+same numbers and the same on/off, negation and direction words as the
+trained phrase; otherwise the next closest phrase is tried.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+
+import numpy as np
+
+from semantic_cache import normalize_prompt
+
+
+NUMBER_WORDS = {w: str(i) for i, w in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+    "sixteen seventeen eighteen nineteen twenty".split())}
+NUMBER_WORDS.update({w: str(10 * i) for i, w in enumerate("thirty forty fifty sixty seventy eighty ninety".split(), 3)})
+NUMBER_WORDS.update(hundred="100", thousand="1000")
+# Words that flip what a command does while hardly changing its trigrams
+KEY_WORDS = {"on", "off", "not", "no", "dont", "cant", "never", "up", "down", "open", "close", "start", "stop",
+             "more", "less", "higher", "lower", "louder", "quieter", "next", "previous", "first", "last",
+             "am", "pm", "yes", "before", "after"}
+
+
+def key_words(text):
+    """Numbers (as digits) and meaning-flipping words in a normalized phrase; fuzzy matches must agree on them."""
+    words = set()
+    for word in text.split():
+        if word in NUMBER_WORDS:
+            words.add(NUMBER_WORDS[word])
+        elif word in KEY_WORDS or word.isdigit():
+            words.add(word)
+        elif re.fullmatch(r"\d+(st|nd|rd|th)", word):
+            words.add(word[:-2])
+    return words
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PhraseIndex:
+    """Trigram inverted index with best-match lookup by Dice similarity."""
+
+    def __init__(self):
+        self.phrases = []            # id -> normalized phrase
+        self.ids = {}                # normalized phrase -> id
+        self.postings = {}           # trigram -> list of ids
+        self._arrays = {}            # trigram -> np.array of its posting list, rebuilt on change
+        self.sizes = np.zeros(0, dtype=np.int32)  # trigram count per phrase
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def add(self, phrase):
+        """Index a normalized phrase; returns its id."""
+        if phrase in self.ids:
+            return self.ids[phrase]
+        pid = len(self.phrases)
+        self.phrases.append(phrase)
+        self.ids[phrase] = pid
+        grams = trigrams(phrase)
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(pid)
+            self._arrays.pop(gram, None)
+        if pid >= len(self.sizes):
+            self.sizes = np.resize(self.sizes, max(16, 2 * len(self.sizes)))
+        self.sizes[pid] = len(grams)
+        return pid
+
+    def _posting(self, gram):
+        array = self._arrays.get(gram)
+        if array is None:
+            array = self._arrays[gram] = np.asarray(self.postings[gram], dtype=np.int32)
+        return array
+
+    def _scores(self, phrase):
+        grams = trigrams(phrase)
+        lists = [self._posting(g) for g in grams if g in self.postings]
+        if not lists:
+            return None
+        shared = np.bincount(np.concatenate(lists), minlength=len(self.phrases))
+        return 2.0 * shared / (len(grams) + self.sizes[:len(self.phrases)])
+
+    def best(self, phrase):
+        """(id, similarity) of the closest indexed phrase, or (None, 0.0)."""
+        if phrase in self.ids:
+            return self.ids[phrase], 1.0
+        scores = self._scores(phrase)
+        if scores is None:
+            return None, 0.0
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def candidates(self, phrase, threshold):
+        """[(id, similarity)] of the indexed phrases at least `threshold` similar, closest first."""
+        if phrase in self.ids:
+            return [(self.ids[phrase], 1.0)]
+        scores = self._scores(phrase)
+        if scores is None:
+            return []
+        ids = np.flatnonzero(scores >= threshold)
+        return [(int(i), float(scores[i])) for i in ids[np.argsort(-scores[ids], kind="stable")]]
+
+
+class Trainer:
+    def __init__(self, path="trained_phrases.jsonl", threshold=0.85):
+        self.path = path
+        self.threshold = threshold  # minimum similarity for a fuzzy match
+        self.index = PhraseIndex()
+        self.responses = []  # phrase id -> response
+        self.originals = {}  # phrase id -> phrase as it was taught
+        self.lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        """Read the log on first use; compact it if most lines are overwritten."""
+        with self.lock:
+            if self._loaded:
+                return
+            lines = 0
+            if os.path.exists(self.path):
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            logging.warning(f"Skipping damaged line in {self.path}")
+                            continue
+                        self._remember(entry["phrase"], entry["response"])
+                        lines += 1
+            if lines > 2 * len(self.responses) + 100:
+                self._compact()
+            self._loaded = True
+
+    def _remember(self, phrase, response):
+        pid = self.index.add(normalize_prompt(phrase))
+        if pid == len(self.responses):
+            self.responses.append(response)
+        else:
+            self.responses[pid] = response
+        self.originals[pid] = phrase
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for pid, response in enumerate(self.responses):
+                f.write(json.dumps({"phrase": self.originals[pid], "response": response}) + "\n")
+        os.replace(tmp, self.path)
+
+    @property
+    def custom_phrases(self):
+        """Trained phrase -> response."""
+        self._load()
+        return {self.originals[pid]: response for pid, response in enumerate(self.responses)}
+
+    def train(self, phrase, response):
+        self._load()
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"phrase": phrase, "response": response}) + "\n")
+            self._remember(phrase, response)
+        return "Training saved."
+
+    def match(self, phrase):
+        """(response, similarity, trained phrase) for the closest phrase, or (None, similarity, None)."""
+        self._load()
+        normalized = normalize_prompt(phrase)
+        with self.lock:
+            keys = key_words(normalized)
+            for pid, similarity in self.index.candidates(normalized, self.threshold):
+                if similarity == 1.0 or key_words(self.index.phrases[pid]) == keys:
+                    return self.responses[pid], similarity, self.originals[pid]
+            return None, self.index.best(normalized)[1], None
+
+    def get_response(self, phrase):
+        return self.match(phrase)[0]
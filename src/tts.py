@@ -0,0 +1,255 @@
+"""
+Non-blocking text-to-speech for Jarvis.
+
+A dedicated worker thread owns the pyttsx3 engine (engines must be used from
+the thread that created them) and speaks utterances from a priority queue.
+speak_async() returns a SpeechHandle straight away, so the main loop keeps
+listening for the wake word, the button and dashboard commands while a long
+answer is being read out. interrupt() stops the current sentence immediately
+and drops everything queued (barge-in). If the engine cannot be started (no
+audio device) or the worker has been shut down, queued and new utterances
+finish straight away without being spoken, so nobody waits for them forever.
+
+With a SpeechCache attached, utterances marked cache=True (fixed prompts,
+trained responses) are rendered to WAV once and afterwards played directly
+through PyAudio, which starts in milliseconds.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import wave
+
+import pyttsx3
+
+# Lower numbers are spoken first
+URGENT = 0   # prompts and errors
+NORMAL = 1   # answers
+LOW = 2      # background announcements
+RENDER = 3   # filling the speech cache when nothing else is queued
+
+
+class SpeechHandle:
+    """A queued utterance that can be waited on, awaited or cancelled."""
+
+    def __init__(self, text, priority=NORMAL, worker=None, cache=False, render_only=False, on_start=None):
+        self.text = text
+        self.priority = priority
+        self.cache = cache              # play from / add to the speech cache
+        self.render_only = render_only  # just fill the cache, don't speak
+        self.completed = False  # True if it was spoken to the end
+        self.queued_at = time.perf_counter()
+        self.started_at = None  # time.perf_counter() when playback began
+        self.on_start = on_start  # on_start(handle), called on the TTS thread as playback begins
+        self.cancelled = False
+        self._worker = worker
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None) -> bool:
+        """Block until spoken or cancelled. Returns True if it finished in time."""
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        """Drop the utterance, stopping playback if it is being spoken right now."""
+        self.cancelled = True
+        if self._worker is not None and self._worker.current is self:
+            self._worker.stop_current()
+
+    def __await__(self):
+        return asyncio.get_running_loop().run_in_executor(None, self.wait).__await__()
+
+    def _finish(self, completed):
+        self.completed = completed
+        self._done.set()
+
+
+class TTSWorker(threading.Thread):
+    """Thread that owns the pyttsx3 engine and speaks queued utterances."""
+
+    def __init__(self, rate=150, voice_hint="english", cache=None, engine_factory=None, renderer=None):
+        super().__init__(name="tts", daemon=True)
+        self.engine_factory = engine_factory or pyttsx3.init  # a stand-in engine for headless runs
+        self.renderer = renderer  # renderer(text, path): render in another process instead of on this engine
+        self.rate = rate
+        self.voice_hint = voice_hint
+        self.voice = None
+        self.cache = cache
+        self.queue = queue.PriorityQueue()
+        self.current = None
+        self.engine = None
+        self.ready = threading.Event()
+        self.error = None  # why nothing can be spoken any more (engine failed to start, shut down)
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._audio = None
+        self._outputs = {}  # (rate, channels, width) -> open PyAudio output stream
+
+    def _init_engine(self):
+        engine = self.engine_factory()
+        engine.setProperty('rate', self.rate)  # Voice speed
+        # Pick an English voice
+        for v in engine.getProperty('voices'):
+            if self.voice_hint in v.name.lower():
+                engine.setProperty('voice', v.id)
+                self.voice = v.id
+                break
+        return engine
+
+    def run(self):
+        try:
+            self.engine = self._init_engine()
+        except Exception as e:
+            logging.error(f"Speech engine could not be started: {e}")
+            self._close(e)
+            return
+        self.ready.set()
+        while True:
+            _, _, handle = self.queue.get()
+            if handle is None:
+                self._close(RuntimeError("the speech worker was shut down"))
+                break
+            if handle.cancelled:
+                handle._finish(False)
+                continue
+            if handle.render_only:
+                self._render(handle.text)
+                handle._finish(True)
+                continue
+            self.current = handle
+            handle.started_at = time.perf_counter()
+            if handle.on_start is not None:
+                try:
+                    handle.on_start(handle)
+                except Exception as e:
+                    logging.error(f"Speech start callback failed: {e}")
+            try:
+                path = self.cache.get(handle.text, self.voice, self.rate) if handle.cache and self.cache else None
+                if path:
+                    self._play(path, handle)
+                else:
+                    self.engine.say(handle.text)
+                    self.engine.runAndWait()
+                    if handle.cache and self.cache:
+                        self.prerender(handle.text)
+            except Exception as e:
+                logging.error(f"Text-to-speech error: {e}")
+            finally:
+                self.current = None
+                handle._finish(not handle.cancelled)
+
+    def speak_async(self, text: str, priority=NORMAL, cache=False, on_start=None) -> SpeechHandle:
+        """Queue text and return immediately with a handle to it."""
+        return self._put(SpeechHandle(text, priority, self, cache=cache, on_start=on_start))
+
+    def prerender(self, text: str):
+        """Render text into the speech cache once nothing else is waiting to be said."""
+        if self.cache is not None:
+            self.render(text, RENDER)
+
+    def render(self, text: str, priority=NORMAL) -> SpeechHandle:
+        """Render text into the speech cache without speaking it (speech for a satellite)."""
+        return self._put(SpeechHandle(text, priority, self, render_only=True))
+
+    def _put(self, handle):
+        with self._lock:
+            if self.error is None:
+                self.queue.put((handle.priority, next(self._seq), handle))
+                return handle
+        handle._finish(False)  # nothing will ever say it
+        return handle
+
+    def _close(self, error):
+        """Refuse new utterances and finish the queued ones unspoken."""
+        with self._lock:
+            self.error = error
+        while True:
+            try:
+                handle = self.queue.get_nowait()[2]
+            except queue.Empty:
+                break
+            if handle is not None:
+                handle._finish(False)
+
+    def _render(self, text):
+        if self.cache is None or self.cache.contains(text, self.voice, self.rate):
+            return
+        tmp = self.cache.temp_path(text, self.voice, self.rate)
+        try:
+            if self.renderer is not None:
+                self.renderer(text, tmp)
+            else:
+                self.engine.save_to_file(text, tmp)
+                self.engine.runAndWait()
+            with wave.open(tmp, 'rb') as wf:
+                if not wf.getnframes():
+                    raise wave.Error("empty rendering")
+            self.cache.put(text, self.voice, self.rate, tmp)
+        except (OSError, EOFError, RuntimeError, wave.Error) as e:
+            logging.warning(f"Could not cache speech for '{text}': {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _output(self, wf):
+        """Output stream matching the WAV format, opened once and reused."""
+        import pyaudio
+        if self._audio is None:
+            self._audio = pyaudio.PyAudio()
+        fmt = (wf.getframerate(), wf.getnchannels(), wf.getsampwidth())
+        if fmt not in self._outputs:
+            self._outputs[fmt] = self._audio.open(format=self._audio.get_format_from_width(fmt[2]),
+                                                  channels=fmt[1], rate=fmt[0], output=True)
+        return self._outputs[fmt]
+
+    def _play(self, path, handle):
+        """Play a cached rendering, checking for barge-in between chunks."""
+        with wave.open(path, 'rb') as wf:
+            stream = self._output(wf)
+            while not handle.cancelled:
+                data = wf.readframes(1024)
+                if not data:
+                    break
+                stream.write(data)
+
+    def stop_current(self):
+        """Stop the utterance being spoken; the engine ends its run loop early."""
+        if self.engine is not None:
+            self.engine.stop()
+
+    def interrupt(self):
+        """Barge-in: cancel everything queued and cut off the current sentence."""
+        renders = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            handle = item[2]
+            if handle is None:  # keep a pending shutdown request
+                self.queue.put((float('inf'), next(self._seq), None))
+                break
+            if handle.render_only:  # nothing is being said; other rooms may be waiting for it
+                renders.append(item)
+                continue
+            handle.cancelled = True
+            handle._finish(False)
+        for item in renders:
+            self.queue.put(item)
+        current = self.current
+        if current is not None:
+            current.cancel()
+
+    @property
+    def speaking(self):
+        return self.current is not None or not self.queue.empty()
+
+    def shutdown(self):
+        self.interrupt()
+        self.queue.put((float('inf'), next(self._seq), None))
@@ -0,0 +1,105 @@
+"""
+On-disk cache of pre-rendered speech for Jarvis.
+
+Fixed prompts ("Yes, I'm listening.") and trained responses are rendered to
+WAV once and played straight through PyAudio afterwards, instead of being
+re-synthesized by pyttsx3 every time. Files are content-addressed by
+(text, voice, rate), and the least recently played ones are evicted when the
+directory grows past its size budget.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+
+class SpeechCache:
+    """Content-addressed WAV cache with LRU eviction under a byte budget."""
+
+    def __init__(self, directory="tts_cache", max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key(text, voice, rate):
+        return hashlib.sha256(f"{voice}\0{rate}\0{text}".encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".wav")
+
+    def _load(self):
+        """Rebuild the index from disk, oldest modification time first."""
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".wav"):
+                full = os.path.join(self.directory, name)
+                stat = os.stat(full)
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+            elif name.endswith(".tmp"):
+                os.remove(os.path.join(self.directory, name))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    def get(self, text, voice, rate):
+        """Path of the rendered WAV, or None on a miss."""
+        key = self.key(text, voice, rate)
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+        path = self.path(key)
+        try:
+            os.utime(path)  # keeps LRU order across restarts
+        except OSError:
+            with self.lock:
+                self.total_bytes -= self.entries.pop(key, 0)
+            return None
+        return path
+
+    def contains(self, text, voice, rate):
+        return self.key(text, voice, rate) in self.entries
+
+    def temp_path(self, text, voice, rate):
+        """Where a renderer should write before calling put()."""
+        return self.path(self.key(text, voice, rate))[:-4] + ".tmp"
+
+    def put(self, text, voice, rate, rendered_path):
+        """Move a freshly rendered file into the cache and evict to stay under budget."""
+        key = self.key(text, voice, rate)
+        final = self.path(key)
+        os.replace(rendered_path, final)
+        size = os.path.getsize(final)
+        with self.lock:
+            self.total_bytes += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old, old_size = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                try:
+                    os.remove(self.path(old))
+                except OSError as e:
+                    logging.warning(f"Could not evict cached speech {old}: {e}")
+        return final
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+            }
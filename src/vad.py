@@ -0,0 +1,151 @@
+"""
+Voice activity detection endpointer for Jarvis.
+
+Commands end when the user stops talking instead of after a fixed
+phrase_time_limit. Frames are classified in batches with numpy: a short
+run of loud frames confirms the start of speech, quiet gaps shorter than the
+hangover are bridged, and the utterance ends once the trailing silence after
+the hangover has elapsed (about 300 ms with the defaults). Capture times out
+if no speech starts within `timeout`; speech that starts just before it is
+kept however the audio is chunked.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from wakeword import SAMPLE_RATE, FRAME_SAMPLES
+
+
+def frame_energies(samples, frame_samples=FRAME_SAMPLES):
+    """RMS energy of every whole frame in samples, as one vector."""
+    n = len(samples) // frame_samples
+    frames = samples[:n * frame_samples].reshape(n, frame_samples).astype(np.float64)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+@dataclass
+class UtteranceStats:
+    speech_ms: float = 0.0            # frames labelled speech (after hangover smoothing)
+    trailing_silence_ms: float = 0.0  # from the last loud frame to the endpoint
+    leading_ms: float = 0.0           # from the start of capture to the start of speech
+    total_ms: float = 0.0
+    ended_by: str = ""                # "silence", "limit" or "timeout"
+
+
+class Endpointer:
+    """
+    Incremental, vectorized speech endpointer.
+
+    feed() accepts any number of samples (a single frame or several seconds
+    of buffered audio) and returns True once the utterance has ended.
+    Positions are counted in frames from the first sample fed.
+    """
+
+    def __init__(self, threshold, trailing_silence=0.2, hangover=0.1, onset=0.064,
+                 max_speech=15.0, timeout=5.0, frame_samples=FRAME_SAMPLES):
+        self.threshold = threshold  # number, or callable returning the current threshold
+        self.frame_samples = frame_samples
+        frame_seconds = frame_samples / SAMPLE_RATE
+        self.frame_seconds = frame_seconds
+        self.hangover_frames = int(round(hangover / frame_seconds))
+        self.end_frames = self.hangover_frames + max(1, int(round(trailing_silence / frame_seconds)))
+        self.onset_frames = max(1, int(round(onset / frame_seconds)))
+        self.max_frames = int(max_speech / frame_seconds) if max_speech else None
+        self.timeout_frames = int(timeout / frame_seconds) if timeout else None
+        self.reset()
+
+    def reset(self):
+        self.frames = 0          # frames consumed so far
+        self.speech_start = None  # frame index where speech started
+        self.speech_end = None    # frame index one past the endpoint
+        self.last_loud = None     # frame index of the most recent loud frame
+        self.speech_frames = 0
+        self.ended_by = ""
+        self._loud_run = 0        # loud frames at the end of the previous chunk
+        self._pending = np.zeros(0, dtype=np.int16)
+
+    @property
+    def done(self):
+        return bool(self.ended_by)
+
+    def feed(self, samples) -> bool:
+        """Consume samples and return True once the utterance has ended."""
+        if self.done:
+            return True
+        if len(self._pending):
+            samples = np.concatenate((self._pending, samples))
+        n = len(samples) // self.frame_samples
+        self._pending = samples[n * self.frame_samples:].copy()
+        if n:
+            threshold = self.threshold() if callable(self.threshold) else self.threshold
+            self._process(frame_energies(samples[:n * self.frame_samples], self.frame_samples) > threshold)
+        return self.done
+
+    def _process(self, loud):
+        n = len(loud)
+        base = self.frames
+        idx = np.arange(n)
+        start = 0
+
+        if self.speech_start is None:
+            # Length of the loud run ending at each frame, carried across chunks
+            last_quiet = np.maximum.accumulate(np.where(~loud, idx, -1 - self._loud_run))
+            run = idx - last_quiet
+            confirmed = np.flatnonzero(run >= self.onset_frames)
+            if not len(confirmed):
+                self._loud_run = int(run[-1])
+                self.frames += n
+                # A loud run that began before the deadline may still be confirmed by the next chunk
+                if self.timeout_frames is not None and self.frames - self._loud_run >= self.timeout_frames:
+                    self._finish(self.timeout_frames, "timeout")
+                return
+            start = int(confirmed[0])
+            speech_start = base + start - int(run[start]) + 1
+            if self.timeout_frames is not None and speech_start >= self.timeout_frames:
+                self._finish(self.timeout_frames, "timeout")
+                return
+            self.speech_start = speech_start
+            self.last_loud = base + start
+
+        # Frames since the last loud frame decide both smoothing and the endpoint
+        seg = loud[start:]
+        seg_idx = idx[start:]
+        last = np.maximum.accumulate(np.where(seg, seg_idx, self.last_loud - base))
+        gap = seg_idx - last
+        ended = np.flatnonzero(gap >= self.end_frames)
+        stop = int(ended[0]) + 1 if len(ended) else len(seg)
+
+        if self.max_frames is not None:
+            limit = self.speech_start + self.max_frames - (base + start)
+            if limit < stop:
+                stop = max(limit, 0)
+                self.speech_frames += int(np.count_nonzero(gap[:stop] <= self.hangover_frames))
+                self.last_loud = base + int(last[stop - 1]) if stop else self.last_loud
+                self._finish(base + start + stop, "limit")
+                return
+
+        self.speech_frames += int(np.count_nonzero(gap[:stop] <= self.hangover_frames))
+        self.last_loud = base + int(last[stop - 1])
+        if len(ended):
+            self._finish(base + start + stop, "silence")
+        else:
+            self.frames += n
+
+    def _finish(self, end_frame, reason):
+        self.frames = end_frame
+        self.speech_end = end_frame
+        self.ended_by = reason
+
+    def stats(self) -> UtteranceStats:
+        ms = self.frame_seconds * 1000
+        if self.speech_start is None:
+            return UtteranceStats(total_ms=self.frames * ms, leading_ms=self.frames * ms, ended_by=self.ended_by)
+        trailing = (self.frames - self.last_loud - 1) if self.last_loud is not None else 0
+        return UtteranceStats(
+            speech_ms=self.speech_frames * ms,
+            trailing_silence_ms=max(trailing, 0) * ms,
+            leading_ms=self.speech_start * ms,
+            total_ms=self.frames * ms,
+            ended_by=self.ended_by,
+        )
@@ -0,0 +1,249 @@
+"""
+Offline, frame-based wake word detection for Jarvis.
+
+Audio is consumed as 16 kHz mono int16 PCM in small frames straight from the
+microphone stream. Each frame is turned into a normalized log-mel vector and
+scored incrementally against a few enrolled recordings of the wake phrase
+using subsequence DTW, so the detector fires on the frame where the phrase
+ends instead of waiting for a full clip to be transcribed in the cloud.
+
+Enroll the wake word by recording a handful of short WAV files of yourself
+saying "Hey Jarvis" (tests/record_test.py works) into the templates directory.
+"""
+
+import os
+import glob
+import wave
+import logging
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 512  # 32 ms per frame at 16 kHz
+MEL_BANDS = 20
+SILENCE_RMS = 0.003  # frames quieter than this never match the wake phrase
+
+
+# ------------- Audio Helpers -----------------
+
+def pcm_to_array(pcm):
+    """Return int16 samples for raw PCM bytes or an existing array."""
+    if isinstance(pcm, np.ndarray):
+        return pcm.astype(np.int16, copy=False)
+    return np.frombuffer(pcm, dtype=np.int16)
+
+def load_wav(path: str):
+    """Load a WAV file as 16 kHz mono int16 samples."""
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(samples):
+        duration = len(samples) / rate
+        target = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+        samples = np.interp(target, np.arange(len(samples)) / rate, samples)
+    return samples.astype(np.int16)
+
+def mel_filterbank(n_filters=MEL_BANDS, n_fft=FRAME_SAMPLES, sample_rate=SAMPLE_RATE):
+    """Triangular mel filterbank of shape (n_filters, n_fft // 2 + 1)."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mels = np.linspace(hz_to_mel(60.0), hz_to_mel(sample_rate / 2), n_filters + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mels) / sample_rate).astype(int)
+    bank = np.zeros((n_filters, n_fft // 2 + 1))
+    for i in range(1, n_filters + 1):
+        left, center, right = bins[i - 1], bins[i], bins[i + 1]
+        if center > left:
+            bank[i - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            bank[i - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+        if center == left == right or not bank[i - 1].any():
+            bank[i - 1, min(center, n_fft // 2)] = 1.0
+    return bank
+
+
+class FeatureExtractor:
+    """Turn one PCM frame into a unit-length, mean-removed log-mel vector."""
+
+    def __init__(self, frame_samples=FRAME_SAMPLES, silence_rms=SILENCE_RMS):
+        self.frame_samples = frame_samples
+        self.silence_rms = silence_rms
+        self.window = np.hanning(frame_samples)
+        self.filterbank = mel_filterbank(n_fft=frame_samples)
+
+    def __call__(self, frame):
+        """Return the feature vector, or None for a silent frame."""
+        x = frame.astype(np.float64) / 32768.0
+        if np.sqrt(np.mean(x * x)) < self.silence_rms:
+            return None
+        power = np.abs(np.fft.rfft(x * self.window)) ** 2
+        logmel = np.log(self.filterbank @ power + 1e-10)
+        logmel -= logmel.mean()
+        norm = np.linalg.norm(logmel)
+        return logmel / norm if norm else None
+
+    def clip(self, samples):
+        """Features for a whole clip with leading/trailing silence trimmed."""
+        n = len(samples) // self.frame_samples
+        frames = samples[:n * self.frame_samples].reshape(n, self.frame_samples)
+        feats = [self(f) for f in frames]
+        voiced = [i for i, f in enumerate(feats) if f is not None]
+        if not voiced:
+            return np.zeros((0, len(self.filterbank)))
+        feats = feats[voiced[0]:voiced[-1] + 1]
+        zero = np.zeros(len(self.filterbank))
+        return np.array([zero if f is None else f for f in feats])
+
+
+# ------------- Detectors -----------------
+
+class WakeWordDetector:
+    """
+    Base class for pluggable wake word detectors.
+
+    Subclasses implement score_frame(); process() takes PCM chunks of any
+    size, splits them into frames and reports whether the wake word fired.
+    """
+
+    frame_samples = FRAME_SAMPLES
+
+    def __init__(self, threshold=0.75):
+        self.threshold = threshold  # lower values make the detector more sensitive
+        self.last_score = 0.0
+        self.samples_seen = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+
+    def score_frame(self, frame) -> float:
+        raise NotImplementedError
+
+    def rearm(self):
+        """Forget any partially matched phrase (called after every detection)."""
+
+    def reset(self):
+        """Start over as if no audio had been seen."""
+        self.samples_seen = 0
+        self._pending = np.zeros(0, dtype=np.int16)
+        self.rearm()
+
+    def process(self, pcm) -> bool:
+        """Feed PCM (bytes or int16 array) and return True if the wake word fired."""
+        samples = pcm_to_array(pcm)
+        if len(self._pending):
+            samples = np.concatenate((self._pending, samples))
+        n = len(samples) // self.frame_samples
+        for i in range(n):
+            frame = samples[i * self.frame_samples:(i + 1) * self.frame_samples]
+            self.samples_seen += self.frame_samples
+            self.last_score = self.score_frame(frame)
+            if self.last_score >= self.threshold:
+                self._pending = samples[(i + 1) * self.frame_samples:].copy()
+                self.rearm()
+                return True
+        self._pending = samples[n * self.frame_samples:].copy()
+        return False
+
+
+class TemplateWakeWordDetector(WakeWordDetector):
+    """
+    Match the live stream against enrolled recordings of the wake phrase.
+
+    Each template keeps one column of an open-begin DTW cost matrix. Every
+    new frame updates all columns with a single vectorized step (diagonal,
+    stretch or skip-one moves), and the score is one minus the mean cosine
+    distance of the best path ending on the last template frame.
+    """
+
+    def __init__(self, templates, threshold=0.75, extractor=None):
+        super().__init__(threshold)
+        self.extractor = extractor or FeatureExtractor(self.frame_samples)
+        self.templates = [np.asarray(t) for t in templates if len(t)]
+        if not self.templates:
+            raise ValueError("At least one non-silent wake word template is required.")
+        self.rearm()
+
+    @classmethod
+    def from_directory(cls, path: str, threshold=0.75):
+        """Enroll every WAV file in a directory as a template."""
+        extractor = FeatureExtractor()
+        templates = [extractor.clip(load_wav(p)) for p in sorted(glob.glob(os.path.join(path, '*.wav')))]
+        return cls(templates, threshold=threshold, extractor=extractor)
+
+    def rearm(self):
+        self._cost = [np.full(len(t), np.inf) for t in self.templates]
+        self._length = [np.zeros(len(t)) for t in self.templates]
+
+    def score_frame(self, frame) -> float:
+        feature = self.extractor(frame)
+        best = 0.0
+        for i, template in enumerate(self.templates):
+            if feature is None:
+                dist = np.ones(len(template))
+            else:
+                dist = 1.0 - template @ feature
+            cost, length = self._step(self._cost[i], self._length[i])
+            cost += dist
+            length += 1
+            self._cost[i], self._length[i] = cost, length
+            best = max(best, 1.0 - cost[-1] / length[-1])
+        return best
+
+    @staticmethod
+    def _step(cost, length):
+        """Pick the cheapest predecessor (by mean cost) for every template frame."""
+        m = len(cost)
+        cand_cost = np.full((3, m), np.inf)
+        cand_len = np.zeros((3, m))
+        cand_cost[0], cand_len[0] = cost, length                   # stretch
+        cand_cost[1, 1:], cand_len[1, 1:] = cost[:-1], length[:-1]  # diagonal
+        cand_cost[2, 2:], cand_len[2, 2:] = cost[:-2], length[:-2]  # skip one
+        cand_cost[1, 0], cand_len[1, 0] = 0.0, 0.0                 # open begin
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(cand_len > 0, cand_cost / cand_len, cand_cost)
+        choice = np.argmin(mean, axis=0)[None, :]
+        return (np.take_along_axis(cand_cost, choice, 0)[0],
+                np.take_along_axis(cand_len, choice, 0)[0])
+
+
+def load_wake_word_detector(path: str, threshold=0.75):
+    """Build the template detector, or return None if nothing is enrolled."""
+    if not glob.glob(os.path.join(path, '*.wav')):
+        logging.warning(f"No wake word templates found in '{path}'.")
+        return None
+    try:
+        return TemplateWakeWordDetector.from_directory(path, threshold=threshold)
+    except (ValueError, wave.Error) as e:
+        logging.error(f"Could not load wake word templates: {e}")
+        return None
+
+
+# ------------- Offline Replay -----------------
+
+def replay_wav(detector: WakeWordDetector, path: str, chunk=FRAME_SAMPLES):
+    """Run a WAV file through the detector and return detection times in seconds."""
+    samples = load_wav(path)
+    detector.reset()
+    detections = []
+    for start in range(0, len(samples), chunk):
+        fired = detector.process(samples[start:start + chunk])
+        while fired:
+            detections.append(detector.samples_seen / SAMPLE_RATE)
+            fired = detector.process(b'')
+    return detections
+
+def speech_end(samples, extractor=None):
+    """Time in seconds at which the last voiced frame of a clip ends."""
+    extractor = extractor or FeatureExtractor()
+    n = len(samples) // extractor.frame_samples
+    frames = samples[:n * extractor.frame_samples].reshape(n, extractor.frame_samples)
+    voiced = [i for i, f in enumerate(frames) if extractor(f) is not None]
+    if not voiced:
+        return None
+    return (voiced[-1] + 1) * extractor.frame_samples / SAMPLE_RATE
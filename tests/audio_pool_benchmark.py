@@ -0,0 +1,198 @@
+"""Jarvis: CPU-heavy audio work in worker processes - throughput, latency and recovery.
+
+Scores a batch of clips (the wake word among noise, as several satellite rooms
+would send) with the template wake word detector in this process, and in an
+AudioWorkerPool with one and with several workers, checking that the results
+are identical. Also measures the per-frame round trip of the pooled streaming
+detector, the cost of handing audio over in shared memory against pickling
+it, and that a crashed, hung or stopped worker is restarted while jobs keep
+flowing, and that speech recognition sessions abandoned without a transcript
+(preempted or silent commands) don't stay behind in the workers:
+    python audio_pool_benchmark.py [--clips 16] [--seconds 15] [--workers N]
+"""
+
+import os
+import sys
+import time
+import wave
+import signal
+import argparse
+import tempfile
+from concurrent.futures import TimeoutError
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wakeword import SAMPLE_RATE, FRAME_SAMPLES, load_wake_word_detector
+from audio_pool import AudioWorkerPool, PooledWakeWordDetector, PooledSTTBackend, WorkerCrashed, score_wake_word
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--clips', type=int, default=16)
+parser.add_argument('--seconds', type=float, default=15.0, help='length of each clip')
+parser.add_argument('--workers', type=int, default=max(2, min(4, os.cpu_count() or 1)))
+args = parser.parse_args()
+CORES = os.cpu_count() or 1
+rng = np.random.default_rng(1)
+
+
+def save(path, samples):
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(np.asarray(samples).astype(np.int16).tobytes())
+
+
+def wake_phrase():
+    """A two-part chirp standing in for "hey jarvis"."""
+    t = np.arange(int(0.7 * SAMPLE_RATE)) / SAMPLE_RATE
+    freq = np.where(t < 0.3, 400 + 600 * t, 900 - 500 * (t - 0.3))
+    return 6000 * np.sin(2 * np.pi * np.cumsum(freq) / SAMPLE_RATE)
+
+
+TEMPLATES = tempfile.mkdtemp()
+for i in range(3):
+    save(os.path.join(TEMPLATES, f"hey_jarvis_{i}.wav"), wake_phrase() + rng.normal(0, 100, 11200))
+
+clips = []
+for i in range(args.clips):
+    clip = rng.normal(0, 80, int(args.seconds * SAMPLE_RATE))
+    if i % 2 == 0:  # every other clip says the wake word once
+        at = int(rng.uniform(0.2, args.seconds - 1.0) * SAMPLE_RATE)
+        clip[at:at + 11200] += wake_phrase()
+    clips.append(clip.astype(np.int16))
+audio_seconds = args.clips * args.seconds
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000
+
+
+# ---- throughput: in-process against 1 and N workers ----
+
+start = time.perf_counter()
+expected = [score_wake_word(clip, TEMPLATES) for clip in clips]
+in_process = time.perf_counter() - start
+assert sum(bool(d) for d, _ in expected) == (args.clips + 1) // 2, 'every wake word is found, nothing else'
+
+results = {}
+for workers in (1, args.workers):
+    pool = AudioWorkerPool(workers, job_timeout=60)
+    pool.start()
+    pool.run("wake_word_load", TEMPLATES)  # one worker has the templates loaded; the rest load on first use
+    start = time.perf_counter()
+    futures = [(time.perf_counter(), pool.submit("score_wake_word", TEMPLATES, samples=clip)) for clip in clips]
+    scored, latencies = [], []
+    for submitted, future in futures:
+        scored.append(future.result())
+        latencies.append(time.perf_counter() - submitted)
+    elapsed = time.perf_counter() - start
+    assert [(d, round(b, 6)) for d, b in scored] == [(d, round(b, 6)) for d, b in expected], 'same results as in-process'
+    results[workers] = elapsed, latencies, pool.stats()
+    pool.stop()
+
+print(f'{args.clips} clips, {audio_seconds:.0f} s of audio, {CORES} cores')
+print(f'  in-process:   {in_process:6.2f} s, real-time factor {in_process / audio_seconds:.3f}')
+for workers, (elapsed, latencies, stats) in results.items():
+    print(f'  {workers} worker(s):  {elapsed:6.2f} s, real-time factor {elapsed / audio_seconds:.3f}, '
+          f'speedup {in_process / elapsed:.2f}x, job latency p50 {percentile(latencies, 50):.0f} ms '
+          f'p95 {percentile(latencies, 95):.0f} ms, jobs per worker {[w["jobs"] for w in stats["per_worker"]]}')
+speedup = results[1][0] / results[args.workers][0]
+if CORES >= 2:
+    assert speedup > min(args.workers, CORES) * 0.6, f'{args.workers} workers only {speedup:.2f}x faster than 1'
+else:
+    print(f'  (one core here: {args.workers} workers are {speedup:.2f}x one worker; no speedup to check)')
+
+# ---- streaming: the pooled detector frame by frame, as the wake word loop runs it ----
+
+pool = AudioWorkerPool(args.workers, heartbeat_timeout=1.0, job_timeout=10)
+pool.start()
+local = load_wake_word_detector(TEMPLATES)
+remote = PooledWakeWordDetector(pool, TEMPLATES)
+stream = clips[0]
+local_times, remote_times, local_fired, remote_fired = [], [], [], []
+for n, at in enumerate(range(0, len(stream) - FRAME_SAMPLES + 1, FRAME_SAMPLES)):
+    frame = stream[at:at + FRAME_SAMPLES].tobytes()
+    t = time.perf_counter()
+    if local.process(frame):
+        local_fired.append(n)
+    local_times.append(time.perf_counter() - t)
+    t = time.perf_counter()
+    if remote.process(frame):
+        remote_fired.append(n)
+    remote_times.append(time.perf_counter() - t)
+assert local_fired == remote_fired and local_fired, (local_fired, remote_fired)
+frame_ms = FRAME_SAMPLES / SAMPLE_RATE * 1000
+assert percentile(remote_times, 95) < frame_ms, 'the pooled detector keeps up with the microphone'
+print(f'Streaming wake word, per {frame_ms:.0f} ms frame: in-process p50 {percentile(local_times, 50):.2f} ms, '
+      f'pooled p50 {percentile(remote_times, 50):.2f} ms p95 {percentile(remote_times, 95):.2f} ms')
+
+# ---- handing audio over: shared memory against pickled bytes ----
+
+minute = rng.normal(0, 1000, 60 * SAMPLE_RATE).astype(np.int16)
+pool.run("numpy:size", samples=minute)
+start = time.perf_counter()
+for _ in range(20):
+    assert pool.run("numpy:size", samples=minute) == len(minute)
+shared = (time.perf_counter() - start) / 20
+data = minute.tobytes()
+start = time.perf_counter()
+for _ in range(20):
+    assert pool.run("builtins:len", data) == len(data)
+pickled = (time.perf_counter() - start) / 20
+print(f'One minute of audio to a worker: {shared * 1000:.2f} ms in shared memory, {pickled * 1000:.2f} ms pickled')
+
+# ---- abandoned speech recognition sessions are released in the workers ----
+
+def sessions_held():
+    return sum(pool.run("stt_sessions", worker=w) for w in range(pool.size))
+
+
+backend = PooledSTTBackend(pool, "google")  # accept() is a no-op for Google, so no network is needed
+sessions = [backend.session() for _ in range(20)]
+for session in sessions:
+    session.accept(minute[:10 * FRAME_SAMPLES])
+assert sessions_held() == len(sessions)
+for session in sessions:
+    session.close()
+    session.accept(minute[:FRAME_SAMPLES])  # audio arriving after a cancel doesn't bring it back
+assert sessions_held() == 0, 'abandoned sessions are discarded'
+print(f'{len(sessions)} abandoned speech recognition sessions released')
+
+# ---- health: crashed, hung and stopped workers are replaced ----
+
+try:
+    pool.run("os:_exit", 3, worker=0)
+    raise AssertionError('a crashed job fails')
+except WorkerCrashed as e:
+    print(f'Crash: {e}')
+try:
+    pool.run("time:sleep", 5, worker=1 % pool.size, timeout=0.5)
+    raise AssertionError('a hung job times out')
+except (WorkerCrashed, TimeoutError) as e:
+    print(f'Hang: {e}')
+victim = pool.workers[0].process.pid
+os.kill(victim, signal.SIGSTOP)
+deadline = time.time() + 10
+while pool.workers[0].process.pid == victim and time.time() < deadline:
+    time.sleep(0.1)
+assert pool.workers[0].process.pid != victim, 'a worker that stops beating is replaced'
+
+# The pinned detector's worker was replaced: it reloads and keeps scoring
+assert all(pool.run("numpy:size", samples=clip, timeout=10) == len(clip) for clip in clips)
+fired = [n for n, at in enumerate(range(0, len(stream) - FRAME_SAMPLES + 1, FRAME_SAMPLES))
+         if remote.process(stream[at:at + FRAME_SAMPLES].tobytes())]
+assert fired == local_fired, (fired, local_fired)
+stats = pool.stats()
+assert stats["restarts"] == 3 and stats["failed"] == 2, stats
+print({k: v for k, v in stats.items() if k != "per_worker"})
+
+# Stopping while the monitor replaces a worker neither respawns it nor leaks shared memory
+names = [w.slot.name for w in pool.workers] + [pool.heartbeats.name]
+os.kill(pool.workers[0].process.pid, signal.SIGKILL)
+time.sleep(0.15)
+pool.stop()
+assert all(w.process.poll() is not None for w in pool.workers), 'no worker outlives the pool'
+assert not any(os.path.exists(f"/dev/shm/{name.lstrip('/')}") for name in names), 'shared memory is unlinked'
+print('OK')
@@ -0,0 +1,85 @@
+"""Jarvis: edge-triggered button on the fake GPIO backend.
+
+Checks debouncing, long and double presses, and measures the time from a
+press to the dispatcher's button handler starting (press-to-listening):
+    python button_test.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from button import Button, FakeGPIO
+from dispatcher import Dispatcher
+
+PIN = 17
+gpio = FakeGPIO()
+gpio.setmode(gpio.BCM)
+events = []
+button = Button(gpio, PIN, lambda kind, at: events.append(kind))
+
+
+def kinds_after(action, wait=0.1):
+    events.clear()
+    action()
+    time.sleep(wait)
+    return list(events)
+
+
+def click(hold=0.05, bounces=0):
+    gpio.press(PIN, bounces)
+    time.sleep(hold)
+    gpio.release(PIN, bounces)
+
+
+# Clean and bouncy presses both give exactly one press and one release
+assert kinds_after(click) == ["press", "release"]
+time.sleep(0.4)
+assert kinds_after(lambda: click(bounces=5)) == ["press", "release"]
+time.sleep(0.4)
+# A press shorter than the debounce window is not lost
+assert kinds_after(lambda: click(hold=0.005)) == ["press", "release"]
+time.sleep(0.4)
+
+# Double press
+assert kinds_after(lambda: (click(), time.sleep(0.1), click())) == ["press", "release", "double_press", "release"]
+time.sleep(0.4)
+
+# Long press, and a press right after it is not a double press
+assert kinds_after(lambda: click(hold=1.0)) == ["press", "long_press", "release"]
+assert kinds_after(click) == ["press", "release"]
+time.sleep(0.4)
+
+# Press-to-listening latency through the dispatcher
+dispatcher = Dispatcher()
+latencies = []
+
+
+@dispatcher.on("button", group="interaction", preempt=True)
+async def on_button(event):
+    latencies.append(time.perf_counter() - event.created)
+
+
+button.close()
+button = Button(gpio, PIN, lambda kind, at: kind == "press" and dispatcher.post("button", created=at))
+threading.Thread(target=lambda: asyncio.run(dispatcher.run()), daemon=True).start()
+while dispatcher.loop is None:
+    time.sleep(0.01)
+
+for _ in range(50):
+    gpio.press(PIN, bounces=2)
+    time.sleep(0.03)
+    gpio.release(PIN)
+    time.sleep(0.4)  # no double presses
+assert len(latencies) == 50, len(latencies)
+latencies.sort()
+print(f'Press -> listening handler: p50 {latencies[24] * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms '
+      f'(was up to 150 ms with 0.05 s polling and a 0.1 s debounce sleep)')
+assert latencies[-1] < 0.02
+dispatcher.stop()
+button.close()
+print('OK')
@@ -0,0 +1,105 @@
+"""Jarvis: multi-turn conversation memory within a prompt-token budget.
+
+Runs a 200-turn conversation against tests/fake_openai_server.py (no API key
+or network needed) and checks that every prompt stays under the budget,
+that prompt size and request latency stay flat while older turns are
+summarized in the background, and that a fact from the first turn survives
+in the summary:
+    python conversation_test.py [--turns 200] [--budget 400]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+import openai
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fake_openai_server import FakeOpenAIServer
+from llm import openai_chat_completion, summarize_conversation, SUMMARY_PROMPT
+from conversation import ConversationMemory, count_tokens, message_tokens
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--turns', type=int, default=200)
+parser.add_argument('--budget', type=int, default=400)
+args = parser.parse_args()
+
+SYSTEM = "You are Jarvis, a helpful AI assistant."
+
+
+def fake_reply(messages):
+    if messages[0]["content"] == SUMMARY_PROMPT:
+        time.sleep(0.1)  # summaries are slow; nobody should wait for them
+        text = messages[-1]["content"]
+        facts = "The user's name is Ada. " if "Ada" in text else ""
+        return [facts + f"They asked {text.count('User:')} more questions about the planets."]
+    question = messages[-1]["content"]
+    return [f"Here is a fairly detailed answer to '{question}', with a few extra sentences of background "
+            f"so that replies are about as long as real ones. That is all I know about it."]
+
+
+server = FakeOpenAIServer(reply_fn=fake_reply, chunk_delay=0, first_delay=0).start()
+openai.api_base = server.url
+openai.api_key = "test"
+
+# A long conversation
+memory = ConversationMemory(SYSTEM, budget=args.budget, summarize=summarize_conversation, keep_recent=4)
+prompt_tokens, latencies, adds, naive = [], [], [], []
+history = []
+for turn in range(args.turns):
+    question = "Hi, my name is Ada." if turn == 0 else f"Tell me about planet number {turn}, please."
+    messages = memory.messages("voice", question)
+    prompt_tokens.append(sum(message_tokens(m) for m in messages))
+    start = time.perf_counter()
+    reply = openai_chat_completion(messages)
+    latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    memory.add("voice", question, reply)
+    adds.append(time.perf_counter() - start)
+    history += [question, reply]
+    naive.append(count_tokens(SYSTEM) + sum(count_tokens(text) for text in history))
+
+stats = memory.stats()
+assert max(prompt_tokens) <= args.budget and stats["max_prompt_tokens"] <= args.budget, stats
+assert stats["summaries"] > 0, stats
+assert max(adds) < 0.005, 'remembering a turn must not wait for the summarizer'
+answers = [r for r in server.requests if r["messages"][0]["content"] != SUMMARY_PROMPT]
+last = answers[-1]["messages"]
+assert "Ada" in last[1]["content"], 'the first turn survives in the summary'
+assert last[-3]["content"] == f"Tell me about planet number {args.turns - 2}, please.", 'recent turns are verbatim'
+
+window = args.turns // 5
+early, late = prompt_tokens[window:2 * window], prompt_tokens[-window:]
+assert statistics.mean(late) <= statistics.mean(early) * 1.25, (statistics.mean(early), statistics.mean(late))
+early_ms = statistics.median(latencies[window:2 * window]) * 1000
+late_ms = statistics.median(latencies[-window:]) * 1000
+assert late_ms < early_ms * 2 + 2, (early_ms, late_ms)
+print(f'Prompt tokens, turns {window}-{2 * window}: {statistics.mean(early):.0f}, '
+      f'last {window}: {statistics.mean(late):.0f} (budget {args.budget}; '
+      f'the whole history would be {naive[-1]} by the end)')
+print(f'Request latency: {early_ms:.1f} ms -> {late_ms:.1f} ms median, remembering a turn: '
+      f'{max(adds) * 1e6:.0f} us at most')
+print(stats)
+
+# The summarizer failing: old turns are dropped instead, still within budget
+failing = ConversationMemory(SYSTEM, budget=200, summarize=lambda summary, turns: None, keep_recent=2)
+for turn in range(30):
+    messages = failing.messages("manual", f"question {turn}")
+    assert sum(message_tokens(m) for m in messages) <= 200
+    failing.add("manual", f"question {turn}", "An answer of a good dozen words, to fill the budget up quickly.")
+time.sleep(0.05)
+assert failing.stats()["summary_failures"] > 0 and failing.stats()["trimmed"] > 0
+
+# Sessions are separate, and an idle one starts over
+idle = ConversationMemory(SYSTEM, idle_timeout=0.1)
+idle.add("voice", "My name is Ada.", "Nice to meet you, Ada.")
+assert len(idle.messages("voice", "What is my name?")) == 4
+assert len(idle.messages("manual", "What is my name?")) == 2
+time.sleep(0.15)
+assert idle.messages("voice", "What is my name?") == [{"role": "system", "content": SYSTEM},
+                                                       {"role": "user", "content": "What is my name?"}]
+server.stop()
+print('OK')
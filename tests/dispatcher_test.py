@@ -0,0 +1,148 @@
+"""Jarvis: event dispatcher concurrency, timeouts, barge-in and latency.
+
+Injects synthetic events (wake word, button, dashboard commands, timers)
+from background threads, the way the audio, GPIO and Flask threads do, with
+handlers that stand in for slow lookups:
+    python dispatcher_test.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from dispatcher import Dispatcher
+
+dispatcher = Dispatcher()
+log = []          # (event kind, what happened, seconds since the event was posted)
+
+
+def record(event, what):
+    log.append((event.kind, what, time.perf_counter() - event.created))
+
+
+def slow_lookup(seconds):
+    time.sleep(seconds)  # a blocking Wikipedia / OpenAI call
+    return "answer"
+
+
+@dispatcher.on("manual_command", group="interaction", timeout=2)
+async def manual_command(event):
+    record(event, "start")
+    answer = await dispatcher.run_blocking(slow_lookup, event.data, timeout=0.5)
+    record(event, answer)
+
+
+@dispatcher.on("wake_word", group="interaction", preempt=True)
+async def wake_word(event):
+    record(event, "start")
+    await asyncio.sleep(0.05)  # listening for the command
+    record(event, "done")
+
+
+captures = {}     # capture number -> (started, stopped, how it ended)
+
+
+def capture(number, seconds, cancelled):
+    """Stands in for listen_for_command: reads the microphone frame by frame until done or cancelled."""
+    captures[number] = (time.perf_counter(), None, None)
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        if cancelled.is_set():
+            captures[number] = (captures[number][0], time.perf_counter(), "cancelled")
+            return None
+        time.sleep(0.032)  # one frame
+    captures[number] = (captures[number][0], time.perf_counter(), "done")
+    return "command"
+
+
+@dispatcher.on("button", group="interaction", preempt=True)
+async def button(event):
+    record(event, "start")
+    command = await dispatcher.run_cancellable(capture, *event.data)
+    record(event, command)
+
+
+@dispatcher.on("status_tick")
+def status_tick(event):
+    record(event, "tick")
+
+
+@dispatcher.on("ping")
+async def ping(event):
+    record(event, "pong")
+
+
+dispatcher.every(0.1, "status_tick")
+loop_thread = threading.Thread(target=lambda: asyncio.run(dispatcher.run()), daemon=True)
+loop_thread.start()
+while dispatcher.loop is None:
+    time.sleep(0.01)
+time.sleep(0.05)
+
+# 1. A slow handler does not delay unrelated events
+dispatcher.post("manual_command", 0.3)
+time.sleep(0.02)
+pings = [dispatcher.post("ping") for _ in range(100)]
+time.sleep(0.5)
+pong_latency = sorted(at for kind, what, at in log if kind == "ping")
+assert len(pong_latency) == 100
+p50, p99 = pong_latency[49] * 1000, pong_latency[98] * 1000
+print(f'Event -> handler latency while a lookup runs: p50 {p50:.2f} ms, p99 {p99:.2f} ms')
+assert p99 < 20, 'events should be handled while a slow lookup is running'
+assert ("manual_command", "answer") in [(k, w) for k, w, _ in log]
+
+# 2. Per-call timeout: a lookup slower than 0.5 s is abandoned
+log.clear()
+dispatcher.post("manual_command", 2.0)
+time.sleep(0.8)
+assert [w for k, w, _ in log if k == "manual_command"] == ["start"]
+assert dispatcher.stats["manual_command"].timeouts == 1
+
+# 3. Barge-in: a wake word cancels the command being processed, then runs at once
+log.clear()
+dispatcher.post("manual_command", 0.4)
+time.sleep(0.05)
+wake = dispatcher.post("wake_word")
+time.sleep(0.2)
+kinds = [(k, w) for k, w, _ in log if k != "status_tick"]
+assert kinds == [("manual_command", "start"), ("wake_word", "start"), ("wake_word", "done")], kinds
+wake_latency = next(at for k, w, at in log if k == "wake_word" and w == "start") * 1000
+print(f'Wake word -> handler latency with barge-in: {wake_latency:.2f} ms')
+assert wake_latency < 20
+assert dispatcher.stats["manual_command"].cancelled == 1
+
+# 3b. A press preempting a blocking capture stops that capture's thread, not just its task
+log.clear()
+dispatcher.post("button", (1, 5.0))
+time.sleep(0.2)
+pressed = time.perf_counter()
+dispatcher.post("button", (2, 0.3))
+time.sleep(0.6)
+first, second = captures[1], captures[2]
+assert first[2] == "cancelled" and first[1] - pressed < 0.1, first
+assert second[2] == "done" and first[1] < second[1]
+assert [(k, w) for k, w, _ in log if k == "button"] == [("button", "start"), ("button", "start"), ("button", "command")]
+print(f'Preempted capture stopped {(first[1] - pressed) * 1000:.0f} ms after the second press')
+
+# 4. Interactions are serialized: two dashboard commands run one after the other
+log.clear()
+dispatcher.post("manual_command", 0.1)
+dispatcher.post("manual_command", 0.1)
+time.sleep(0.4)
+steps = [w for k, w, _ in log if k == "manual_command"]
+assert steps == ["start", "answer", "start", "answer"], steps
+
+# 5. Timers keep firing throughout
+ticks = dispatcher.stats["status_tick"].count
+assert ticks >= 15, ticks
+
+dispatcher.stop()
+loop_thread.join(timeout=2)
+assert not loop_thread.is_alive()
+for kind, stats in dispatcher.summary().items():
+    print(f'{kind:15} {stats}')
+print('OK')
@@ -0,0 +1,99 @@
+"""Jarvis: local stand-in for the OpenAI chat completions endpoint.
+
+Serves POST /v1/chat/completions with canned replies, either as one JSON
+response or as a server-sent event stream of chunks with a configurable
+delay before each one, so streaming and latency can be tested offline.
+
+Usage from a test script:
+    server = FakeOpenAIServer(chunks=["Hello there. ", "How are you?"], chunk_delay=0.1)
+    server.start()
+    openai.api_base = server.url
+    ...
+    server.stop()
+
+Or run it standalone on port 8001:
+    python fake_openai_server.py
+"""
+
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class FakeOpenAIServer:
+    def __init__(self, chunks=None, chunk_delay=0.05, first_delay=0.2, port=0, reply_fn=None):
+        self.chunks = chunks or ["Hello! ", "I am a fake ", "language model. ", "Nice to meet you."]
+        self.chunk_delay = chunk_delay  # seconds before each streamed chunk
+        self.first_delay = first_delay  # extra time before the first token
+        self.reply_fn = reply_fn        # optional: messages -> list of chunks
+        self.requests = []              # request bodies received, for assertions
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                server.requests.append(body)
+                chunks = server.reply_fn(body["messages"]) if server.reply_fn else server.chunks
+                time.sleep(server.first_delay)
+                if body.get("stream"):
+                    self._stream(body, chunks)
+                else:
+                    time.sleep(server.chunk_delay * len(chunks))
+                    self._respond(body, "".join(chunks))
+
+            def _respond(self, body, text):
+                prompt_tokens = sum(len(m["content"].split()) for m in body["messages"])
+                payload = json.dumps({
+                    "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(text.split()),
+                              "total_tokens": prompt_tokens + len(text.split())},
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body, chunks):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                deltas = [{"role": "assistant"}] + [{"content": c} for c in chunks]
+                for i, delta in enumerate(deltas):
+                    if i:
+                        time.sleep(server.chunk_delay)
+                    event = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                             "created": int(time.time()), "model": body.get("model"),
+                             "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    server = FakeOpenAIServer(port=8001)
+    print(f"Fake OpenAI server at {server.url} (set OPENAI_API_BASE to this)")
+    server.httpd.serve_forever()
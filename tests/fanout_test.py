@@ -0,0 +1,101 @@
+"""Jarvis: speculative fan-out across answer sources.
+
+Simulated Wikipedia, web search and GPT handlers with fixed latencies and
+answers check that the first acceptable answer wins, the rest are
+cancelled, delayed (hedged) sources start early once everything else has
+failed, and the budget and barge-in are respected:
+    python fanout_test.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fanout import FanOut, Candidate
+
+executor = ThreadPoolExecutor(8)
+calls = []
+
+
+async def run_blocking(func):
+    return await asyncio.get_running_loop().run_in_executor(executor, func)
+
+
+def source(name, seconds, answer):
+    def handler():
+        calls.append(name)
+        time.sleep(seconds)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    return handler
+
+
+NOT_FOUND = {"I couldn't find anything on Wikipedia for that.", "No instant answer found online."}
+
+
+def found(answer):
+    return bool(answer) and answer not in NOT_FOUND
+
+
+def candidates(wiki, web, gpt, gpt_delay=0.5):
+    return [Candidate("wikipedia", source("wikipedia", *wiki), found),
+            Candidate("duckduckgo", source("duckduckgo", *web), found),
+            Candidate("gpt", source("gpt", *gpt), found, delay=gpt_delay)]
+
+
+async def main():
+    fanout = FanOut(run_blocking, budget=2.0)
+
+    # No Wikipedia page: the web answer wins, GPT is never asked
+    calls.clear()
+    result = await fanout.first(candidates((0.1, "I couldn't find anything on Wikipedia for that."),
+                                           (0.3, "A raspberry is a fruit."), (0.8, "GPT says hi.")))
+    assert result.source == "duckduckgo" and result.answer == "A raspberry is a fruit."
+    assert 0.3 <= result.elapsed < 0.4, result.elapsed
+    assert result.outcomes == {"wikipedia": "rejected", "duckduckgo": "won", "gpt": "skipped"}
+    assert "gpt" not in calls
+    sequential = 0.1 + 0.3
+    print(f'Wikipedia miss, web hit: {result.elapsed * 1000:.0f} ms (one after the other: {sequential * 1000:.0f} ms)')
+
+    # The fastest good answer wins and the slower source is cancelled
+    result = await fanout.first(candidates((0.2, "Ada Lovelace was a mathematician."),
+                                           (0.6, "Ada Lovelace, a programmer."), (0.8, "GPT answer.")))
+    assert result.source == "wikipedia" and result.elapsed < 0.3
+    assert result.outcomes["duckduckgo"] == "cancelled"
+
+    # Every lookup fails fast: GPT starts straight away instead of after its 0.5 s delay
+    calls.clear()
+    result = await fanout.first(candidates((0.05, None), (0.05, ConnectionError("offline")),
+                                           (0.3, "Here is what I know.")))
+    assert result.source == "gpt" and result.elapsed < 0.45, result.elapsed
+    assert result.outcomes == {"wikipedia": "rejected", "duckduckgo": "error", "gpt": "won"}
+    print(f'All lookups failed, hedged GPT answered in {result.elapsed * 1000:.0f} ms')
+
+    # Nothing acceptable within the budget
+    result = await fanout.first(candidates((1.0, None), (1.0, None), (1.0, "Too slow.")), budget=0.3)
+    assert result.source is None and result.answer is None and 0.3 <= result.elapsed < 0.4
+    assert result.outcomes == {"wikipedia": "cancelled", "duckduckgo": "cancelled", "gpt": "skipped"}
+
+    # Barge-in: cancelling the caller cancels every candidate
+    task = asyncio.create_task(fanout.first(candidates((1.0, "a"), (1.0, "b"), (1.0, "c"))))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    try:
+        await task
+        raise AssertionError("should have been cancelled")
+    except asyncio.CancelledError:
+        pass
+    assert fanout.stats["gpt"]["skipped"] == 4 and fanout.stats["wikipedia"]["cancelled"] == 2
+
+    print(fanout.prometheus().strip().splitlines()[-1])
+    for name, counts in fanout.stats.items():
+        print(f'{name:10} {counts}')
+
+
+asyncio.run(main())
+print('OK')
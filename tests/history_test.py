@@ -0,0 +1,114 @@
+"""Jarvis: command/response history - pairing, persistence, paging and search.
+
+Usage:
+    python history_test.py [--interactions 20000]
+
+Records more interactions than the old 100-entry queues could hold (where
+put() blocked forever), restarts from the file, pages through it and times
+recording, paging and search.
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from history import History
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--interactions', type=int, default=20000)
+args = parser.parse_args()
+
+path = os.path.join(tempfile.mkdtemp(), "history.jsonl")
+
+# Pairing and latency
+history = History(path, recent=50)
+first = history.start("what is the weather", source="voice")
+second = history.start("Manual: turn on the lamp", source="manual")
+time.sleep(0.02)
+done = history.finish(first["id"], "Sunny, 21 degrees.", answered_by="gpt")
+assert done["command"] == "what is the weather" and done["response"] == "Sunny, 21 degrees."
+assert done["latency_ms"] >= 20
+history.finish(second["id"], None)  # cancelled by a wake word
+assert history.last_response() == "Sunny, 21 degrees."
+
+# Recording never blocks, however many interactions there are
+rng = random.Random(0)
+TOPICS = "weather news music timer alarm lamp kitchen coffee spotify wikipedia python jupiter paris".split()
+start = time.perf_counter()
+for n in range(args.interactions):
+    topic = rng.choice(TOPICS)
+    entry = history.start(f"tell me about {topic} number {n}")
+    history.finish(entry["id"], f"Here is what I found on {topic}.")
+record_us = (time.perf_counter() - start) / args.interactions * 1e6
+total = args.interactions + 2
+assert len(history) == total and len(history.recent) == 50
+
+# Restart: everything is still there, paged newest first
+history.close()
+start = time.perf_counter()
+history = History(path, recent=50)
+assert len(history) == total
+load_ms = (time.perf_counter() - start) * 1000
+assert history.last_response() == history.page(limit=1)["items"][0]["response"]
+
+seen, before, pages = [], None, 0
+start = time.perf_counter()
+while True:
+    page = history.page(before=before, limit=500)
+    seen.extend(e["id"] for e in page["items"])
+    pages += 1
+    if page["next"] is None:
+        break
+    before = page["next"]
+page_ms = (time.perf_counter() - start) / pages * 1000
+assert seen == list(range(total, 0, -1)), 'every interaction exactly once, newest first'
+oldest = history.page(before=3)["items"]
+assert [e["id"] for e in oldest] == [2, 1]
+assert oldest[1]["response"] == "Sunny, 21 degrees." and oldest[1]["latency_ms"] >= 20
+assert oldest[1]["answered_by"] == "gpt" and oldest[0]["answered_by"] is None
+assert oldest[0]["source"] == "manual" and oldest[0]["response"] is None
+
+# Full-text search over commands and responses, paged the same way
+assert [e["id"] for e in history.search("sunny weather")["items"]] == [1]
+assert [e["id"] for e in history.search("LAMP turn")["items"]] == [2]
+assert history.search("nothing like this")["items"] == []
+start = time.perf_counter()
+result = history.search("jupiter", limit=25)
+search_ms = (time.perf_counter() - start) * 1000
+assert len(result["items"]) == 25 and result["next"] is not None
+assert all("jupiter" in e["command"] for e in result["items"])
+more = history.search("jupiter", before=result["next"], limit=25)
+assert max(e["id"] for e in more["items"]) < min(e["id"] for e in result["items"])
+# Words every interaction has don't change the result, only the rarest word is walked
+found, before = [], None
+while True:
+    result = history.search("tell me about jupiter", before=before, limit=100)
+    found.extend(e["id"] for e in result["items"])
+    if result["next"] is None:
+        break
+    before = result["next"]
+assert found == [e["id"] for e in history.search("jupiter", limit=total)["items"]]
+start = time.perf_counter()
+history.search("tell me about jupiter here", limit=25)
+common_ms = (time.perf_counter() - start) * 1000
+
+# A line cut off by a crash is skipped, and the next append starts on a new line
+history.close()
+with open(path, "ab") as f:
+    f.write(b'{"id": 999999, "comm')
+history = History(path)
+assert len(history) == total
+entry = history.start("after the crash")
+history.finish(entry["id"], "still working")
+history.close()
+assert History(path).page(limit=1)["items"][0]["response"] == "still working"
+
+print(f'{total} interactions: recorded in {record_us:.1f} us each, reloaded in {load_ms:.0f} ms')
+print(f'Page of 500: {page_ms:.2f} ms, search: {search_ms:.2f} ms, with common words: {common_ms:.2f} ms')
+os.remove(path)
+print('OK')
@@ -0,0 +1,178 @@
+"""Jarvis: pooled HTTP client - keep-alive reuse, per-host limits, retries, circuit breaker.
+
+Local stub servers stand in for DuckDuckGo, Wikipedia and OpenAI, counting
+the TCP connections they accept and the requests in flight, so no network
+is needed:
+    python http_client_test.py
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import openai
+import requests
+from http_client import HttpClient, CircuitOpenError
+from fake_openai_server import FakeOpenAIServer
+
+
+class StubServer:
+    """Keep-alive HTTP/1.1 server; `statuses` is a queue of status codes to answer with first."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.statuses = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out as separate writes; don't let Nagle hold the body back
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub.lock:
+                    stub.connections += 1
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                time.sleep(stub.delay)
+                payload = json.dumps({"AbstractText": "A small computer."}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with stub.lock:
+                    stub.in_flight -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+def settle(condition, timeout=2.0):
+    """Wait for the stub server's threads to catch up."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+# 1. Keep-alive: one connection for many requests, opened ahead of time by warm()
+ddg = StubServer()
+client = HttpClient()
+client.register("duckduckgo", ddg.url)
+client.warm()
+assert settle(lambda: ddg.connections == 1) and client.stats()["duckduckgo"]["connections"] == 1
+session = client.session("duckduckgo")
+start = time.perf_counter()
+for i in range(200):
+    assert session.get(ddg.url, params={"q": f"raspberry pi {i}"}).json()["AbstractText"]
+pooled_ms = (time.perf_counter() - start) / 200 * 1000
+start = time.perf_counter()
+for i in range(200):
+    requests.get(ddg.url, params={"q": f"raspberry pi {i}"}).json()
+fresh_ms = (time.perf_counter() - start) / 200 * 1000
+stats = client.stats()["duckduckgo"]
+assert settle(lambda: ddg.connections == 1 + 200), 'the pooled requests all used the warmed connection'
+assert stats["connections"] == 1 and stats["reuse_rate"] == 0.995, stats
+print(f'Pooled: {pooled_ms:.2f} ms per request, new connection each time: {fresh_ms:.2f} ms '
+      f'(local server, no DNS or TLS)')
+
+# 2. Per-host concurrency limit
+wiki = StubServer(delay=0.05)
+client.register("wikipedia", wiki.url, concurrency=2)
+wiki_session = client.session("wikipedia")
+with ThreadPoolExecutor(8) as pool:
+    list(pool.map(lambda i: wiki_session.get(wiki.url), range(16)))
+assert wiki.max_in_flight == 2 and wiki.requests == 16, wiki.max_in_flight
+assert client.stats()["wikipedia"]["connections"] <= 2
+
+# 3. Retries with jittered backoff on 503, then success
+flaky = StubServer()
+client.register("flaky", flaky.url, retries=3, backoff=0.05, failures=10)
+flaky.statuses = [503, 503]
+start = time.perf_counter()
+response = client.session("flaky").get(flaky.url)
+assert response.status_code == 200 and flaky.requests == 3
+assert client.stats()["flaky"]["retried"] == 2
+print(f'Two retries took {(time.perf_counter() - start) * 1000:.0f} ms (jittered, at most 150 ms of backoff)')
+
+# 4. Circuit breaker: opens after repeated failures, fails fast, half-opens, closes on success
+down = StubServer()
+client.register("openai", down.url, retries=0, failures=3, reset_after=0.3)
+down_session = client.session("openai")
+down.statuses = [500] * 3
+for _ in range(3):
+    assert down_session.get(down.url).status_code == 500
+assert client.stats()["openai"]["breaker"] == "open"
+start = time.perf_counter()
+try:
+    down_session.get(down.url)
+    raise AssertionError("circuit should be open")
+except CircuitOpenError:
+    pass
+fail_fast_ms = (time.perf_counter() - start) * 1000
+assert down.requests == 3, 'nothing reaches a service whose circuit is open'
+time.sleep(0.35)
+assert down_session.get(down.url).status_code == 200  # the trial request
+assert client.stats()["openai"]["breaker"] == "closed" and client.stats()["openai"]["trips"] == 1
+print(f'Open circuit fails in {fail_fast_ms:.3f} ms')
+
+# 5. Libraries: OpenAI (through openai.requestssession) reuses the pool too
+fake = FakeOpenAIServer(chunks=["Pooled answer."], chunk_delay=0, first_delay=0).start()
+client.register("gpt", fake.url)
+openai.api_base = fake.url
+openai.api_key = "test"
+openai.requestssession = client.session("gpt")
+for _ in range(5):
+    reply = openai.ChatCompletion.create(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+    assert reply.choices[0].message.content == "Pooled answer."
+gpt = client.stats()["gpt"]
+assert gpt["requests"] == 5 and gpt["connections"] == 1, gpt
+
+# 6. The service timeout applies even when the caller (openai passes 600 s) asks for longer
+slow = FakeOpenAIServer(chunks=["Too late."], chunk_delay=0, first_delay=1.0).start()
+client.register("slow_gpt", slow.url, retries=0, timeout=0.3)
+openai.api_base = slow.url
+openai.requestssession = client.session("slow_gpt")
+start = time.perf_counter()
+try:
+    # openai keeps one session per thread: a new thread picks up the new requestssession
+    with ThreadPoolExecutor(1) as pool:
+        pool.submit(openai.ChatCompletion.create, model="gpt-4o", messages=[{"role": "user", "content": "hi"}],
+                    request_timeout=600).result()
+    raise AssertionError("the service timeout should have cut the request off")
+except openai.error.Timeout:
+    pass
+capped = time.perf_counter() - start
+assert capped < 0.9, capped
+assert client.services["slow_gpt"].cap((5, 600)) == (0.3, 0.3) and client.services["slow_gpt"].cap(0.1) == 0.1
+print(f'Request asking for 600 s cut off by the 0.3 s service timeout after {capped * 1000:.0f} ms')
+
+print(client.prometheus().splitlines()[2])
+for name, s in client.stats().items():
+    print(f'{name:11} {s}')
+print('OK')
@@ -0,0 +1,107 @@
+"""Jarvis: intent router correctness and throughput with many intents.
+
+Usage:
+    python intent_router_benchmark.py [--intents 1000] [--utterances 5000]
+
+Registers the built-in intents plus N generated ones (each with a synonym
+trigger and some with slots), then routes a mix of matching and
+non-matching utterances. The old prefix scan over a dict of triggers is
+timed on the same utterances for comparison.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from intent_router import IntentRouter
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--intents', type=int, default=1000)
+parser.add_argument('--utterances', type=int, default=5000)
+args = parser.parse_args()
+
+router = IntentRouter()
+router.add_synonym("compute", "calculate")
+router.register("calculate", "math", ["calculate", "work out"])
+router.register("wikipedia", "wiki", ["what is", "who is", "tell me about"])
+router.register("web search", "web", ["search", "search for", "look up"])
+router.register("timer", "timer", "set a timer for {duration}")
+router.register("convert", "convert", "convert {amount} to {unit}")
+
+# Behaviour the old prefix scan could not handle
+cases = {
+    "calculate 2 + 2": ("calculate", "2 + 2", {}),
+    "hey jarvis, could you please compute 3 * 4?": ("calculate", "3 * 4", {}),
+    "whats the capital of france please": ("wikipedia", "the capital of france", {}),
+    "Who's Ada Lovelace": ("wikipedia", "ada lovelace", {}),
+    "can you search for cats": ("web search", "cats", {}),
+    "ok look up raspberry pi thanks": ("web search", "raspberry pi", {}),
+    "please set a timer for 5 minutes": ("timer", "5 minutes", {"duration": "5 minutes"}),
+    "convert 10 miles to kilometres": ("convert", "10 miles to kilometres", {"amount": "10 miles", "unit": "kilometres"}),
+}
+for text, expected in cases.items():
+    match = router.route(text)
+    assert match and (match.intent, match.arg, match.slots) == expected, (text, match)
+for text in ["what time does it get dark", "the search is over", "tell me a joke", ""]:
+    assert router.route(text) is None, text
+
+# Generated intents: "<verb> the <noun> <n>" with a synonym "<verb2> my <noun> <n>"
+rng = random.Random(0)
+VERBS = ["turn on", "turn off", "open", "close", "start", "stop", "dim", "lock", "unlock", "play"]
+NOUNS = ["light", "door", "fan", "heater", "speaker", "blind", "camera", "tv", "oven", "pump"]
+triggers = {}
+registered = []
+for i in range(args.intents):
+    verb, noun = rng.choice(VERBS), rng.choice(NOUNS)
+    phrases = [f"{verb} the {noun} {i}", f"{rng.choice(VERBS)} my {noun} {i}"]
+    if i % 10 == 0:
+        phrases.append(f"set {noun} {i} to {{level}}")
+    router.register(f"intent{i}", f"handler{i}", phrases)
+    registered.append(phrases)
+    for phrase in phrases:
+        triggers[phrase.split("{")[0].strip()] = f"handler{i}"
+start = time.perf_counter()
+router.compile()
+compile_ms = (time.perf_counter() - start) * 1000
+
+utterances = []
+for _ in range(args.utterances):
+    i = rng.randrange(args.intents)
+    kind = rng.random()
+    if kind < 0.4:
+        utterances.append(f"{registered[i][0]} now")  # exact prefix
+    elif kind < 0.7:
+        utterances.append(f"jarvis please {registered[i][1]}")  # filler words first
+    else:
+        utterances.append(f"what do you think about the weather in city number {i} tomorrow")
+
+start = time.perf_counter()
+routed = sum(router.route(u) is not None for u in utterances)
+router_seconds = time.perf_counter() - start
+
+
+def prefix_scan(text):
+    """The old CommandIdentifier: try every trigger as a prefix."""
+    text = text.lower()
+    for trigger in triggers:
+        if text.startswith(trigger):
+            return triggers[trigger], text[len(trigger):].strip()
+    return None, None
+
+
+start = time.perf_counter()
+scanned = sum(prefix_scan(u)[0] is not None for u in utterances)
+scan_seconds = time.perf_counter() - start
+
+n = len(utterances)
+print(f'{len(router.triggers)} triggers for {args.intents + 5} intents, compiled in {compile_ms:.1f} ms')
+print(f'Router:      {n / router_seconds:9.0f} utterances/s ({router_seconds / n * 1e6:6.1f} us each), '
+      f'{routed} routed')
+print(f'Prefix scan: {n / scan_seconds:9.0f} utterances/s ({scan_seconds / n * 1e6:6.1f} us each), '
+      f'{scanned} routed')
+assert routed > scanned, 'filler words should not stop an utterance from being routed'
+print('OK')
@@ -0,0 +1,55 @@
+"""Jarvis: time-to-first-spoken-sentence with streamed vs. plain completions.
+
+Runs against tests/fake_openai_server.py, which streams canned chunks with a
+fixed delay, so no API key or network is needed:
+    python llm_stream_test.py
+"""
+
+import os
+import sys
+import time
+
+import openai
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fake_openai_server import FakeOpenAIServer
+from llm import openai_chat_completion, stream_chat_completion, SentenceSplitter, StreamTiming
+
+CHUNKS = ["The Eiffel ", "Tower is in ", "Paris. ", "It was finished ", "in 1889 for ", "the World's Fair. ",
+          "Dr. Gustave ", "Eiffel's company ", "built it! ", "It is 330 ", "metres tall."]
+DELAY = 0.1
+
+server = FakeOpenAIServer(chunks=CHUNKS, chunk_delay=DELAY, first_delay=0.2).start()
+openai.api_base = server.url
+openai.api_key = "test"
+messages = [{"role": "user", "content": "Tell me about the Eiffel Tower"}]
+
+# Plain request: nothing can be spoken until the whole answer is back
+start = time.perf_counter()
+full = openai_chat_completion(messages)
+blocking = time.perf_counter() - start
+
+# Streamed request: each sentence goes to the (fake) speech queue as soon as it is complete
+spoken = []
+timing = StreamTiming()
+reply = stream_chat_completion(messages, lambda sentence: spoken.append((time.perf_counter() - timing.start, sentence)),
+                               timing)
+server.stop()
+
+for at, sentence in spoken:
+    print(f'{at * 1000:6.0f} ms  {sentence}')
+print(f'Streaming: {timing}')
+print(f'Blocking request: {blocking * 1000:.0f} ms before anything could be spoken')
+
+assert reply == full == "".join(CHUNKS).strip()
+assert [s for _, s in spoken] == ["The Eiffel Tower is in Paris.", "It was finished in 1889 for the World's Fair.",
+                                  "Dr. Gustave Eiffel's company built it!", "It is 330 metres tall."]
+# The first sentence is complete after 3 of 11 chunks, so most of the generation time is saved
+assert timing.first_sentence <= blocking - 5 * DELAY, 'first sentence should be spoken long before the full answer'
+
+# Splitter edge cases: decimals and short fragments are not split
+splitter = SentenceSplitter()
+assert splitter.feed("Pi is 3.14 roughly. Ok. Then more text follows here. ") == \
+    ["Pi is 3.14 roughly.", "Ok. Then more text follows here."]
+print('OK')
@@ -0,0 +1,152 @@
+"""Jarvis: queue-based logging - caller latency, batching, rotation, drops and binary events.
+
+Usage:
+    python log_pipeline_test.py [--records 50000]
+
+Times logging calls from a wake-word-like loop through the pipeline and
+through a plain FileHandler (what logging.basicConfig(filename=...) sets
+up), both on storage that takes 1 ms to flush like an SD card, then checks
+the JSON-lines output, size rotation, drop counting under overload and the
+binary event file.
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import logging
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from log_pipeline import LogPipeline, read_events, EVENT_KINDS
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--records', type=int, default=50000)
+args = parser.parse_args()
+
+tmp = tempfile.mkdtemp()
+
+
+class SlowStorage:
+    """File wrapper whose flush takes 1 ms, like a busy SD card."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data):
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+        time.sleep(0.001)
+
+    def close(self):
+        self.f.close()
+
+
+def caller_latency(logger, n):
+    """Per-call latencies (seconds) of logging from a loop that does a frame's worth of work between calls."""
+    times = []
+    for i in range(n):
+        start = time.perf_counter()
+        logger.info("Heard: %s (score %.2f)", "hey jarvis", i / n)
+        times.append(time.perf_counter() - start)
+        while time.perf_counter() - start < 0.0003:
+            pass
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.99)], times[-1]
+
+
+# 1. Caller-side latency: plain file handler vs. the pipeline
+n = min(args.records, 5000)
+plain = logging.getLogger("plain")
+plain.propagate = False
+file_handler = logging.FileHandler(os.path.join(tmp, "plain.log"))
+file_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+file_handler.stream = SlowStorage(file_handler.stream)
+plain.addHandler(file_handler)
+plain.setLevel(logging.INFO)
+plain_p50, plain_p99, plain_max = caller_latency(plain, n)
+
+path = os.path.join(tmp, "jarvis.log")
+pipeline = LogPipeline(path, max_bytes=1 << 30)
+pipeline.writer.file = SlowStorage(pipeline.writer.file)
+queued = logging.getLogger("queued")
+queued.propagate = False
+pipeline.install(logger=queued)
+pipe_p50, pipe_p99, pipe_max = caller_latency(queued, n)
+print(f'FileHandler: p50 {plain_p50 * 1e6:.1f} us, p99 {plain_p99 * 1e6:.1f} us, max {plain_max * 1e3:.2f} ms')
+print(f'LogPipeline: p50 {pipe_p50 * 1e6:.1f} us, p99 {pipe_p99 * 1e6:.1f} us, max {pipe_max * 1e3:.2f} ms')
+assert pipe_p50 < plain_p50 / 10 and pipe_p99 < plain_p50
+
+# 2. JSON lines, structured fields and exceptions
+queued.warning("Interaction took %d ms", 812, extra={"fields": {"kind": "wake_word", "stt_ms": 402}})
+try:
+    1 / 0
+except ZeroDivisionError:
+    queued.exception("Handler failed")
+pipeline.close()
+with open(path) as f:
+    lines = [json.loads(line) for line in f]
+assert len(lines) == n + 2 and pipeline.stats()["dropped"] == 0
+assert lines[0]["message"] == "Heard: hey jarvis (score 0.00)" and lines[0]["level"] == "INFO"
+assert lines[-2]["kind"] == "wake_word" and lines[-2]["stt_ms"] == 402
+assert "ZeroDivisionError" in lines[-1]["exception"]
+
+# 3. Size rotation keeps `backups` old files, none much over the limit
+path = os.path.join(tmp, "rotating.log")
+pipeline = LogPipeline(path, max_bytes=64 * 1024, backups=3, batch_size=50, queue_size=20000)
+rotating = logging.getLogger("rotating")
+rotating.propagate = False
+pipeline.install(logger=rotating)
+for i in range(20000):
+    rotating.info("Utterance %d: %s", i, {"speech_ms": 1200, "trailing_silence_ms": 400})
+pipeline.close()
+files = sorted(glob.glob(path + "*"))
+assert files == [path, path + ".1", path + ".2", path + ".3"], files
+assert all(os.path.getsize(f) <= 64 * 1024 for f in files)
+with open(path) as f:
+    last = json.loads(f.readlines()[-1])
+assert last["message"].startswith("Utterance 19999"), last
+print(f'Rotation: {pipeline.writer.rotations} rotations, {len(files)} files kept')
+
+# 4. Overload: a tiny queue drops records instead of blocking, and says so
+path = os.path.join(tmp, "overload.log")
+pipeline = LogPipeline(path, queue_size=100)
+flood = logging.getLogger("flood")
+flood.propagate = False
+pipeline.install(logger=flood)
+start = time.perf_counter()
+for i in range(args.records):
+    flood.info("Frame %d", i)
+flood_seconds = time.perf_counter() - start
+pipeline.close()
+stats = pipeline.stats()
+assert stats["dropped"] > 0 and stats["written"] + stats["dropped"] == args.records, stats
+with open(path) as f:
+    notices = [json.loads(line) for line in f if "dropped_total" in line]
+assert notices and notices[-1]["dropped_total"] == stats["dropped"]
+print(f'Overload: {args.records} records in {flood_seconds * 1000:.0f} ms, '
+      f'{stats["written"]} written, {stats["dropped"]} dropped')
+
+# 5. Binary audio-level events: 14 bytes each
+path = os.path.join(tmp, "text.log")
+events_path = os.path.join(tmp, "audio.bin")
+pipeline = LogPipeline(path, events_path=events_path, queue_size=200000)
+start = time.perf_counter()
+for i in range(100000):
+    pipeline.event("frame_energy", i * 0.5)
+    if i % 10 == 0:
+        pipeline.event("wake_score", 0.25)
+event_us = (time.perf_counter() - start) / 110000 * 1e6
+pipeline.close()
+events = read_events(events_path)
+assert len(events) == 110000 == pipeline.stats()["events_written"]
+energies = events[events["kind"] == EVENT_KINDS["frame_energy"]]
+assert len(energies) == 100000 and energies["value"][-1] == 49999.5
+assert os.path.getsize(events_path) == 110000 * 14
+print(f'Binary events: {event_us:.2f} us each, {os.path.getsize(events_path) // 1024} KB for 110000')
+print('OK')
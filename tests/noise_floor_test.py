@@ -0,0 +1,35 @@
+"""Jarvis: check the background noise floor converges on recorded noise.
+
+Usage:
+    python noise_floor_test.py [noise.wav ...]   (defaults to output.wav)
+
+Each file is fed frame by frame, exactly as the capture thread does. The
+threshold is usable from the very first frame; the test reports how long it
+takes to settle within 20% of its steady-state value (the median over the
+second half of the file) and fails if that takes longer than 5 seconds.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wakeword import load_wav, FRAME_SAMPLES, SAMPLE_RATE
+from noise_floor import NoiseFloorEstimator
+
+paths = sys.argv[1:] or ['output.wav']
+
+for path in paths:
+    samples = load_wav(path)
+    estimator = NoiseFloorEstimator()
+    history = []
+    for start in range(0, len(samples) - FRAME_SAMPLES + 1, FRAME_SAMPLES):
+        history.append(estimator.update(samples[start:start + FRAME_SAMPLES]))
+
+    steady = sorted(history[len(history) // 2:])[len(history) // 4]
+    settled = next(i for i in range(len(history))
+                   if all(abs(t - steady) <= 0.2 * steady for t in history[i:]))
+    settle_seconds = settled * FRAME_SAMPLES / SAMPLE_RATE
+    print(f'{path}: first threshold {history[0]:.0f}, steady {steady:.0f}, '
+          f'settled after {settle_seconds:.2f}s of {len(history) * FRAME_SAMPLES / SAMPLE_RATE:.1f}s')
+    assert settle_seconds <= 5.0, f'{path}: threshold did not converge within 5 s'
@@ -0,0 +1,114 @@
+"""Jarvis: Wikipedia / DuckDuckGo answers come from the response cache on repeat.
+
+A local stub server stands in for the Wikipedia API and DuckDuckGo, counting
+the requests it gets, so no network is needed:
+    python response_cache_test.py
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ARTICLES = {"Ada Lovelace": "Ada Lovelace was an English mathematician. She wrote the first published algorithm."}
+ABSTRACTS = {"raspberry pi": "Raspberry Pi is a series of small single-board computers."}
+hits = []
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        hits.append((url.path, params))
+        if url.path == "/ddg/":
+            body = {"AbstractText": ABSTRACTS.get(params["q"].lower(), "")}
+        elif params.get("list") == "search":
+            titles = [t for t in ARTICLES if t.lower() == params["srsearch"].lower()]
+            body = {"query": {"search": [{"title": t} for t in titles]}}
+        elif params.get("prop") == "info|pageprops":
+            title = params["titles"]
+            body = {"query": {"pages": {"1": {"pageid": 1, "title": title, "fullurl": "http://stub/" + title}}}}
+        else:  # prop=extracts
+            body = {"query": {"pages": {"1": {"extract": ARTICLES[params["titles"]]}}}}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+base = f"http://127.0.0.1:{server.server_address[1]}"
+db = os.path.join(tempfile.mkdtemp(), "responses.db")
+os.environ.update(RESPONSE_CACHE_DB=db, WIKIPEDIA_API_URL=base + "/w/api.php", DUCKDUCKGO_URL=base + "/ddg/")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import commands
+from commands import wiki_search, random_web_search, response_cache
+from response_cache import ResponseCache, normalize_query
+
+
+def timed(func, query):
+    before = len(hits)
+    start = time.perf_counter()
+    answer = func(query)
+    return answer, len(hits) - before, (time.perf_counter() - start) * 1000
+
+
+assert normalize_query("  Who is Ada   Lovelace?! ") == "who is ada lovelace"
+
+# Cold lookups go to the network, repeats (however they are phrased) do not
+answer, calls, cold_ms = timed(wiki_search, "ada lovelace")
+assert answer == ARTICLES["Ada Lovelace"] and calls == 3, (answer, calls)
+answer, calls, warm_ms = timed(wiki_search, "Ada Lovelace?")
+assert answer == ARTICLES["Ada Lovelace"] and calls == 0, calls
+print(f'Wikipedia: {cold_ms:.1f} ms cold, {warm_ms:.2f} ms cached')
+
+answer, calls, cold_ms = timed(random_web_search, "raspberry pi")
+assert answer == ABSTRACTS["raspberry pi"] and calls == 1
+answer, calls, warm_ms = timed(random_web_search, "Raspberry  Pi")
+assert calls == 0
+print(f'DuckDuckGo: {cold_ms:.1f} ms cold, {warm_ms:.2f} ms cached')
+
+# "Not found" is cached as well
+assert timed(wiki_search, "xyzzy plugh")[:2] == ("I couldn't find anything on Wikipedia for that.", 1)
+assert timed(wiki_search, "Xyzzy plugh")[1] == 0
+assert timed(random_web_search, "qwertyuiop")[:2] == ("No instant answer found online.", 1)
+assert timed(random_web_search, "qwertyuiop")[1] == 0
+
+# Network errors are not cached
+commands.DUCKDUCKGO_URL = "http://127.0.0.1:1/ddg/"  # nothing listens there
+assert random_web_search("weather today") == "I couldn't perform a web search right now."
+commands.DUCKDUCKGO_URL = os.environ["DUCKDUCKGO_URL"]
+assert timed(random_web_search, "weather today")[1] == 1
+
+# Answers survive a restart: a fresh cache on the same file serves from disk
+restarted = ResponseCache(db)
+assert restarted.get("wikipedia", "ada lovelace")[0] == ARTICLES["Ada Lovelace"]
+assert restarted.stats["disk_hits"] == 1
+
+# Past its TTL the old answer is served at once and refreshed in the background
+key = normalize_query("raspberry pi")
+response_cache.put("duckduckgo", key, "Old abstract.", stored_at=time.time() - commands.WEB_CACHE_TTL - 60)
+answer, calls, stale_ms = timed(random_web_search, "raspberry pi")
+assert answer == "Old abstract." and calls == 0
+deadline = time.time() + 5
+while response_cache.get("duckduckgo", key)[0] != ABSTRACTS["raspberry pi"] and time.time() < deadline:
+    time.sleep(0.01)
+assert response_cache.get("duckduckgo", key)[0] == ABSTRACTS["raspberry pi"], 'stale entry was not refreshed'
+assert response_cache.stats["refreshes"] == 1
+print(f'Stale answer served in {stale_ms:.2f} ms, refreshed in the background')
+
+print(f'Cache stats: {response_cache.stats}')
+server.shutdown()
+print('OK')
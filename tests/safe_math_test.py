@@ -0,0 +1,134 @@
+"""Jarvis: the safe calculator - correctness, spoken input, limits, fuzzing and speed.
+
+Random expressions are checked against Python's eval where that is safe,
+and random and deliberately hostile inputs (9**9**9, huge literals, deep
+nesting, junk) must all be answered or refused within the time budget:
+    python safe_math_test.py [--cases 20000] [--budget-ms 20]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from safe_math import evaluate, compile_expression, spoken_expression, text2num, format_number, MathError
+from commands import MathExpressionCalculator
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--cases', type=int, default=20000)
+parser.add_argument('--budget-ms', type=float, default=20.0)
+args = parser.parse_args()
+rng = random.Random(1)
+
+# Typed and spoken calculations
+CASES = {
+    "2 + 3 * 4": "14", "(2 + 3) * 4": "20", "7 / 2": "3.5", "7 // 2": "3", "7 % 3": "1", "2 ^ 10": "1024",
+    "-3 ** 2": "-9", "sqrt(144)": "12", "log(1000)": "3", "ln(e)": "1", "round(pi, 3)": "3.142",
+    "abs(-4.5)": "4.5", "percent(15, 80)": "12", "0.1 + 0.2": "0.3",
+    "five times seven": "35", "twenty-five plus seventeen": "42",
+    "three hundred and forty two divided by two": "171", "two to the power of ten": "1024",
+    "nine squared": "81", "the square root of one hundred and forty four": "12",
+    "twenty percent of eighty": "16", "one thousand two hundred minus one": "1199",
+    "three point five times two": "7", "seven mod three": "1", "what is a million over four?": "250000",
+    "log of one hundred": "2", "open bracket two plus three close bracket times four": "20",
+}
+for text, expected in CASES.items():
+    assert format_number(evaluate(text)) == expected, (text, spoken_expression(text), evaluate(text))
+assert text2num("turn on four lamps in two rooms") == "turn on 4 lamps in 2 rooms"
+assert text2num("nineteen eighty four") == "19 84"
+assert MathExpressionCalculator.calculate("five times seven") == "The answer is 35."
+
+# Refused quickly, with something Jarvis can say
+HOSTILE = ["9**9**9", "(10**300)**(10**300)", "2**1025", "10**300 * 10**300", "1e999", "9" * 400,
+           "1/0", "sqrt(-1)", "(-8) ** (1/3)", "__import__('os').system('ls')", "open('x')",
+           "[1] * 10**9", "'a' * 10**9", "lambda: 1", "(1).__class__", "x", "1 if 1 else 2", "2 < 3",
+           "log(0)", "+".join(["1"] * 150), "(" * 150 + "1" + ")" * 150, "",
+           "one plus " * 10000 + "one",
+           "2.0 ** 1023.9 * 4", "10.0 ** 400", "1e308 * 10", "2 ** -2000", "percent(1, 2, 3)", "sqrt()"]
+for text in HOSTILE:
+    start = time.perf_counter()
+    try:
+        value = evaluate(text)
+        raise AssertionError(f"{text[:40]!r} should be refused, got {value!r}")
+    except MathError as e:
+        assert str(e), text[:40]
+    assert (time.perf_counter() - start) * 1000 < args.budget_ms, text[:40]
+    assert MathExpressionCalculator.calculate(text).startswith("Could not calculate expression. ")
+print(f'9**9**9 -> "{MathExpressionCalculator.calculate("9**9**9")}"')
+
+# Differential fuzzing against eval on expressions eval can handle
+OPS = ["+", "-", "*", "/", "//", "%"]
+
+
+def random_expression(depth):
+    if depth == 0 or rng.random() < 0.3:
+        return str(rng.randint(0, 99)) if rng.random() < 0.8 else f"{rng.uniform(0, 100):.2f}"
+    if rng.random() < 0.1:
+        return f"({random_expression(depth - 1)}) ** {rng.randint(0, 4)}"
+    if rng.random() < 0.1:
+        return f"-({random_expression(depth - 1)})"
+    return f"({random_expression(depth - 1)} {rng.choice(OPS)} {random_expression(depth - 1)})"
+
+
+compared = 0
+for _ in range(args.cases):
+    expression = random_expression(4)
+    try:
+        expected = eval(expression, {"__builtins__": {}}, {})
+    except (ZeroDivisionError, OverflowError):
+        expected = None
+    try:
+        value = compile_expression(expression)()
+    except (ZeroDivisionError, OverflowError, MathError):
+        value = None
+    if expected is None or isinstance(expected, complex) or abs(expected) > 1e300:
+        assert value is None or abs(value) <= 1e300, (expression, value)
+        continue
+    assert value is not None and abs(value - expected) <= 1e-9 * max(1, abs(expected)), (expression, value, expected)
+    compared += 1
+
+# Hostile fuzzing: random junk and huge operands must stay within the budget
+PIECES = ["9", "99", "10**300", "1e308", "**", "**", "*", "/", "%", "//", "-", "+", "(", ")", "sqrt(", "log(",
+          "round(", ",", ".", "e", "pi", "x", "'", "[", "]", "9**9", "2**1024", "percent(", "1_000", " "]
+timings = []
+for n in range(args.cases):
+    if n % 2:
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(1, 60)))
+    else:
+        text = "**".join(rng.choice(["9", "99", "2", "10**300", "(9**9)", "1.5", "-1"])
+                         for _ in range(rng.randint(2, 6)))
+    start = time.perf_counter()
+    try:
+        evaluate(text)
+    except MathError:
+        pass
+    timings.append(time.perf_counter() - start)
+timings.sort()
+worst_ms = timings[-1] * 1000
+assert worst_ms < args.budget_ms, worst_ms
+print(f'{compared} expressions matched eval; {len(timings)} hostile inputs: '
+      f'p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f} us, worst {worst_ms:.2f} ms (budget {args.budget_ms} ms)')
+
+# Speed: cached, first time, and the old eval
+EXPRESSION = "(3 + 4) * 12 / 7 - sqrt(16)"
+N = 20000
+evaluate(EXPRESSION)
+start = time.perf_counter()
+for _ in range(N):
+    evaluate(EXPRESSION)
+cached_us = (time.perf_counter() - start) / N * 1e6
+start = time.perf_counter()
+for _ in range(N // 10):
+    compile_expression.cache_clear()
+    spoken_expression.cache_clear()
+    evaluate(EXPRESSION)
+uncached_us = (time.perf_counter() - start) / (N // 10) * 1e6
+start = time.perf_counter()
+for _ in range(N // 10):
+    eval("(3 + 4) * 12 / 7 - 16 ** 0.5", {"__builtins__": {}}, {})
+eval_us = (time.perf_counter() - start) / (N // 10) * 1e6
+print(f'"{EXPRESSION}": {cached_us:.1f} us cached, {uncached_us:.1f} us first time (eval: {eval_us:.1f} us)')
+print('OK')
@@ -0,0 +1,207 @@
+"""Jarvis: satellite microphones in several rooms streaming to one server.
+
+Starts a SatelliteServer in this process and one satellite process per room
+(src/satellite.py --wav), each replaying a WAV with the wake word followed by
+a command tone of its own pitch. The server "transcribes" the pitch with a
+recognizer slower than real time, so credit runs out and satellites have to
+wait, and answers with a rendered tone. Checks that every room gets its own
+answer, that rooms are handled at the same time, that no audio is lost to
+backpressure, and that a satellite which floods the server or stops reading
+is disconnected without holding up the others:
+    python satellite_test.py [--rooms 4] [--window 16] [--stt-delay 0.05]
+"""
+
+import os
+import sys
+import json
+import time
+import wave
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from wakeword import SAMPLE_RATE, FRAME_SAMPLES, load_wav
+from satellite import (SatelliteServer, mulaw_encode, mulaw_decode, pack, recv_message, control,
+                       HELLO, WELCOME, START, AUDIO, END)
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--rooms', type=int, default=4)
+parser.add_argument('--window', type=int, default=16)
+parser.add_argument('--stt-delay', type=float, default=0.05, help='seconds to recognize one 32 ms frame')
+args = parser.parse_args()
+ROOMS = ["kitchen", "lounge", "study", "garage", "bedroom", "hall"][:args.rooms]
+PITCH = {room: 1200 + 300 * i for i, room in enumerate(ROOMS)}
+rng = np.random.default_rng(1)
+
+# Mu-law: half the bytes, speech-grade quality
+tone = (8000 * np.sin(2 * np.pi * 440 * np.arange(SAMPLE_RATE) / SAMPLE_RATE)).astype(np.int16)
+decoded = mulaw_decode(mulaw_encode(tone))
+snr = 10 * np.log10(np.sum(tone.astype(float) ** 2) / np.sum((tone - decoded.astype(float)) ** 2))
+assert len(mulaw_encode(tone)) == len(tone) and snr > 35, snr
+
+
+def save(path, samples):
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(np.asarray(samples).astype(np.int16).tobytes())
+
+
+def sine(freq, seconds, amplitude=6000):
+    return amplitude * np.sin(2 * np.pi * freq * np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE)
+
+
+def wake_phrase():
+    """A two-part chirp standing in for "hey jarvis"."""
+    t = np.arange(int(0.7 * SAMPLE_RATE)) / SAMPLE_RATE
+    freq = np.where(t < 0.3, 400 + 600 * t, 900 - 500 * (t - 0.3))
+    return 6000 * np.sin(2 * np.pi * np.cumsum(freq) / SAMPLE_RATE)
+
+
+work = tempfile.mkdtemp()
+templates = os.path.join(work, "wakeword")
+os.makedirs(templates)
+for i in range(3):
+    save(os.path.join(templates, f"hey_jarvis_{i}.wav"), wake_phrase() + rng.normal(0, 100, 11200))
+for room in ROOMS:
+    clip = np.concatenate([np.zeros(8000), wake_phrase(), np.zeros(3000), sine(PITCH[room], 1.0), np.zeros(16000)])
+    save(os.path.join(work, f"{room}.wav"), clip + rng.normal(0, 60, len(clip)))
+
+
+# ---- the central server ----
+
+class PitchSession:
+    """Stand-in recognizer: slower than real time, "hears" the loudest pitch."""
+
+    def accept(self, samples):
+        time.sleep(args.stt_delay)
+
+    def finish(self, samples):
+        spectrum = np.abs(np.fft.rfft(samples.astype(float)))
+        return f"pitch {round(np.argmax(spectrum) * SAMPLE_RATE / len(samples) / 100) * 100}"
+
+
+def synthesize(text):
+    seconds = 600 if text.startswith("attic") else 0.8  # the attic never reads: more than the socket buffers hold
+    return sine(300, seconds, 5000).astype(np.int16)
+
+
+handled = {}
+handlers = ThreadPoolExecutor(max_workers=8)
+
+
+def answer(utterance):
+    session = utterance.session
+    start = time.perf_counter()
+    text = utterance.stt.finish(utterance.pcm())
+    time.sleep(0.3)  # routing and the LLM
+    speech = session.say(f"{session.room}: {text}")
+    speech.wait(60)
+    handled[session.room] = {"start": start, "end": time.perf_counter(), "samples": utterance.samples,
+                             "reason": utterance.reason, "waited_ms": (start - utterance.ended) * 1000}
+
+
+server = SatelliteServer(lambda utterance: handlers.submit(answer, utterance), stt_factory=PitchSession,
+                         synthesize=synthesize, host="127.0.0.1", port=0, window=args.window,
+                         send_timeout=1.0, max_workers=8).start()
+
+
+def raw_client(node, room, rcvbuf=None):
+    sock = socket.socket()
+    if rcvbuf:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    sock.connect(("127.0.0.1", server.port))
+    sock.sendall(pack(HELLO, {"node": node, "room": room}))
+    kind, payload = recv_message(sock)
+    assert kind == WELCOME
+    return sock, control(payload)
+
+
+def closed(sock, timeout=5):
+    sock.settimeout(timeout)
+    try:
+        while True:
+            if not sock.recv(65536):
+                return True
+    except ConnectionError:
+        return True
+    except socket.timeout:
+        return False
+
+
+# Sessions: the same node reconnecting replaces its old session
+first, _ = raw_client("attic", "attic")
+second, welcome = raw_client("attic", "attic")
+assert closed(first) and welcome["credit"] == args.window
+second.close()
+
+# ---- satellites in every room, plus two badly behaved clients ----
+
+satellites = [subprocess.Popen([sys.executable, os.path.join(SRC, "satellite.py"), "--server", f"127.0.0.1:{server.port}",
+                                "--room", room, "--templates", templates, "--wav", os.path.join(work, f"{room}.wav"),
+                                "--save-speech", os.path.join(work, "speech"), "--linger", "15", "--stats"],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+              for room in ROOMS]
+
+# Ignores its credit and floods the server
+flood, welcome = raw_client("cellar", "cellar")
+flood.sendall(pack(START, {"utterance": 1}))
+frame = mulaw_encode(np.zeros(FRAME_SAMPLES, dtype=np.int16))
+try:
+    for _ in range(welcome["credit"] * 4):
+        flood.sendall(pack(AUDIO, frame))
+except ConnectionError:
+    pass
+assert closed(flood), 'a satellite ignoring its credit is disconnected'
+
+# Asks something, then never reads the (long) answer
+stuck, _ = raw_client("attic", "attic", rcvbuf=4096)
+stuck.sendall(pack(START, {"utterance": 1}) + b"".join(pack(AUDIO, frame) for _ in range(4)) +
+              pack(END, {"utterance": 1, "reason": "silence"}))
+
+results = {}
+for room, process in zip(ROOMS, satellites):
+    out, err = process.communicate(timeout=60)
+    assert process.returncode == 0, err
+    results[room] = json.loads(out.strip().splitlines()[-1])
+deadline = time.time() + 10
+while server.counts["slow_disconnects"] == 0 and time.time() < deadline:
+    time.sleep(0.1)
+stats = server.stats()
+stuck.close()
+server.stop()
+
+# Every room got its own answer
+for room in ROOMS:
+    result = results[room]
+    expected = f"{room}: pitch {PITCH[room]}"
+    assert [r["text"] for r in result["replies"]] == [expected], (room, result["replies"])
+    sent = synthesize(expected)
+    received = load_wav(os.path.join(work, "speech", f"{room}-1.wav"))
+    assert len(received) == len(sent) and np.corrcoef(sent, received)[0, 1] > 0.99
+    # Backpressure: the satellite waited for credit, nothing was lost
+    assert result["credit_stalls"] > 0 and result["max_in_flight"] <= args.window, result
+    assert handled[room]["samples"] == result["frames_sent"] * FRAME_SAMPLES, (handled[room], result)
+    assert handled[room]["reason"] == "silence"
+
+# Rooms were handled at the same time
+assert max(handled[r]["start"] for r in ROOMS) < min(handled[r]["end"] for r in ROOMS), 'rooms handled concurrently'
+assert stats["protocol_errors"] == 1 and stats["slow_disconnects"] == 1, stats
+assert "attic" not in stats["rooms"] and "cellar" not in stats["rooms"]
+assert all(room["max_queued"] <= args.window for room in stats["rooms"].values())
+
+for room in ROOMS:
+    r = results[room]
+    print(f'{room:8s} {r["frames_sent"]} frames ({r["bytes_sent"]} bytes), waited for credit {r["credit_stalls"]} '
+          f'times / {r["stalled_ms"]:.0f} ms, answer "{r["replies"][0]["text"]}"')
+print({k: v for k, v in stats.items() if k != "rooms"})
+print('OK')
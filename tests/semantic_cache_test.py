@@ -0,0 +1,102 @@
+"""Jarvis: near-identical GPT questions are answered from the semantic cache.
+
+Runs against tests/fake_openai_server.py, so no API key or network is needed:
+    python semantic_cache_test.py
+"""
+
+import os
+import sys
+import time
+
+import openai
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from fake_openai_server import FakeOpenAIServer
+from llm import openai_chat_completion, stream_chat_completion, StreamTiming
+from semantic_cache import SemanticCache
+from conversation import ConversationMemory
+
+SYSTEM = {"role": "system", "content": "You are Jarvis, a helpful AI assistant."}
+
+
+def ask(question, cache, history=()):
+    return openai_chat_completion([SYSTEM, *history, {"role": "user", "content": question}], cache)
+
+
+server = FakeOpenAIServer(reply_fn=lambda messages: [f"Answer to: {messages[-1]['content']}"],
+                          chunk_delay=0.05, first_delay=0.1).start()
+openai.api_base = server.url
+openai.api_key = "test"
+cache = SemanticCache(threshold=0.85, ttl=60, max_entries=8)
+
+# Paraphrases hit, different questions miss
+first = ask("What's the weather like in general in March?", cache)
+assert len(server.requests) == 1
+assert ask("whats the weather generally like in march", cache) == first
+assert ask("What is the weather like in general in March", cache) == first
+assert len(server.requests) == 1, 'paraphrases should not reach the API'
+for other in ["What's the weather like in general in April?", "Who won the world cup in 2018?",
+              "Tell me a joke"]:
+    assert ask(other, cache) == f"Answer to: {other}", other
+assert len(server.requests) == 4
+
+# In a conversation: repeats still hit, follow-ups that refer back are never cached
+history = [{"role": "user", "content": "Tell me about Paris"}, {"role": "assistant", "content": "Paris is..."}]
+assert ask("What is the weather like in general in March?", cache, history) == first
+assert len(server.requests) == 4
+ask("And how tall is it?", cache, history)
+ask("and how tall is it", cache, history)
+assert len(server.requests) == 6, 'follow-ups depend on the conversation'
+ask("Tell me about Paris", cache)  # the same words on their own are cacheable
+assert len(server.requests) == 7
+
+stats = cache.stats()
+print(f'Cache stats: {stats}')
+assert stats["hits"] == 3 and stats["misses"] == 5 and stats["follow_ups"] == 2
+assert stats["latency_saved_ms"] >= 2 * 100 and stats["tokens_saved"] > 0
+
+# With ConversationMemory building the prompts, as jarvis.py does
+memory = ConversationMemory(SYSTEM["content"])
+question = "What's the climate like in Lisbon in winter?"
+answer = openai_chat_completion(memory.messages("kitchen", question), cache)
+memory.add("kitchen", question, answer)
+before = len(server.requests)
+rephrased = "whats the climate like in lisbon in the winter"
+assert openai_chat_completion(memory.messages("kitchen", rephrased), cache) == answer
+assert openai_chat_completion(memory.messages("lounge", rephrased), cache) == answer
+assert len(server.requests) == before, 'a repeat hits in the middle of a conversation and in another one'
+openai_chat_completion(memory.messages("kitchen", "Is it warmer than Madrid?"), cache)
+assert len(server.requests) == before + 1
+
+# Streaming answers are cached too, and replayed sentence by sentence
+spoken = []
+timing = StreamTiming()
+stream_chat_completion([SYSTEM, {"role": "user", "content": "Tell me a joke!"}], spoken.append, timing, cache)
+assert timing.cached and spoken == ["Answer to: Tell me a joke"] and len(server.requests) == before + 1
+
+# TTL: expired entries are not used
+cache.ttl = 0.2
+time.sleep(0.3)
+ask("Tell me a joke", cache)
+assert len(server.requests) == before + 2
+cache.ttl = 60
+
+# Bounded size: the least recently used entry is replaced
+for i in range(cache.max_entries):
+    ask(f"Question number {i} about topic {i * 7919}", cache)
+assert len(cache) == cache.max_entries
+before = len(server.requests)
+ask("Tell me a joke", cache)  # the oldest, overwritten by now
+assert len(server.requests) == before + 1
+server.stop()
+
+# Lookup cost over a full cache
+big = SemanticCache(max_entries=2048)
+for i in range(big.max_entries):
+    big.store([SYSTEM, {"role": "user", "content": f"How tall is building number {i} in city {i % 97}"}], "x")
+start = time.perf_counter()
+for i in range(100):
+    big.lookup([SYSTEM, {"role": "user", "content": f"what is the population of town {i}"}])
+print(f'Lookup over {big.max_entries} entries: {(time.perf_counter() - start) * 10:.2f} ms')
+print('OK')
@@ -0,0 +1,237 @@
+"""Jarvis: cold start benchmark - time to dashboard and time until the wake word is being listened for.
+
+Runs headless: a fake speech engine and a fake microphone stand in for
+pyttsx3 and PortAudio, with start-up delays like a Raspberry Pi's (set them
+with the options). The real wake word detector, TTS worker, ring buffer,
+fake GPIO button, HTTP client and a Flask dashboard are used. Starting
+everything one after another before the dashboard (as jarvis.py used to)
+is compared with the Startup orchestrator, and a run without a microphone
+checks that the dashboard and speech still come up:
+    python startup_benchmark.py [--tts-delay 0.8] [--mic-delay 0.4] [--stt-delay 1.0] [--http-delay 0.3]
+"""
+
+import os
+import sys
+import time
+import wave
+import argparse
+import tempfile
+import threading
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from flask import Flask, jsonify
+from werkzeug.serving import make_server
+
+from wakeword import load_wake_word_detector, SAMPLE_RATE, FRAME_SAMPLES
+from audio_capture import AudioCapture
+from tts import TTSWorker
+from tts_cache import SpeechCache
+from button import Button, FakeGPIO
+from http_client import HttpClient
+from state_store import StateStore
+from startup import Startup, StartupError
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--tts-delay', type=float, default=0.8, help='speech engine start and voice list')
+parser.add_argument('--mic-delay', type=float, default=0.4, help='opening the input device')
+parser.add_argument('--stt-delay', type=float, default=1.0, help='loading a speech recognition model')
+parser.add_argument('--http-delay', type=float, default=0.3, help='DNS, TCP and TLS to the services')
+args = parser.parse_args()
+
+
+class FakeEngine:
+    """pyttsx3 stand-in: slow to start, silent, renders a short WAV."""
+
+    def __init__(self):
+        time.sleep(args.tts_delay)
+
+    def setProperty(self, name, value):
+        pass
+
+    def getProperty(self, name):
+        return []
+
+    def say(self, text):
+        pass
+
+    def save_to_file(self, text, path):
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(SAMPLE_RATE)
+            wf.writeframes(np.zeros(1600, dtype=np.int16).tobytes())
+
+    def runAndWait(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class FakeMicrophone:
+    """PortAudio input stream stand-in delivering quiet noise in real time."""
+
+    def __init__(self, fail=False):
+        time.sleep(args.mic_delay)
+        if fail:
+            raise OSError("No default input device available")
+        self.rng = np.random.default_rng(0)
+
+    def read(self, n, exception_on_overflow=True):
+        time.sleep(n / SAMPLE_RATE)
+        return self.rng.normal(0, 50, n).astype(np.int16).tobytes()
+
+
+def make_templates():
+    path = tempfile.mkdtemp()
+    rng = np.random.default_rng(1)
+    t = np.arange(int(0.8 * SAMPLE_RATE)) / SAMPLE_RATE
+    for i in range(3):
+        tone = 3000 * np.sin(2 * np.pi * (300 + 40 * i) * t) + rng.normal(0, 200, len(t))
+        with wave.open(os.path.join(path, f"hey_jarvis_{i}.wav"), 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(SAMPLE_RATE)
+            wf.writeframes(tone.astype(np.int16).tobytes())
+    return path
+
+
+TEMPLATES = make_templates()
+
+
+def components(no_microphone=False):
+    """The components jarvis.py starts, as (name, init, needs), built on the fakes."""
+    tts = TTSWorker(cache=SpeechCache(tempfile.mkdtemp()), engine_factory=FakeEngine)
+    gpio = FakeGPIO()
+    client = HttpClient()
+
+    def start_tts():
+        tts.start()
+        tts.ready.wait()
+        for prompt in ["Hello! I am Jarvis, your personal assistant.", "Yes, I'm listening."]:
+            tts.prerender(prompt)
+        return tts
+
+    def start_button():
+        gpio.setmode(gpio.BCM)
+        return Button(gpio, 17, lambda kind, at: None)
+
+    def warm():
+        time.sleep(args.http_delay)
+        client.warm()
+
+    return [("speech", start_tts, ()),
+            ("microphone", lambda: AudioCapture(stream=FakeMicrophone(fail=no_microphone)).start(), ()),
+            ("wake word", lambda: load_wake_word_detector(TEMPLATES), ()),
+            ("speech recognition", lambda: time.sleep(args.stt_delay) or "model", ()),
+            ("button", start_button, ()),
+            ("connections", warm, ())]
+
+
+def serve_dashboard(state):
+    app = Flask(__name__)
+    app.add_url_rule('/', 'index', lambda: jsonify(state.snapshot()))
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def dashboard_up(server):
+    url = f"http://127.0.0.1:{server.server_port}/"
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return response.status == 200
+        except OSError:
+            time.sleep(0.005)
+
+
+def first_wake_frame(capture, detector):
+    """Run the first frame from the microphone through the detector, as the wake word loop does."""
+    frame = capture.reader().read(FRAME_SAMPLES, timeout=2)
+    detector.process(frame)
+
+
+def sequential():
+    """Everything at import time, one after another, then the dashboard."""
+    start = time.perf_counter()
+    values = {name: init() for name, init, _ in components()}
+    state = StateStore(status="Idle")
+    server = serve_dashboard(state)
+    dashboard_up(server)
+    dashboard = time.perf_counter() - start
+    first_wake_frame(values["microphone"], values["wake word"])
+    wake = time.perf_counter() - start
+    server.shutdown()
+    values["microphone"].stop()
+    return dashboard, wake
+
+
+def orchestrated(no_microphone=False):
+    """Dashboard first; the components start in parallel behind it."""
+    start = time.perf_counter()
+    state = StateStore(status="Starting up...")
+    server = serve_dashboard(state)
+    startup = Startup(on_change=lambda states: state.update(startup=states))
+    for name, init, needs in components(no_microphone):
+        startup.add(name, init, needs)
+    startup.start()
+    dashboard_up(server)
+    dashboard = time.perf_counter() - start
+    wake = None
+    try:
+        capture, detector = startup.get("microphone"), startup.get("wake word")
+        startup.get("speech recognition")
+        first_wake_frame(capture, detector)
+        wake = time.perf_counter() - start
+        capture.stop()
+    except StartupError:
+        pass
+    startup.wait()
+    server.shutdown()
+    return dashboard, wake, startup.states(), state.get("startup")
+
+
+old_dashboard, old_wake = sequential()
+new_dashboard, new_wake, states, published = orchestrated()
+assert all(s["state"] == "ready" for s in states.values()), states
+assert published == states, 'the dashboard state shows every component'
+assert new_dashboard < old_dashboard / 5 and new_wake < old_wake * 0.75, (new_dashboard, new_wake)
+slowest = max(args.tts_delay, args.mic_delay, args.stt_delay, args.http_delay)
+print(f'Time to dashboard:  {old_dashboard * 1000:6.0f} ms one after another, {new_dashboard * 1000:6.0f} ms orchestrated')
+print(f'Time to wake ready: {old_wake * 1000:6.0f} ms one after another, {new_wake * 1000:6.0f} ms orchestrated '
+      f'(slowest single component: {slowest * 1000:.0f} ms)')
+print(', '.join(f'{name} {s["ms"]} ms' for name, s in states.items()))
+
+# No microphone: voice activation is off, everything else comes up
+dashboard, wake, states, _ = orchestrated(no_microphone=True)
+assert wake is None and states["microphone"]["state"] == "failed"
+assert "No default input device" in states["microphone"]["error"]
+assert all(s["state"] == "ready" for name, s in states.items() if name != "microphone"), states
+print(f'Without a microphone: dashboard in {dashboard * 1000:.0f} ms, microphone: {states["microphone"]["error"]}')
+
+# No audio device for speech: the TTS thread can't start its engine, but nobody waits for it forever
+def no_audio_device():
+    time.sleep(args.tts_delay)
+    raise OSError("No audio output device")
+
+tts = TTSWorker(engine_factory=no_audio_device)
+early = tts.speak_async("Queued while the engine starts")
+tts.start()
+assert early.wait(args.tts_delay + 2) and not early.completed, 'speech queued before the failure finishes'
+late = tts.speak_async("Shutting down. Goodbye!")
+assert late.done and not late.completed and not tts.is_alive(), 'speech after the failure finishes at once'
+assert isinstance(tts.error, OSError)
+engine_error = tts.error
+tts = TTSWorker(engine_factory=FakeEngine)
+tts.start()
+assert tts.speak_async("Hello").wait(args.tts_delay + 2)
+tts.shutdown()
+tts.join(2)
+assert tts.speak_async("After shutdown").wait(0.1), 'speech after shutdown finishes at once'
+print(f'Without a speech engine: queued speech finishes unspoken ({engine_error})')
+print('OK')
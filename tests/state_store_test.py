@@ -0,0 +1,77 @@
+"""Jarvis: versioned dashboard state, change-only publishing and resume.
+
+    python state_store_test.py
+"""
+
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from state_store import StateStore
+
+published = []
+store = StateStore(published.append, coalesce=0.05, history=64, status="Idle")
+
+# Unchanged values are not changes
+assert store.update(status="Idle") == 0
+time.sleep(0.1)
+assert published == []
+
+# A burst of updates from several threads is published once, with the final values
+def burst(n):
+    for i in range(250):
+        store.update(status=f"Working {n}", progress=i)
+
+threads = [threading.Thread(target=burst, args=(n,)) for n in range(4)]
+start = time.perf_counter()
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+update_us = (time.perf_counter() - start) / 1000 * 1e6
+time.sleep(0.1)
+assert len(published) == 1, len(published)
+message = published[0]
+assert message["from"] == 0 and message["version"] == store.version == 1000
+assert message["changes"]["progress"] == 249
+print(f'1000 updates from 4 threads -> {len(published)} message ({update_us:.1f} us per update)')
+
+# Resume: a client that saw version v gets only what changed after it
+v = store.update(status="Listening")
+store.update(speech_cache={"hits": 1})
+store.update(status="Idle")
+resume = store.since(v)
+assert resume == {"from": v, "version": v + 2, "full": False,
+                  "changes": {"speech_cache": {"hits": 1}, "status": "Idle"}}, resume
+assert store.since(store.version)["changes"] == {}
+
+# Too old (history overflowed) or from a previous run: full snapshot
+for i in range(100):
+    store.update(progress=1000 + i)
+assert store.since(v)["full"] and store.since(v)["changes"] == store.snapshot()[1]
+assert store.since(10 ** 9)["full"]
+assert store.since(None)["full"]
+
+# Dozens of dashboards: publishing cost does not depend on the number of clients,
+# and each one stays in sync by applying messages in order
+time.sleep(0.1)
+published.clear()
+clients = [{"version": 0, "state": {}} for _ in range(50)]
+for client in clients:
+    snap = store.since(None)
+    client.update(version=snap["version"], state=dict(snap["changes"]))
+for i in range(20):
+    store.update(status=f"Step {i}")
+    time.sleep(0.06)
+for message in published:
+    for client in clients:
+        assert message["from"] <= client["version"], 'gap: client would ask to resume'
+        client["state"].update(message["changes"])
+        client["version"] = message["version"]
+assert all(c["state"] == store.snapshot()[1] for c in clients)
+print(f'20 spaced updates -> {len(published)} broadcasts for {len(clients)} clients')
+store.close()
+print('OK')
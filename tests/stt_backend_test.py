@@ -0,0 +1,42 @@
+"""Jarvis: run an STT backend over a recorded WAV file.
+
+Usage:
+    STT_BACKEND=vosk VOSK_MODEL=model python stt_backend_test.py [output.wav] ["expected text"]
+
+Like speech_recognizer.py, the clip is loaded through sr.AudioFile. It is then
+fed to the backend in 32 ms frames, as the microphone would, printing each
+partial hypothesis with the time it appeared, followed by the final transcript.
+"""
+
+import os
+import sys
+import time
+
+import speech_recognition as sr
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from stt import create_backend, _samples
+from wakeword import FRAME_SAMPLES, SAMPLE_RATE
+
+path = sys.argv[1] if len(sys.argv) > 1 else 'output.wav'
+expected = sys.argv[2].lower() if len(sys.argv) > 2 else None
+
+recognizer = sr.Recognizer()
+with sr.AudioFile(path) as source:
+    audio_data = recognizer.record(source)
+
+backend = create_backend(recognizer=recognizer)
+print(f'Backend: {backend.name} (streaming partials: {backend.streaming})')
+
+start = time.perf_counter()
+session = backend.session(lambda text: print(f'  {time.perf_counter() - start:6.2f}s partial: {text}'))
+samples = _samples(audio_data)
+for offset in range(0, len(samples), FRAME_SAMPLES):
+    session.accept(samples[offset:offset + FRAME_SAMPLES])
+transcription = session.finish(audio_data)
+elapsed = time.perf_counter() - start
+
+print(f'Final after {elapsed:.2f}s for {len(samples) / SAMPLE_RATE:.2f}s of audio: {transcription}')
+if expected is not None:
+    assert transcription.lower().strip() == expected, f'expected "{expected}"'
@@ -0,0 +1,75 @@
+"""Jarvis: latency histograms, interaction traces and the /metrics text.
+
+    python tracing_test.py
+
+Checks histogram percentiles against exact ones on generated latencies
+(from microseconds to minutes), times recording, and traces a synthetic
+interaction the way jarvis.py does.
+"""
+
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tracing import Histogram, Tracer, span
+
+# Percentiles within 1% of the exact values
+rng = random.Random(0)
+for scale in (0.0005, 0.05, 2.0, 90.0):
+    values = [rng.lognormvariate(0, 0.8) * scale for _ in range(20000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+    exact = sorted(values)
+    for p in (50, 95, 99):
+        want = exact[round(p / 100 * len(exact)) - 1]
+        got = histogram.percentile(p)
+        assert abs(got - want) / want < 0.01, (scale, p, got, want)
+    assert histogram.count == len(values) and histogram.max == max(values)
+    assert len(histogram.counts) < 4000, 'memory stays bounded'
+
+start = time.perf_counter()
+for value in values:
+    histogram.record(value)
+record_us = (time.perf_counter() - start) / len(values) * 1e6
+print(f'Histogram record: {record_us:.2f} us')
+
+# A traced interaction: spans, a span added after the end, the summary
+tracer = Tracer()
+trace = tracer.begin("wake_word", started=time.perf_counter() - 0.03)
+trace.record("wake", 0.03)
+with trace.span("capture"):
+    time.sleep(0.02)
+with span(trace, "stt"):
+    time.sleep(0.01)
+with span(None, "stt"):  # untraced calls (e.g. wake word transcription) are not counted
+    pass
+tracer.end(trace)
+trace.record("tts", 0.005)  # speech starts after the handler has returned
+last = tracer.last()
+assert last["kind"] == "wake_word" and last["total_ms"] >= 60
+assert list(last["spans"]) == ["wake", "capture", "stt", "tts"]
+assert 20 <= last["spans"]["capture"] < 40
+summary = tracer.summary()
+assert summary["stt"]["count"] == 1 and summary["interaction"]["count"] == 1
+assert summary["interaction"]["p50_ms"] >= 30 and summary["wake"]["p99_ms"] == 30.0
+
+# Prometheus text format
+for _ in range(99):
+    t = tracer.begin("manual")
+    t.record("llm", 1.5)
+    tracer.end(t)
+text = tracer.prometheus()
+print(f'/metrics: {len(text.splitlines())} lines')
+sample = re.compile(r'^[a-z_]+(\{[a-z]+="[^"]*"(,[a-z]+="[^"]*")*\})? [0-9.e+-]+$')
+for line in text.splitlines():
+    assert line.startswith("# HELP ") or line.startswith("# TYPE ") or sample.match(line), line
+p99 = float(re.search(r'jarvis_span_seconds\{span="llm",quantile="0.99"\} (\S+)', text).group(1))
+assert abs(p99 - 1.5) < 0.015
+assert 'jarvis_span_seconds_count{span="llm"} 99' in text
+assert 'jarvis_interactions_total{kind="manual"} 99' in text
+print('OK')
@@ -0,0 +1,116 @@
+"""Jarvis: fuzzy trained-phrase matching, persistence and lookup latency.
+
+Usage:
+    python trainer_benchmark.py [--phrases 50000] [--lookups 2000]
+
+Trains N generated phrases into a temporary log, reloads it the way Jarvis
+does at startup (timing the index build), then times exact, misrecognized
+and unknown lookups.
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from trainer import Trainer
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--phrases', type=int, default=50000)
+parser.add_argument('--lookups', type=int, default=2000)
+args = parser.parse_args()
+
+path = os.path.join(tempfile.mkdtemp(), "trained_phrases.jsonl")
+
+# Behaviour: persistence, fuzzy matching, retraining
+trainer = Trainer(path)
+assert trainer.train("good night jarvis", "Sleep well!") == "Training saved."
+trainer.train("what's my sister's name", "Your sister is called Anna.")
+trainer.train("turn on the kitchen light", "Kitchen light on.")
+trainer.train("set an alarm for seven", "Alarm at 7")
+trainer.train("Good night Jarvis", "Sweet dreams!")  # retrained
+trainer = Trainer(path)  # restart
+assert trainer.get_response("good night jarvis") == "Sweet dreams!"
+assert trainer.get_response("Good night, Jarvis.") == "Sweet dreams!"
+assert trainer.get_response("whats my sister name") == "Your sister is called Anna."
+assert trainer.get_response("turn on kitchen light") == "Kitchen light on."
+assert trainer.get_response("what's my brother's name") is None
+assert trainer.get_response("turn on the kitchen fan") is None
+assert trainer.get_response("turn off the kitchen light") is None  # close in trigrams, opposite meaning
+assert trainer.get_response("set an alarm for seven") == "Alarm at 7"
+assert trainer.get_response("set alarm for seven") == "Alarm at 7"
+assert trainer.get_response("set an alarm for eleven") is None
+assert trainer.get_response("set an alarm for seventy") is None
+trainer.train("turn off the kitchen light", "Kitchen light off.")
+assert trainer.get_response("turn off kitchen light") == "Kitchen light off."
+assert trainer.get_response("turn on kitchen light") == "Kitchen light on."
+assert trainer.get_response("good night") is None
+assert len(trainer.custom_phrases) == 5
+os.remove(path)
+
+# Scale: generated phrases
+rng = random.Random(0)
+COMMON = ("the my a to on off in of what is turn play set light kitchen bedroom music morning evening "
+          "remind call weather news timer alarm coffee door window song volume lamp tomorrow today").split()
+SYLLABLES = ["ka", "lo", "mi", "ren", "tu", "sa", "vo", "di", "pen", "ar", "el", "stor", "ni", "ba", "gre"]
+NAMES = sorted({"".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))) for _ in range(3000)})
+phrases = set()
+while len(phrases) < args.phrases:
+    words = [rng.choice(COMMON) for _ in range(rng.randint(2, 5))]
+    words.insert(rng.randrange(len(words) + 1), rng.choice(NAMES))  # names, places, playlists...
+    phrases.add(" ".join(words))
+phrases = sorted(phrases)
+start = time.perf_counter()
+trainer = Trainer(path)
+for phrase in phrases:
+    trainer.train(phrase, f"reply to {phrase}")
+train_seconds = time.perf_counter() - start
+
+start = time.perf_counter()
+trainer = Trainer(path)
+trainer.custom_phrases  # first use loads the log and builds the index
+load_seconds = time.perf_counter() - start
+
+
+def misrecognize(phrase):
+    """Vary a phrase the way speech recognition output tends to."""
+    words = phrase.split()
+    kind = rng.randrange(4)
+    if kind == 0 and len(words) > 3 and any(w in ("the", "a", "my") for w in words):
+        words.remove(next(w for w in words if w in ("the", "a", "my")))  # dropped article
+    elif kind == 1:
+        i = rng.randrange(len(words))
+        words[i] = words[i][:-1] if words[i].endswith("s") else words[i] + "s"  # plural
+    elif kind == 2:
+        i = rng.randrange(len(words))
+        words[i] = words[i][:-1] + rng.choice("aeiou")  # one misheard letter
+    else:
+        return phrase.capitalize() + "?"
+    return " ".join(words)
+
+
+def timed_lookups(queries):
+    start = time.perf_counter()
+    results = [trainer.get_response(q) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+sample = rng.sample(phrases, args.lookups)
+exact, exact_ms = timed_lookups(sample)
+assert exact == [f"reply to {p}" for p in sample]
+fuzzy, fuzzy_ms = timed_lookups([misrecognize(p) for p in sample])
+recovered = sum(r == f"reply to {p}" for r, p in zip(fuzzy, sample)) / len(sample)
+unknown, unknown_ms = timed_lookups([f"how tall is mount everest number {i}" for i in range(args.lookups)])
+false_matches = sum(r is not None for r in unknown)
+
+print(f'{len(phrases)} phrases: trained in {train_seconds:.2f} s, loaded and indexed in {load_seconds * 1000:.0f} ms')
+print(f'Exact lookup:      {exact_ms:.3f} ms')
+print(f'Misrecognized:     {fuzzy_ms:.3f} ms, {recovered:.1%} matched to the right phrase')
+print(f'Unknown phrase:    {unknown_ms:.3f} ms, {false_matches} false matches')
+assert recovered > 0.8 and false_matches == 0
+os.remove(path)
+print('OK')
@@ -0,0 +1,70 @@
+"""Jarvis: benchmark the VAD endpointer over a directory of WAV fixtures.
+
+Usage:
+    python vad_benchmark.py FIXTURE_DIR [--trailing-silence 0.2]
+
+Each fixture should hold one spoken command with some silence around it.
+Audio is fed frame by frame with the noise floor tracked live, exactly like
+command capture, and the script reports per-utterance stats, how much audio
+was captured compared to the old fixed phrase_time_limit=8, and processing
+cost (frame by frame and as a single vectorized batch).
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wakeword import load_wav, FRAME_SAMPLES, SAMPLE_RATE
+from noise_floor import NoiseFloorEstimator
+from vad import Endpointer
+
+parser = argparse.ArgumentParser()
+parser.add_argument('fixtures')
+parser.add_argument('--trailing-silence', type=float, default=0.2)
+args = parser.parse_args()
+
+print(f"{'file':30} {'speech ms':>9} {'trail ms':>8} {'captured s':>10} {'fixed s':>7} {'ended':>8} {'us/frame':>8}")
+audio_seconds = 0.0
+streaming_seconds = 0.0
+batch_seconds = 0.0
+trailing = []
+for path in sorted(glob.glob(os.path.join(args.fixtures, '*.wav'))):
+    samples = load_wav(path)
+    audio_seconds += len(samples) / SAMPLE_RATE
+
+    noise_floor = NoiseFloorEstimator()
+    endpointer = Endpointer(lambda: noise_floor.threshold, trailing_silence=args.trailing_silence,
+                            timeout=len(samples) / SAMPLE_RATE)
+    frames = 0
+    t0 = time.perf_counter()
+    for start in range(0, len(samples) - FRAME_SAMPLES + 1, FRAME_SAMPLES):
+        frame = samples[start:start + FRAME_SAMPLES]
+        noise_floor.update(frame)
+        frames += 1
+        if endpointer.feed(frame):
+            break
+    elapsed = time.perf_counter() - t0
+    streaming_seconds += elapsed
+
+    t0 = time.perf_counter()
+    Endpointer(noise_floor.threshold, trailing_silence=args.trailing_silence, timeout=None).feed(samples)
+    batch_seconds += time.perf_counter() - t0
+
+    stats = endpointer.stats()
+    captured = stats.total_ms / 1000 - stats.leading_ms / 1000
+    fixed = min(8.0, len(samples) / SAMPLE_RATE - stats.leading_ms / 1000)
+    if stats.ended_by == 'silence':
+        trailing.append(stats.trailing_silence_ms)
+    print(f'{os.path.basename(path)[:30]:30} {stats.speech_ms:9.0f} {stats.trailing_silence_ms:8.0f} '
+          f'{captured:10.2f} {fixed:7.2f} {stats.ended_by:>8} {elapsed / max(frames, 1) * 1e6:8.1f}')
+
+if audio_seconds:
+    print(f'Real-time factor: {streaming_seconds / audio_seconds:.5f} frame by frame, '
+          f'{batch_seconds / audio_seconds:.5f} batched')
+if trailing:
+    trailing.sort()
+    print(f'Trailing silence before endpoint: median {trailing[len(trailing) // 2]:.0f} ms, max {trailing[-1]:.0f} ms')
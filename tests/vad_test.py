@@ -0,0 +1,69 @@
+"""Jarvis: the VAD endpointer gives the same utterance however the audio is chunked.
+
+Feeds synthetic clips (noise, a tone standing in for speech) frame by frame,
+in random chunks and as one batch, and checks that the endpoint, the start
+of speech and the reason capture ended are identical - in particular for
+speech starting just before the timeout, whose onset is confirmed only after
+the deadline:
+    python vad_test.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wakeword import SAMPLE_RATE, FRAME_SAMPLES
+from vad import Endpointer
+
+rng = np.random.default_rng(0)
+THRESHOLD = 300
+TIMEOUT = 2.0
+
+
+def clip(speech_at, speech_seconds=0.8, total=4.0):
+    samples = rng.normal(0, 50, int(total * SAMPLE_RATE))
+    if speech_at is not None:
+        at, n = int(speech_at * SAMPLE_RATE), int(speech_seconds * SAMPLE_RATE)
+        samples[at:at + n] += 3000 * np.sin(2 * np.pi * 300 * np.arange(n) / SAMPLE_RATE)
+    return samples.astype(np.int16)
+
+
+def endpoint(samples, chunks):
+    endpointer = Endpointer(THRESHOLD, timeout=TIMEOUT, max_speech=3.0)
+    at = 0
+    for size in chunks:
+        if endpointer.feed(samples[at:at + size]):
+            break
+        at += size
+    return endpointer.ended_by, endpointer.speech_start, endpointer.speech_end
+
+
+def chunkings(n):
+    frames = [FRAME_SAMPLES] * (n // FRAME_SAMPLES + 1)
+    odd = list(rng.integers(100, 5000, n // 100))
+    return {"frame by frame": frames, "random chunks": odd, "one batch": [n]}
+
+
+onset_frames = Endpointer(THRESHOLD).onset_frames
+frame_seconds = FRAME_SAMPLES / SAMPLE_RATE
+cases = {
+    "silence": (None, "timeout"),
+    "early speech": (0.5, "silence"),
+    "starts one frame before the timeout": (TIMEOUT - frame_seconds, "silence"),
+    "onset confirmed only after the timeout": (TIMEOUT - (onset_frames - 1) * frame_seconds, "silence"),
+    "starts after the timeout": (TIMEOUT + 0.1, "timeout"),
+    "longer than max_speech": (0.3, "limit"),
+}
+for name, (speech_at, expected) in cases.items():
+    samples = clip(speech_at, speech_seconds=3.5 if expected == "limit" else 0.8)
+    results = {how: endpoint(samples, chunks) for how, chunks in chunkings(len(samples)).items()}
+    assert len(set(results.values())) == 1, (name, results)
+    ended_by, speech_start, speech_end = results["one batch"]
+    assert ended_by == expected, (name, results)
+    if expected != "timeout":
+        assert abs(speech_start * frame_seconds - speech_at) <= frame_seconds, (name, speech_start)
+    print(f'{name:40} {ended_by:8} start {speech_start} end {speech_end}')
+print('OK')
@@ -0,0 +1,56 @@
+"""Jarvis: replay WAV files through the offline wake word detector.
+
+Usage:
+    python wakeword_replay.py TEMPLATE_DIR POSITIVE_DIR [NEGATIVE_DIR] [--threshold 0.75]
+
+POSITIVE_DIR holds clips that end with "Hey Jarvis"; detection latency is
+measured from the end of speech in each clip. NEGATIVE_DIR holds clips without
+the wake word (TV, conversation, background noise) and gives the false accept rate.
+"""
+
+import os
+import sys
+import glob
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from wakeword import TemplateWakeWordDetector, load_wav, replay_wav, speech_end, SAMPLE_RATE
+
+parser = argparse.ArgumentParser()
+parser.add_argument('templates')
+parser.add_argument('positives')
+parser.add_argument('negatives', nargs='?')
+parser.add_argument('--threshold', type=float, default=0.75)
+args = parser.parse_args()
+
+detector = TemplateWakeWordDetector.from_directory(args.templates, threshold=args.threshold)
+
+latencies = []
+misses = 0
+for path in sorted(glob.glob(os.path.join(args.positives, '*.wav'))):
+    hits = replay_wav(detector, path)
+    end = speech_end(load_wav(path))
+    if not hits or end is None:
+        misses += 1
+        print(f'MISS  {path}')
+        continue
+    latency_ms = (hits[0] - end) * 1000
+    latencies.append(latency_ms)
+    print(f'HIT   {path}  latency {latency_ms:+.0f} ms')
+
+if latencies:
+    latencies.sort()
+    print(f'Detected {len(latencies)}/{len(latencies) + misses}, '
+          f'median latency {latencies[len(latencies) // 2]:+.0f} ms, '
+          f'worst {latencies[-1]:+.0f} ms')
+
+if args.negatives:
+    false_accepts = 0
+    seconds = 0.0
+    for path in sorted(glob.glob(os.path.join(args.negatives, '*.wav'))):
+        false_accepts += len(replay_wav(detector, path))
+        seconds += len(load_wav(path)) / SAMPLE_RATE
+    hours = seconds / 3600
+    print(f'False accepts: {false_accepts} in {seconds:.0f} s '
+          f'({false_accepts / hours if hours else 0:.1f} per hour)')